@@ -0,0 +1,158 @@
+"""Esup-Pod live viewer heartbeats.
+
+With LIVE_HEARTBEAT_BUFFER, the heartbeats of the viewers of an event are
+stored in a Redis sorted set (member: view key, score: time of the last
+heartbeat), the expired ones being removed on each heartbeat. The highest
+number of viewers of each event is kept in another sorted set. The
+live_viewcounter command writes the viewers and the maximum in the database.
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from .models import Event, HeartBeat
+
+LIVE_HEARTBEAT_BUFFER = getattr(settings, "LIVE_HEARTBEAT_BUFFER", False)
+VIEW_EXPIRATION_DELAY = getattr(settings, "VIEW_EXPIRATION_DELAY", 60)
+
+# set of the ids of the events with viewers not written in database
+HEARTBEAT_EVENTS = "heartbeat:events"
+# sorted set of the highest number of viewers of each event
+HEARTBEAT_MAX_VIEWERS = "heartbeat:max"
+
+logger = logging.getLogger(__name__)
+
+
+def get_redis():
+    """Get the Redis connection of the default cache."""
+    from django_redis import get_redis_connection
+
+    return get_redis_connection("default")
+
+
+def get_current_events(**filters):
+    """Get the events taking place now."""
+    now = timezone.now()
+    return Event.objects.filter(start_date__lte=now, end_date__gte=now, **filters)
+
+
+def get_event_owners(event_id: int):
+    """Get the ids of the owners of the event, None if it does not exist."""
+    key = "live_event_owners_%s" % event_id
+    owners = cache.get(key)
+    if owners is None:
+        event = Event.objects.filter(id=event_id).first()
+        if event is None:
+            return None
+        owners = [event.owner_id] + list(
+            event.additional_owners.values_list("id", flat=True)
+        )
+        cache.set(key, owners, timeout=VIEW_EXPIRATION_DELAY)
+    return owners
+
+
+def add_heartbeat(event_id: int, key: str, user=None) -> int:
+    """Store the heartbeat of a viewer in Redis, return the number of viewers."""
+    viewers_key = "heartbeat:%s" % event_id
+    now = time.time()
+    pipe = get_redis().pipeline()
+    pipe.zadd(viewers_key, {key: now})
+    pipe.zremrangebyscore(viewers_key, "-inf", now - VIEW_EXPIRATION_DELAY)
+    pipe.zcard(viewers_key)
+    pipe.expire(viewers_key, VIEW_EXPIRATION_DELAY * 2)
+    if user is not None and not user.is_anonymous:
+        pipe.hset("%s:users" % viewers_key, key, user.id)
+        pipe.expire("%s:users" % viewers_key, VIEW_EXPIRATION_DELAY * 2)
+    pipe.sadd(HEARTBEAT_EVENTS, event_id)
+    count = pipe.execute()[2]
+    get_redis().zadd(HEARTBEAT_MAX_VIEWERS, {event_id: count}, gt=True)
+    return count
+
+
+def count_viewers(event_id: int) -> int:
+    """Get the number of viewers of the event from Redis."""
+    return get_redis().zcount(
+        "heartbeat:%s" % event_id, time.time() - VIEW_EXPIRATION_DELAY, "+inf"
+    )
+
+
+def add_db_heartbeat(event_id: int, key: str, user=None) -> int:
+    """Store the heartbeat of a viewer in database, return the number of viewers."""
+    viewer_heartbeat, created = HeartBeat.objects.get_or_create(
+        viewkey=key, event_id=event_id
+    )
+    if created and user is not None and not user.is_anonymous:
+        viewer_heartbeat.user = user
+    viewer_heartbeat.last_heartbeat = timezone.now()
+    viewer_heartbeat.save()
+    count = HeartBeat.objects.filter(event_id=event_id).count()
+    Event.objects.filter(id=event_id, max_viewers__lt=count).update(max_viewers=count)
+    return count
+
+
+def count_event_viewers(event_id: int, key: str = None, user=None) -> int:
+    """Count the viewers of the event, after storing the heartbeat of a viewer."""
+    if LIVE_HEARTBEAT_BUFFER:
+        try:
+            if key is None:
+                return count_viewers(event_id)
+            return add_heartbeat(event_id, key, user)
+        except RedisError as e:
+            logger.error("Unable to use the live heartbeats buffer: %s" % e)
+    if key is None:
+        return HeartBeat.objects.filter(event_id=event_id).count()
+    return add_db_heartbeat(event_id, key, user)
+
+
+def get_viewer_ids(redis, event_id: int) -> list:
+    """Get the ids of the logged in viewers of the event from Redis."""
+    viewers_key = "heartbeat:%s" % event_id
+    keys = redis.zrangebyscore(viewers_key, time.time() - VIEW_EXPIRATION_DELAY, "+inf")
+    if not keys:
+        return []
+    return [
+        int(user_id) for user_id in redis.hmget("%s:users" % viewers_key, keys) if user_id
+    ]
+
+
+def persist_heartbeats() -> int:
+    """Write the viewers and the maximum of viewers of the events from Redis.
+
+    Returns the number of events updated.
+    """
+    redis = get_redis()
+    event_ids = [int(event_id) for event_id in redis.smembers(HEARTBEAT_EVENTS)]
+    events = Event.objects.filter(id__in=event_ids)
+    for event in events:
+        event.viewers.set(User.objects.filter(id__in=get_viewer_ids(redis, event.id)))
+        max_viewers = int(redis.zscore(HEARTBEAT_MAX_VIEWERS, event.id) or 0)
+        Event.objects.filter(id=event.id, max_viewers__lt=max_viewers).update(
+            max_viewers=max_viewers
+        )
+        if not redis.exists("heartbeat:%s" % event.id):
+            redis.srem(HEARTBEAT_EVENTS, event.id)
+            redis.zrem(HEARTBEAT_MAX_VIEWERS, event.id)
+    deleted = set(event_ids) - set(event.id for event in events)
+    if deleted:
+        redis.srem(HEARTBEAT_EVENTS, *deleted)
+        redis.zrem(HEARTBEAT_MAX_VIEWERS, *deleted)
+    return len(events)
+
+
+def persist_db_heartbeats() -> int:
+    """Remove the expired heartbeats and write the viewers of the current events.
+
+    Returns the number of events updated.
+    """
+    accepted_time = timezone.now() - timezone.timedelta(seconds=VIEW_EXPIRATION_DELAY)
+    HeartBeat.objects.filter(last_heartbeat__lt=accepted_time).delete()
+    events = get_current_events()
+    for event in events:
+        event.viewers.set(User.objects.filter(heartbeat__event=event).distinct())
+    return len(events)
@@ -7,11 +7,19 @@ from pod.main.tasks import task_end_live_transcription, task_start_live_transcri
 import threading
 import time
 import json
+import os
 import subprocess
+import tempfile
+from collections import deque
 
 LIVE_CELERY_TRANSCRIPTION = getattr(settings, "LIVE_CELERY_TRANSCRIPTION ", False)
 LIVE_VOSK_MODEL = getattr(settings, "LIVE_VOSK_MODEL", None)
+LIVE_TRANSCRIPTION_CONTINUOUS = getattr(settings, "LIVE_TRANSCRIPTION_CONTINUOUS", False)
+FFMPEG_CMD = getattr(settings, "FFMPEG_CMD", "ffmpeg")
 __SAMPLE_RATE__ = 16000
+# continuous mode: words shown in the rolling caption and minimal delay between writes
+__CAPTION_MAX_WORDS__ = 20
+__WRITE_INTERVAL__ = 0.5
 threads = {}
 threads_to_stop = []
 SetLogLevel(-1)
@@ -26,7 +34,117 @@ def timestring(seconds: int) -> str:
     return "%i:%02i:%06.3f" % (hours, minutes, seconds)
 
 
+def is_stopped(thread_id) -> bool:
+    """Check if the transcription running in the thread has been asked to stop."""
+    return not LIVE_CELERY_TRANSCRIPTION and thread_id in threads_to_stop
+
+
+class LiveCaption:
+    """Rolling caption window of a live, written atomically in the vtt file."""
+
+    def __init__(self, filepath) -> None:
+        self.filepath = filepath
+        self.words = deque(maxlen=__CAPTION_MAX_WORDS__)
+        self.partial = []
+        self.text = ""
+        self.last_write = 0
+
+    def add_result(self, result: str) -> None:
+        """Add the words of a final recognizer result to the window."""
+        words = json.loads(result).get("result") or []
+        self.words.extend(w["word"] for w in words)
+        self.partial = []
+
+    def set_partial(self, partial_result: str) -> None:
+        """Set the words of the sentence being recognized."""
+        self.partial = json.loads(partial_result).get("partial", "").split()
+
+    def write(self, force=False) -> None:
+        """Write the caption window if it changed, at most every __WRITE_INTERVAL__."""
+        text = " ".join((list(self.words) + self.partial)[-__CAPTION_MAX_WORDS__:])
+        if text == self.text or (
+            not force and time.time() - self.last_write < __WRITE_INTERVAL__
+        ):
+            return
+        vtt = WebVTT()
+        if text:
+            vtt.captions.append(Caption(timestring(0), timestring(86400), text))
+        # write aside then rename, the player never reads a partial file
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(self.filepath), suffix=".vtt.tmp"
+        )
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            vtt.write(f)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, self.filepath)
+        self.text = text
+        self.last_write = time.time()
+
+
+def get_decoder_command(url) -> list:
+    """Get the command of the decoder streaming the live audio in 16kHz s16le."""
+    return [
+        FFMPEG_CMD,
+        "-nostdin",
+        "-loglevel",
+        "quiet",
+        "-i",
+        url,
+        "-vn",
+        "-acodec",
+        "pcm_s16le",
+        "-ac",
+        "1",
+        "-ar",
+        str(__SAMPLE_RATE__),
+        "-f",
+        "s16le",
+        "-",
+    ]
+
+
+def feed_recognizer(process, rec, live_caption, thread_id) -> None:
+    """Feed the decoder output to the recognizer and update the caption window."""
+    buffer = bytearray(4000)
+    while not is_stopped(thread_id):
+        size = process.stdout.readinto(buffer)
+        if size == 0:
+            break
+        if rec.AcceptWaveform(bytes(buffer[:size])):
+            live_caption.add_result(rec.Result())
+        else:
+            live_caption.set_partial(rec.PartialResult())
+        live_caption.write()
+    live_caption.add_result(rec.FinalResult())
+    live_caption.write(force=True)
+
+
+def transcribe_continuous(url, slug, model, filepath) -> None:
+    """
+    Transcribe a live with one persistent decoder and recognizer.
+
+    The decoder is only restarted if the stream is interrupted.
+    """
+    rec = KaldiRecognizer(Model(model), __SAMPLE_RATE__)
+    rec.SetWords(True)
+    live_caption = LiveCaption(filepath)
+    thread_id = threading.get_ident()
+    while not is_stopped(thread_id):
+        with subprocess.Popen(
+            get_decoder_command(url), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        ) as process:
+            feed_recognizer(process, rec, live_caption, thread_id)
+            process.kill()
+        if not is_stopped(thread_id):
+            time.sleep(1)
+    threads_to_stop.remove(thread_id)
+    vtt = WebVTT()
+    vtt.save(filepath)
+
+
 def transcribe(url, slug, model, filepath):  # noqa: C901
+    if LIVE_TRANSCRIPTION_CONTINUOUS:
+        return transcribe_continuous(url, slug, model, filepath)
     # if url.endswith(".m3u8"):
     #    url = url.split(".m3u8")[0] + "_mid/index.m3u8"
     trans_model = Model(model)
@@ -0,0 +1,169 @@
+"""Unit tests for the live heartbeats buffer.
+
+*  run with `python manage.py test pod.live.tests.test_heartbeat`
+"""
+
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from pod.live.heartbeat import count_event_viewers, count_viewers, persist_heartbeats
+from pod.live.models import Building, Broadcaster, Event, HeartBeat
+from pod.video.models import Type
+
+
+class FakeRedis:
+    """Minimal in memory Redis with the commands used by the heartbeats."""
+
+    def __init__(self):
+        self.data = {}
+
+    def zadd(self, key, mapping, gt=False):
+        scores = self.data.setdefault(key, {})
+        for member, score in mapping.items():
+            member = str(member).encode()
+            if not gt or score > scores.get(member, float("-inf")):
+                scores[member] = score
+
+    def zremrangebyscore(self, key, min_score, max_score):
+        scores = self.data.get(key, {})
+        for member in [m for m, s in scores.items() if s <= max_score]:
+            del scores[member]
+
+    def zcard(self, key):
+        return len(self.data.get(key, {}))
+
+    def zcount(self, key, min_score, max_score):
+        return len(self.zrangebyscore(key, min_score, max_score))
+
+    def zrangebyscore(self, key, min_score, max_score):
+        return [m for m, s in self.data.get(key, {}).items() if s >= min_score]
+
+    def zscore(self, key, member):
+        return self.data.get(key, {}).get(str(member).encode())
+
+    def zrem(self, key, *members):
+        for member in members:
+            self.data.get(key, {}).pop(str(member).encode(), None)
+
+    def hset(self, key, field, value):
+        self.data.setdefault(key, {})[field.encode()] = str(value).encode()
+
+    def hmget(self, key, fields):
+        return [self.data.get(key, {}).get(field) for field in fields]
+
+    def sadd(self, key, member):
+        self.data.setdefault(key, set()).add(str(member).encode())
+
+    def srem(self, key, *members):
+        for member in members:
+            self.data.get(key, set()).discard(str(member).encode())
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    def exists(self, key):
+        return int(bool(self.data.get(key)))
+
+    def expire(self, key, seconds):
+        return True
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Queue the commands and run them on execute."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+
+        return queue
+
+    def execute(self):
+        return [
+            getattr(self.redis, name)(*args, **kwargs)
+            for name, args, kwargs in self.commands
+        ]
+
+
+@patch("pod.live.heartbeat.LIVE_HEARTBEAT_BUFFER", True)
+class HeartbeatBufferTestCase(TestCase):
+    """Test the heartbeats stored in Redis."""
+
+    fixtures = [
+        "initial_data.json",
+    ]
+
+    def setUp(self):
+        """Set up a current event and a fake Redis."""
+        cache.clear()
+        self.user = User.objects.create(username="pod", password="podv3")
+        self.viewer = User.objects.create(username="viewer", first_name="Jean")
+        broadcaster = Broadcaster.objects.create(
+            name="broadcaster1",
+            url="http://test.live",
+            status=True,
+            building=Building.objects.create(name="building1"),
+        )
+        self.event = Event.objects.create(
+            title="event1",
+            owner=self.user,
+            is_draft=False,
+            broadcaster=broadcaster,
+            type=Type.objects.get(id=1),
+        )
+        self.redis = FakeRedis()
+        patcher = patch("pod.live.heartbeat.get_redis", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_count_viewers(self):
+        """Test the viewers are counted in Redis without database writes."""
+        self.assertEqual(count_event_viewers(self.event.id, "key1"), 1)
+        self.assertEqual(count_event_viewers(self.event.id, "key2", self.viewer), 2)
+        self.assertEqual(count_event_viewers(self.event.id, "key1"), 2)
+        self.assertEqual(count_event_viewers(self.event.id), 2)
+        self.assertEqual(HeartBeat.objects.count(), 0)
+        # the heartbeats of the first viewer expire
+        self.redis.data["heartbeat:%s" % self.event.id][b"key1"] = 0
+        self.assertEqual(count_viewers(self.event.id), 1)
+        self.assertEqual(count_event_viewers(self.event.id, "key3"), 2)
+        print(" --->  test_count_viewers: OK!")
+
+    def test_persist_heartbeats(self):
+        """Test the viewers and the maximum of viewers are written in database."""
+        count_event_viewers(self.event.id, "key1")
+        count_event_viewers(self.event.id, "key2", self.viewer)
+        count_event_viewers(self.event.id, "key3")
+        self.redis.data["heartbeat:%s" % self.event.id][b"key3"] = 0
+        self.assertEqual(persist_heartbeats(), 1)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.max_viewers, 3)
+        self.assertEqual(list(self.event.viewers.all()), [self.viewer])
+        print(" --->  test_persist_heartbeats: OK!")
+
+    def test_heartbeat_view(self):
+        """Test the heartbeat view with the Redis buffer."""
+        self.client.force_login(self.user)
+        url = reverse("live:heartbeat")
+        ajax = {"HTTP_X_REQUESTED_WITH": "XMLHttpRequest"}
+        response = self.client.get(url, {"key": "key1", "eventid": self.event.id}, **ajax)
+        self.assertEqual(response.json(), {"viewers": 1, "viewers_list": []})
+        persist_heartbeats()
+        response = self.client.get(
+            url, {"broadcasterid": self.event.broadcaster_id}, **ajax
+        )
+        self.assertEqual(response.json()["viewers"], 1)
+        self.assertEqual(len(response.json()["viewers_list"]), 1)
+        response = self.client.get(url, {"key": "key1", "eventid": 1000}, **ajax)
+        self.assertEqual(response.status_code, 404)
+        print(" --->  test_heartbeat_view: OK!")
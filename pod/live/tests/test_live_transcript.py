@@ -0,0 +1,144 @@
+"""Unit tests for the continuous live transcription.
+
+*  run with `python manage.py test pod.live.tests.test_live_transcript`
+"""
+
+import importlib.util
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase, skipUnless
+from unittest.mock import MagicMock, patch
+
+import webvtt
+
+USE_VOSK = importlib.util.find_spec("vosk") is not None
+if USE_VOSK:
+    from pod.live import live_transcript
+    from pod.live.live_transcript import LiveCaption, feed_recognizer
+
+
+def get_result(*words) -> str:
+    """Get a final Vosk result with the words."""
+    return json.dumps({"result": [{"word": word} for word in words]})
+
+
+def get_process(data: bytes) -> MagicMock:
+    """Get a fake decoder process streaming the data."""
+    process = MagicMock()
+    process.stdout = io.BytesIO(data)
+    process.__enter__.return_value = process
+    return process
+
+
+@skipUnless(USE_VOSK, "Require vosk")
+class LiveTranscriptTestCase(TestCase):
+    """Test the rolling caption of a live and its recognizer loop."""
+
+    def setUp(self):
+        """Set up the vtt file in a temporary directory."""
+        self.dirpath = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.dirpath, "live.vtt")
+        self.addCleanup(shutil.rmtree, self.dirpath)
+
+    def read_caption(self) -> str:
+        """Read the text of the caption written in the vtt file."""
+        return " ".join(caption.text for caption in webvtt.read(self.filepath))
+
+    def test_rolling_window(self):
+        """Test the caption keeps the last words and merges the partial sentence."""
+        live_caption = LiveCaption(self.filepath)
+        words = ["word%s" % i for i in range(25)]
+        live_caption.add_result(get_result(*words))
+        live_caption.write(force=True)
+        self.assertEqual(self.read_caption(), " ".join(words[5:]))
+        live_caption.set_partial(json.dumps({"partial": "new sentence"}))
+        live_caption.write(force=True)
+        self.assertEqual(self.read_caption(), " ".join(words[7:] + ["new", "sentence"]))
+        # the final result replaces the partial sentence
+        live_caption.add_result(get_result("new", "sentences"))
+        live_caption.write(force=True)
+        self.assertEqual(self.read_caption(), " ".join(words[7:] + ["new", "sentences"]))
+        print(" --->  test_rolling_window: OK!")
+
+    @patch("pod.live.live_transcript.time.time")
+    def test_throttled_write(self, mock_time):
+        """Test the caption is written atomically, at most every write interval."""
+        live_caption = LiveCaption(self.filepath)
+        mock_time.return_value = 1000
+        with patch("os.replace", wraps=os.replace) as mock_replace:
+            live_caption.add_result(get_result("bonjour"))
+            live_caption.write()
+            live_caption.add_result(get_result("tout"))
+            live_caption.write()
+            self.assertEqual(mock_replace.call_count, 1)
+            self.assertEqual(self.read_caption(), "bonjour")
+            # forced or after the interval
+            live_caption.write(force=True)
+            self.assertEqual(self.read_caption(), "bonjour tout")
+            live_caption.add_result(get_result("le monde"))
+            mock_time.return_value = 1000 + live_transcript.__WRITE_INTERVAL__
+            live_caption.write()
+            # an unchanged caption is not written again
+            live_caption.write(force=True)
+            self.assertEqual(mock_replace.call_count, 3)
+        tmp_path, path = mock_replace.call_args[0]
+        self.assertEqual(os.path.dirname(tmp_path), self.dirpath)
+        self.assertEqual(path, self.filepath)
+        self.assertEqual(os.listdir(self.dirpath), ["live.vtt"])
+        self.assertEqual(self.read_caption(), "bonjour tout le monde")
+        print(" --->  test_throttled_write: OK!")
+
+    def test_feed_recognizer(self):
+        """Test the decoder output is fed by bytes and the final result written."""
+        rec = MagicMock()
+        rec.AcceptWaveform.side_effect = [True, False]
+        rec.Result.return_value = get_result("bonjour")
+        rec.PartialResult.return_value = json.dumps({"partial": "tout"})
+        rec.FinalResult.return_value = get_result("tout", "le", "monde")
+        live_caption = LiveCaption(self.filepath)
+        feed_recognizer(get_process(b"a" * 4010), rec, live_caption, 0)
+        self.assertEqual(
+            [type(call[0][0]) for call in rec.AcceptWaveform.call_args_list],
+            [bytes, bytes],
+        )
+        self.assertEqual(
+            [len(call[0][0]) for call in rec.AcceptWaveform.call_args_list], [4000, 10]
+        )
+        self.assertEqual(self.read_caption(), "bonjour tout le monde")
+        print(" --->  test_feed_recognizer: OK!")
+
+    @patch("pod.live.live_transcript.time.sleep")
+    @patch("pod.live.live_transcript.Model")
+    @patch("pod.live.live_transcript.KaldiRecognizer")
+    @patch("pod.live.live_transcript.subprocess.Popen")
+    def test_transcribe_continuous(self, mock_popen, mock_rec, mock_model, mock_sleep):
+        """Test the decoder is restarted until the transcription is stopped."""
+        rec = mock_rec.return_value
+        rec.Result.return_value = get_result("bonjour")
+        rec.FinalResult.return_value = get_result()
+
+        def stop(data):
+            # the live is stopped while the second decoder is running
+            if mock_popen.call_count == 2:
+                live_transcript.threads_to_stop.append(threading.get_ident())
+            return True
+
+        rec.AcceptWaveform.side_effect = stop
+        processes = [get_process(b"a" * 100), get_process(b"b" * 8000)]
+        mock_popen.side_effect = processes
+        live_transcript.transcribe_continuous(
+            "http://live/stream.m3u8", "live", "model", self.filepath
+        )
+        self.assertEqual(mock_popen.call_count, 2)
+        self.assertEqual(rec.AcceptWaveform.call_count, 2)
+        mock_sleep.assert_called_once_with(1)
+        for process in processes:
+            process.kill.assert_called_once()
+        self.assertNotIn(threading.get_ident(), live_transcript.threads_to_stop)
+        # the caption is emptied at the end of the live
+        self.assertEqual(self.read_caption(), "")
+        print(" --->  test_transcribe_continuous: OK!")
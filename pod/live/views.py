@@ -10,12 +10,14 @@ from datetime import datetime
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import User
 from django.contrib.sites.shortcuts import get_current_site
 from django.core.exceptions import PermissionDenied
 from django.core.exceptions import SuspiciousOperation
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
 from django.db.models import Prefetch
 from django.http import (
+    Http404,
     HttpResponse,
     HttpResponseBadRequest,
     JsonResponse,
@@ -36,10 +38,10 @@ from .forms import EventPasswordForm, EventForm, EventDeleteForm, EventImmediate
 from .models import (
     Building,
     Broadcaster,
-    HeartBeat,
     Event,
     get_available_broadcasters_of_building,
 )
+from .heartbeat import count_event_viewers, get_current_events, get_event_owners
 from .pilotingInterface import (
     get_piloting_implementation,
     CREATE_VIDEO_FROM_FTP,
@@ -178,14 +180,15 @@ def heartbeat(request):
 
 def manage_heartbeat(broadcaster_id, event_id, key, current_user):
     mimetype = "application/json"
-    current_event = None
 
     # Admin's supervision only
     if broadcaster_id is not None:
         # find current event with broadcaster id
-        Event.objects.filter()
-        query = Event.objects.filter(broadcaster_id=broadcaster_id)
-        ids = [evt.id for evt in query if evt.is_current()]
+        ids = list(
+            get_current_events(broadcaster_id=broadcaster_id).values_list(
+                "id", flat=True
+            )[:2]
+        )
 
         # no current event
         if len(ids) != 1:
@@ -198,39 +201,31 @@ def manage_heartbeat(broadcaster_id, event_id, key, current_user):
                 ),
                 mimetype,
             )
-
-        current_event = get_object_or_404(Event, id=ids[0])
+        current_event_id = ids[0]
+        heartbeats_count = count_event_viewers(current_event_id)
 
     # save viewer's heartbeat
     if event_id is not None:
-        current_event = get_object_or_404(Event, id=event_id)
-        viewer_heartbeat, created = HeartBeat.objects.get_or_create(
-            viewkey=key, event_id=event_id
-        )
-        if created and not current_user.is_anonymous:
-            viewer_heartbeat.user = current_user
-        viewer_heartbeat.last_heartbeat = timezone.now()
-        viewer_heartbeat.save()
-
-    viewers = current_event.viewers.values("first_name", "last_name", "is_superuser")
-
-    can_see = (
-        current_user.is_superuser
-        or current_user == current_event.owner
-        or current_user in current_event.additional_owners.all()
+        current_event_id = event_id
+        if get_event_owners(event_id) is None:
+            raise Http404("No Event matches the given query.")
+        heartbeats_count = count_event_viewers(event_id, key, current_user)
+
+    can_see = current_user.is_superuser or (
+        current_user.is_authenticated
+        and current_user.id in get_event_owners(current_event_id)
     )
-
-    heartbeats_count = HeartBeat.objects.filter(event_id=current_event.id).count()
-
-    if current_event.max_viewers < heartbeats_count:
-        current_event.max_viewers = heartbeats_count
-        current_event.save()
+    viewers = []
+    if can_see:
+        viewers = User.objects.filter(viewers_events__id=current_event_id).values(
+            "first_name", "last_name", "is_superuser"
+        )
 
     return HttpResponse(
         json.dumps(
             {
                 "viewers": heartbeats_count,
-                "viewers_list": list(viewers) if can_see else [],
+                "viewers_list": list(viewers),
             }
         ),
         mimetype,
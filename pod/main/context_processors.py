@@ -1,10 +1,7 @@
 from django.conf import settings as django_settings
 from django.core.exceptions import ImproperlyConfigured
 
-from pod.main.models import LinkFooter, Block
-from django.core.exceptions import ObjectDoesNotExist
-
-from pod.main.models import Configuration
+from pod.main.site_cache import get_blocks, get_configurations, get_link_footers
 from django.contrib.sites.shortcuts import get_current_site
 from django.utils.translation import ugettext_lazy as _
 
@@ -86,24 +83,11 @@ WEBTV_MODE = getattr(django_settings, "WEBTV_MODE", False)
 
 def context_settings(request):
     """Return all context settings."""
-    maintenance_mode = False
-    maintenance_text_short = ""
-    maintenance_sheduled = False
-    maintenance_text_sheduled = ""
-    try:
-        maintenance_mode = Configuration.objects.get(key="maintenance_mode")
-        maintenance_mode = True if maintenance_mode.value == "1" else False
-        maintenance_text_short = Configuration.objects.get(
-            key="maintenance_text_short"
-        ).value
-
-        maintenance_sheduled = Configuration.objects.get(key="maintenance_sheduled")
-        maintenance_sheduled = True if (maintenance_sheduled.value == "1") else False
-        maintenance_text_sheduled = Configuration.objects.get(
-            key="maintenance_text_sheduled"
-        ).value
-    except ObjectDoesNotExist:
-        pass
+    configurations = get_configurations()
+    maintenance_mode = configurations.get("maintenance_mode") == "1"
+    maintenance_text_short = configurations.get("maintenance_text_short", "")
+    maintenance_sheduled = configurations.get("maintenance_sheduled") == "1"
+    maintenance_text_sheduled = configurations.get("maintenance_text_sheduled", "")
 
     new_settings = {}
     for sett in TEMPLATE_VISIBLE_SETTINGS:
@@ -147,9 +131,8 @@ def context_settings(request):
 
 
 def context_footer(request):
-    link_footer = LinkFooter.objects.all().filter(sites=get_current_site(request))
     return {
-        "LINK_FOOTER": link_footer,
+        "LINK_FOOTER": get_link_footers(get_current_site(request)),
     }
 
 
@@ -164,9 +147,6 @@ def context_block(request):
         dict[str, Any]: A dictionary containing the context with the key "BLOCK"
                        associated with the sorted list of blocks.
     """
-    block = Block.objects.filter(sites=get_current_site(request), visible=True).order_by(
-        "order"
-    )
     return {
-        "BLOCK": block,
+        "BLOCK": get_blocks(get_current_site(request)),
     }
@@ -0,0 +1,39 @@
+"""Esup-Pod - Report the state of the site configuration cache.
+
+*  run with 'python manage.py site_cache [--clear]'
+"""
+
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from pod.main.site_cache import SITE_CACHE_VERSION_KEY, site_cache
+
+
+class Command(BaseCommand):
+    """Report which site configuration values are in the shared cache."""
+
+    help = "Report the state of the cached configuration, footer links and blocks."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            default=False,
+            help="Invalidate the cached values of all processes.",
+        )
+
+    def handle(self, *args, **options):
+        """Handle a site_cache command call."""
+        if options["clear"]:
+            site_cache.invalidate()
+        version = site_cache.get_version()
+        self.stdout.write(
+            "%s: %s" % (SITE_CACHE_VERSION_KEY, cache.get(SITE_CACHE_VERSION_KEY, 0))
+        )
+        names = ["configuration"]
+        for site in Site.objects.all():
+            names += ["link_footer_%s" % site.id, "block_%s" % site.id]
+        for name in names:
+            cached = cache.get("site_cache_%s_%s" % (version, name)) is not None
+            self.stdout.write(" %s: %s" % (name, "cached" if cached else "not cached"))
@@ -8,7 +8,7 @@ from django.contrib.sites.models import Site
 from django.core.exceptions import ValidationError
 from django.template.defaultfilters import slugify
 from django.dispatch import receiver
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.db.models import Max
 import os
 import mimetypes
@@ -367,3 +367,16 @@ def default_site_block(sender, instance, created: bool, **kwargs) -> None:
     """Set a default site for the instance if it has no associated sites upon creation."""
     if instance.sites.count() == 0:
         instance.sites.add(Site.objects.get_current())
+
+
+@receiver([post_save, post_delete], sender=Configuration)
+@receiver([post_save, post_delete], sender=LinkFooter)
+@receiver([post_save, post_delete], sender=Block)
+@receiver(m2m_changed, sender=LinkFooter.sites.through)
+@receiver(m2m_changed, sender=Block.sites.through)
+def site_cache_invalidation(sender, **kwargs) -> None:
+    """Invalidate the cached configuration, footer links and blocks."""
+    from pod.main.site_cache import site_cache
+
+    if kwargs.get("action", "post").startswith("post"):
+        site_cache.changed()
@@ -0,0 +1,131 @@
+"""Esup-Pod two-tier cache of the site configuration.
+
+The Configuration values, the footer links and the blocks of each site are
+kept in process memory and in the shared Django cache (Redis). Saving or
+deleting one of them changes a version stored in the shared cache, the
+processes read it at most every SITE_CACHE_VERSION_CHECK seconds. While a
+change is not committed, the thread reads the database and the version is
+changed again on commit or rollback.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from pod.main.models import Block, Configuration, LinkFooter
+
+SITE_CACHE_TIMEOUT = getattr(settings, "SITE_CACHE_TIMEOUT", 3600)
+SITE_CACHE_VERSION_CHECK = getattr(settings, "SITE_CACHE_VERSION_CHECK", 5)
+
+SITE_CACHE_VERSION_KEY = "site_cache_version"
+
+
+class SiteCache:
+    """Process memory tier of the site configuration cache."""
+
+    def __init__(self):
+        self.version = None
+        self.checked_at = 0
+        self.values = {}
+        self.stats = {"local": 0, "shared": 0, "miss": 0}
+        # changes not yet committed by the transaction of the thread
+        self.pending = threading.local()
+
+    def get_version(self) -> int:
+        """Get the version of the cached values, clearing the memory if changed."""
+        if time.monotonic() - self.checked_at > SITE_CACHE_VERSION_CHECK:
+            version = cache.get(SITE_CACHE_VERSION_KEY, 0)
+            if version != self.version:
+                self.values = {}
+                self.version = version
+            self.checked_at = time.monotonic()
+        return self.version
+
+    def is_pending(self) -> bool:
+        """Return True while the thread transaction has uncommitted changes."""
+        if not getattr(self.pending, "value", False):
+            return False
+        if connection.in_atomic_block:
+            return True
+        # the transaction has been rolled back
+        self.pending.value = False
+        self.invalidate()
+        return False
+
+    def get(self, name: str, loader):
+        """Get a value from memory, the shared cache or its loader."""
+        if self.is_pending():
+            return loader()
+        key = "site_cache_%s_%s" % (self.get_version(), name)
+        value = self.values.get(key)
+        if value is not None:
+            self.stats["local"] += 1
+            return value
+        value = cache.get(key)
+        if value is None:
+            self.stats["miss"] += 1
+            value = loader()
+            cache.set(key, value, timeout=SITE_CACHE_TIMEOUT)
+        else:
+            self.stats["shared"] += 1
+        self.values[key] = value
+        return value
+
+    def invalidate(self) -> None:
+        """Change the version of the cached values of all processes."""
+        try:
+            cache.incr(SITE_CACHE_VERSION_KEY)
+        except ValueError:
+            cache.set(SITE_CACHE_VERSION_KEY, 1, timeout=None)
+        self.checked_at = 0
+
+    def changed(self) -> None:
+        """Invalidate the cached values now and when the transaction is committed."""
+        self.invalidate()
+        if connection.in_atomic_block:
+            self.pending.value = True
+            transaction.on_commit(self.committed)
+
+    def committed(self) -> None:
+        """Invalidate the values cached by other processes before the commit."""
+        self.pending.value = False
+        self.invalidate()
+
+
+site_cache = SiteCache()
+
+
+def get_configurations() -> dict:
+    """Get the value of each Configuration key."""
+    return site_cache.get(
+        "configuration",
+        lambda: dict(Configuration.objects.values_list("key", "value")),
+    )
+
+
+def get_configuration(key: str, default: str = "") -> str:
+    """Get the value of a Configuration key."""
+    return get_configurations().get(key, default)
+
+
+def get_link_footers(site) -> list:
+    """Get the footer links of the site."""
+    return site_cache.get(
+        "link_footer_%s" % site.id,
+        lambda: list(LinkFooter.objects.filter(sites=site).select_related("page")),
+    )
+
+
+def get_blocks(site) -> list:
+    """Get the visible blocks of the site, sorted by order."""
+    return site_cache.get(
+        "block_%s" % site.id,
+        lambda: list(
+            Block.objects.filter(sites=site, visible=True)
+            .select_related("page", "Channel", "Theme", "Playlist")
+            .order_by("order")
+        ),
+    )
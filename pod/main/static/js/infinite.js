@@ -74,6 +74,8 @@ class InfiniteLoader {
   ) {
     this.infinite_loading = document.querySelector(".infinite-loading");
     this.videos_list = document.getElementById("videos_list");
+    // keyset pagination cursor of the next page, if any
+    this.cursor = this.videos_list.dataset.cursor;
     this.next_page_number = page;
     this.current_page_number = page - 1;
     this.nextPage = nextPage;
@@ -106,6 +108,7 @@ class InfiniteLoader {
           this.nextPage = false;
         }
         this.nextPage = html.getElementById("videos_list").dataset.nextpage;
+        this.cursor = html.getElementById("videos_list").dataset.cursor;
         let element = this.videos_list;
 
         element.innerHTML += html.getElementById("videos_list").innerHTML;
@@ -135,6 +138,9 @@ class InfiniteLoader {
     if (!url) return;
     if (nextPage == "false") return;
     url = url + page;
+    if (this.cursor) {
+      url = url + "&cursor=" + encodeURIComponent(this.cursor);
+    }
     const response = await fetch(url, {
       method: "GET",
       headers: {
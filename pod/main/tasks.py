@@ -1,9 +1,23 @@
 """Esup-Pod main tasks."""
 
+from celery.signals import worker_process_init
+from django.conf import settings
+
 from pod.main.celery import app
 from pod.live.models import LiveTranscriptRunningTask, Broadcaster
 
 
+@worker_process_init.connect
+def warm_transcript_models(**kwargs) -> None:
+    """Load the TRANSCRIPTION_MODEL_PRELOAD models when a worker process starts."""
+    if getattr(settings, "USE_TRANSCRIPTION", False) and getattr(
+        settings, "TRANSCRIPTION_MODEL_PRELOAD", []
+    ):
+        from pod.video_encode_transcript.transcript_model import warm_model_cache
+
+        warm_model_cache()
+
+
 @app.task(bind=True)
 def task_start_encode(self, video_id: int) -> None:
     """Start video encoding with Celery."""
@@ -22,6 +36,14 @@ def task_start_transcript(self, video_id: int) -> None:
     main_threaded_transcript(video_id)
 
 
+@app.task(bind=True)
+def task_update_index(self, video_ids: list) -> None:
+    """Update the search index of the videos with Celery."""
+    from pod.video_search.models import update_video_index_es
+
+    update_video_index_es(video_ids)
+
+
 @app.task(bind=True)
 def task_start_encode_studio(
     self, recording_id: int, video_output, videos, subtime, presenter
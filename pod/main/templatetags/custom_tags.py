@@ -2,7 +2,7 @@
 
 from django import template
 from django.conf import settings
-from pod.main.models import Configuration
+from pod.main.site_cache import get_configuration
 import json
 
 from urllib.parse import urlparse, urlunparse, parse_qs
@@ -19,7 +19,7 @@ def get_setting(name, default=""):
 @register.simple_tag
 def get_maintenance_welcome():
     """Return Welcome text for maintenance."""
-    return Configuration.objects.get(key="maintenance_text_welcome").value
+    return get_configuration("maintenance_text_welcome")
 
 
 @register.simple_tag
@@ -11,13 +11,14 @@ from django import template
 from django.conf import settings
 from django.contrib.sites.shortcuts import get_current_site
 from django.core.cache import cache
-from django.db.models import Q, Sum
+from django.db.models import OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.template import loader
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
 from pod.live.models import Event
-from pod.video.models import Video
+from pod.video.models import Video, ViewCount
 from pod.playlist.models import PlaylistContent
 
 register = template.Library()
@@ -236,12 +237,21 @@ def render_most_view(uniq_id, params, current_site, debug_elts):
     debug_elts.append("Call function render_most_view")
 
     d = date.today() - timezone.timedelta(days=VIDEO_RECENT_VIEWCOUNT)
-    query = Video.objects.filter(
-        Q(encoding_in_progress=False)
-        & Q(is_draft=False)
-        & Q(viewcount__date__gte=d)
-        & Q(sites=current_site)
-    ).annotate(nombre=Sum("viewcount"))
+    recent_views = (
+        ViewCount.objects.filter(video=OuterRef("pk"), date__gte=d)
+        .values("video")
+        .annotate(nombre=Sum("count"))
+        .values("nombre")
+    )
+    query = (
+        Video.objects.filter(
+            Q(encoding_in_progress=False) & Q(is_draft=False) & Q(sites=current_site)
+        )
+        .select_related("viewcounttotal")
+        # the daily views are only summed for the videos without rollups yet
+        .annotate(nombre=Coalesce("viewcounttotal__recent", Subquery(recent_views)))
+        .filter(nombre__gt=0)
+    )
 
     query = add_filter(params, debug_elts, query)
 
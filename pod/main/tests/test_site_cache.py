@@ -0,0 +1,65 @@
+"""Unit tests for the site configuration cache.
+
+*  run with `python manage.py test pod.main.tests.test_site_cache`
+"""
+
+from unittest.mock import patch
+
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.test import TestCase
+
+from pod.main.models import Configuration, LinkFooter
+from pod.main.site_cache import (
+    get_configuration,
+    get_configurations,
+    get_link_footers,
+    site_cache,
+)
+
+
+class SiteCacheTestCase(TestCase):
+    """Test the two-tier cache of the configuration, footer links and blocks."""
+
+    fixtures = [
+        "initial_data.json",
+    ]
+
+    def setUp(self):
+        """Start with empty caches and no pending change."""
+        cache.clear()
+        site_cache.pending.value = False
+        site_cache.checked_at = 0
+
+    def test_cached_configuration(self):
+        """Test the configuration is read once then from memory."""
+        self.assertEqual(get_configuration("maintenance_mode"), "0")
+        get_link_footers(Site.objects.get_current())
+        with self.assertNumQueries(0):
+            get_configurations()
+            get_link_footers(Site.objects.get_current())
+        self.assertGreater(site_cache.stats["local"], 0)
+        print(" --->  test_cached_configuration: OK!")
+
+    def test_uncommitted_change(self):
+        """Test the database is read while a change is not committed."""
+        get_link_footers(Site.objects.get_current())
+        conf = Configuration.objects.get(key="maintenance_mode")
+        conf.value = "1"
+        conf.save()
+        self.assertTrue(site_cache.is_pending())
+        self.assertEqual(get_configuration("maintenance_mode"), "1")
+        link = LinkFooter.objects.create(title="link", url="https://pod.localhost")
+        self.assertIn(link, get_link_footers(Site.objects.get_current()))
+        print(" --->  test_uncommitted_change: OK!")
+
+    def test_rollback(self):
+        """Test the cached values are invalidated after a rollback."""
+        conf = Configuration.objects.get(key="maintenance_mode")
+        conf.save()
+        version = cache.get("site_cache_version")
+        with patch("pod.main.site_cache.connection") as connection:
+            connection.in_atomic_block = False
+            self.assertFalse(site_cache.is_pending())
+        self.assertEqual(cache.get("site_cache_version"), version + 1)
+        print(" --->  test_rollback: OK!")
@@ -41,7 +41,7 @@ import os
 import mimetypes
 import json
 from django.contrib.auth.decorators import login_required
-from .models import Configuration
+from .site_cache import get_configuration
 from honeypot.decorators import check_honeypot
 
 
@@ -96,9 +96,7 @@ LOGIN_URL = getattr(settings, "LOGIN_URL", "/authentication_login/")
 
 def in_maintenance():
     """Return true if maintenance_mode is ON."""
-    return (
-        True if Configuration.objects.get(key="maintenance_mode").value == "1" else False
-    )
+    return get_configuration("maintenance_mode") == "1"
 
 
 @csrf_protect
@@ -359,7 +357,7 @@ def user_autocomplete(request):
 
 def maintenance(request):
     """Render the maintenance page with configured text."""
-    text = Configuration.objects.get(key="maintenance_text_disabled").value
+    text = get_configuration("maintenance_text_disabled")
     return render(request, "maintenance.html", {"text": text})
 
 
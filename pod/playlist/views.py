@@ -19,6 +19,7 @@ from django.db import transaction
 from pod.main.utils import is_ajax
 from pod.main.views import in_maintenance
 from pod.video.views import CURSUS_CODES, get_owners_has_instances
+from pod.video.card import annotate_cards
 from pod.video.models import Video
 from pod.video.utils import sort_videos_list
 
@@ -46,7 +47,6 @@ import json
 import hashlib
 from typing import List
 
-
 TEMPLATE_VISIBLE_SETTINGS = getattr(
     settings,
     "TEMPLATE_VISIBLE_SETTINGS",
@@ -253,7 +253,8 @@ def render_playlist(
             .replace("?page=%s" % page, "")
             .replace("&page=%s" % page, "")
         )
-    paginator = Paginator(videos_list, 12)
+    paginator = Paginator(annotate_cards(videos_list), 12)
+    paginator.count = count_videos
     try:
         videos = paginator.page(page)
     except PageNotAnInteger:
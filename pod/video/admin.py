@@ -252,7 +252,8 @@ class VideoAdmin(admin.ModelAdmin):
     transcript_video.short_description = _("Transcript selected")
 
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
+        # the viewcount column is read from ViewCountTotal
+        qs = super().get_queryset(request).select_related("viewcounttotal")
         if not request.user.is_superuser:
             qs = qs.filter(sites=get_current_site(request))
         return qs
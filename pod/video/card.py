@@ -0,0 +1,67 @@
+"""Esup-Pod video cards.
+
+The list views annotate the videos with the presence of a quiz and of
+chapters and join their thumbnail, so a page of cards is read in one query.
+The header and the thumbnail of the card of each video are cached per
+language until the video, its thumbnail, its quiz or its chapters change.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+from django.template.loader import render_to_string
+from django.utils.translation import get_language
+
+from pod.chapter.models import Chapter
+from pod.quiz.models import Quiz
+
+VIDEO_CARD_CACHE_TIMEOUT = getattr(settings, "VIDEO_CARD_CACHE_TIMEOUT", 86400)
+
+
+def annotate_cards(videos):
+    """Annotate the videos with the data displayed in their card."""
+    return videos.select_related("thumbnail").annotate(
+        has_quiz=Exists(Quiz.objects.filter(video=OuterRef("pk"))),
+        has_chapters=Exists(Chapter.objects.filter(video=OuterRef("pk"))),
+    )
+
+
+def get_card_key(video_id: int, language: str) -> str:
+    """Get the cache key of the card of a video in a language."""
+    return "video_card_%s_%s" % (video_id, language)
+
+
+def invalidate_cards(video_ids) -> None:
+    """Remove the cached cards of the videos in all languages."""
+    cache.delete_many(
+        [
+            get_card_key(video_id, language)
+            for video_id in video_ids
+            for language, name in settings.LANGUAGES
+        ]
+    )
+
+
+def render_card(video) -> dict:
+    """Render the header and the thumbnail of the card of a video."""
+    has_quiz = getattr(video, "has_quiz", None)
+    if has_quiz is None:
+        has_quiz = Quiz.objects.filter(video=video).exists()
+    has_chapters = getattr(video, "has_chapters", None)
+    if has_chapters is None:
+        has_chapters = Chapter.objects.filter(video=video).exists()
+    header = render_to_string(
+        "videos/card_header.html",
+        {"video": video, "has_quiz": has_quiz, "has_chapters": has_chapters},
+    )
+    return {"header": header, "thumbnail": video.get_thumbnail_card()}
+
+
+def get_card(video) -> dict:
+    """Get the header and the thumbnail of the card of a video, cached."""
+    key = get_card_key(video.id, get_language())
+    card = cache.get(key)
+    if card is None:
+        card = render_card(video)
+        cache.set(key, card, timeout=VIDEO_CARD_CACHE_TIMEOUT)
+    return card
@@ -0,0 +1,118 @@
+"""Esup-Pod Dublin Core export.
+
+The export is streamed by chunks of videos. The rendered record of each video
+is cached by site and language until the video, its contributors, its
+disciplines, its type or the name of its owner change. The
+records are exported by id: a page can be requested with the page and
+page_size parameters, or the next one with the resumption token given in the
+X-Resumption-Token header of the previous response.
+"""
+
+import base64
+import json
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.translation import get_language
+
+from pod.main.utils import remove_trailing_spaces
+
+from .models import Video
+
+DUBLIN_CORE_CACHE_TIMEOUT = getattr(settings, "DUBLIN_CORE_CACHE_TIMEOUT", 86400)
+DUBLIN_CORE_CHUNK_SIZE = getattr(settings, "DUBLIN_CORE_CHUNK_SIZE", 100)
+DUBLIN_CORE_MAX_PAGE_SIZE = 1000
+
+DUBLIN_CORE_HEADER = (
+    '<?xml version="1.0" encoding="utf-8"?>\n'
+    "<!DOCTYPE rdf:RDF PUBLIC "
+    '"-//DUBLIN CORE//DCMES DTD 2002/07/31//EN" \n'
+    '"http://dublincore.org/documents/2002/07'
+    '/31/dcmes-xml/dcmes-xml-dtd.dtd">\n'
+    "<rdf:RDF xmlns:rdf="
+    '"http://www.w3.org/1999/02/22-rdf-syntax-ns#"'
+    ' xmlns:dc ="http://purl.org/dc/elements/1.1/">\n'
+)
+DUBLIN_CORE_FOOTER = "</rdf:RDF>"
+
+# request parameters which are not video filters
+PAGING_PARAMETERS = ("page", "page_size", "resumptionToken", "format")
+
+
+def get_record_key(video_id: int, site_id: int, language: str) -> str:
+    """Get the cache key of the Dublin Core record of a video on a site in a language."""
+    return "dublincore_record_%s_%s_%s" % (site_id, video_id, language)
+
+
+def invalidate_dublin_core(video_ids) -> None:
+    """Remove the cached Dublin Core records of the videos on all sites and languages."""
+    site_ids = list(Site.objects.values_list("id", flat=True))
+    cache.delete_many(
+        [
+            get_record_key(video_id, site_id, language)
+            for video_id in video_ids
+            for site_id in site_ids
+            for language, name in settings.LANGUAGES
+        ]
+    )
+
+
+def render_record(video) -> str:
+    """Render the Dublin Core record of a video."""
+    rendered = render_to_string("videos/dublincore.html", {"video": video, "xml": True})
+    return remove_trailing_spaces(rendered) + "\n"
+
+
+def get_records(video_ids: list) -> list:
+    """Get the records of the videos, rendering and caching the missing ones."""
+    site_id = Site.objects.get_current().id
+    language = get_language()
+    keys = {
+        video_id: get_record_key(video_id, site_id, language) for video_id in video_ids
+    }
+    cached = cache.get_many(keys.values())
+    missing = [video_id for video_id in video_ids if keys[video_id] not in cached]
+    if missing:
+        rendered = {
+            keys[video.id]: render_record(video)
+            for video in Video.objects.filter(id__in=missing)
+            .select_related("type", "owner")
+            .prefetch_related("contributor_set", "discipline")
+        }
+        cache.set_many(rendered, timeout=DUBLIN_CORE_CACHE_TIMEOUT)
+        cached.update(rendered)
+    return [cached[keys[video_id]] for video_id in video_ids if keys[video_id] in cached]
+
+
+def stream_dublin_core(video_ids: list):
+    """Yield the Dublin Core XML document of the videos, by chunks."""
+    yield DUBLIN_CORE_HEADER
+    for start in range(0, len(video_ids), DUBLIN_CORE_CHUNK_SIZE):
+        chunk = video_ids[start : start + DUBLIN_CORE_CHUNK_SIZE]
+        yield "".join(get_records(chunk))
+    yield DUBLIN_CORE_FOOTER
+
+
+def encode_resumption_token(filters: dict, after: int, page_size: int) -> str:
+    """Get the token to resume the export after the given video id."""
+    data = json.dumps({"filters": filters, "after": after, "page_size": page_size})
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii")
+
+
+def decode_resumption_token(token: str):
+    """Get the filters, the last video id and the page size of a token."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        return dict(data["filters"]), int(data["after"]), int(data["page_size"])
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def get_page_size(value) -> int:
+    """Get the page size of a request parameter, within the allowed range."""
+    try:
+        return min(max(int(value), 1), DUBLIN_CORE_MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return DUBLIN_CORE_MAX_PAGE_SIZE
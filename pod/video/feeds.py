@@ -1,7 +1,12 @@
 """Esup-Pod video feeds."""
 
 from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.db.models import Count, Max, Prefetch
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
 from django.utils.feedgenerator import Rss201rev2Feed
+from django.utils.http import http_date, quote_etag
 
 # from datetime import datetime
 from django.conf import settings
@@ -10,15 +15,14 @@ from django.contrib.sites.shortcuts import get_current_site
 from django.urls import reverse
 from django.shortcuts import get_object_or_404
 
-from .context_processors import get_available_videos
+from .context_processors import get_available_videos, get_video_data_version
 
-from pod.video_encode_transcript.models import EncodingAudio
+from pod.video_encode_transcript.models import EncodingAudio, EncodingVideo
 from pod.video.models import Channel
 from pod.video.models import Theme
 
+import hashlib
 import re
-import os
-
 
 ##
 # Settings exposed in templates
@@ -65,6 +69,7 @@ DEFAULT_DC_COVERAGE = getattr(
 )
 DEFAULT_DC_RIGHTS = getattr(settings, "DEFAULT_DC_RIGHT", "BY-NC-SA")
 VIDEO_FEED_NB_ITEMS = getattr(settings, "VIDEO_FEED_NB_ITEMS", 100)
+CACHE_VIDEO_DEFAULT_TIMEOUT = getattr(settings, "CACHE_VIDEO_DEFAULT_TIMEOUT", 600)
 
 
 class RssFeedGenerator(Rss201rev2Feed):
@@ -125,6 +130,53 @@ class RssSiteVideosFeed(Feed):
     prefix = "https"
     image_url = ""
 
+    def __call__(self, request, *args, **kwargs):
+        """Return the feed, from the cache, or a 304 response if not modified."""
+        last_modified, etag = self.get_feed_state(request, *args, **kwargs)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            key = "rss_feed_%s" % etag.strip('"')
+            content = cache.get(key)
+            if content is None:
+                response = super(RssSiteVideosFeed, self).__call__(
+                    request, *args, **kwargs
+                )
+                content = (response.content, response["Content-Type"])
+                cache.set(key, content, timeout=CACHE_VIDEO_DEFAULT_TIMEOUT)
+            response = HttpResponse(content[0], content_type=content[1])
+        response["ETag"] = etag
+        if last_modified:
+            response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def get_feed_state(self, request, *args, **kwargs):
+        """Get the date of the newest video of the feed and the feed ETag.
+
+        The ETag changes with the newest video, the number of videos and the
+        version of the video data, changed when a video is saved or deleted.
+        """
+        state = (
+            self.get_object(request, *args, **kwargs)
+            .order_by()
+            .aggregate(newest=Max("date_added"), count=Count("id"))
+        )
+        data = "-".join(
+            str(value)
+            for value in (
+                self.__class__.__name__,
+                request.build_absolute_uri(),
+                state["newest"],
+                state["count"],
+                get_video_data_version(),
+            )
+        )
+        etag = hashlib.sha1(data.encode("utf-8")).hexdigest()
+        # whole seconds, as the If-Modified-Since date it is compared to
+        newest = int(state["newest"].timestamp()) if state["newest"] else None
+        return newest, quote_etag(etag)
+
     def feed_extra_kwargs(self, obj):
         if obj and self.image_url == "":
             self.image_url = "".join(
@@ -184,7 +236,33 @@ class RssSiteVideosFeed(Feed):
         return videos_list
 
     def items(self, obj):
-        return obj.order_by("-date_added")[:VIDEO_FEED_NB_ITEMS]
+        mp4 = EncodingVideo.objects.filter(encoding_format="video/mp4")
+        return (
+            obj.defer(None)
+            .select_related("owner", "type", "thumbnail")
+            .prefetch_related(
+                Prefetch(
+                    "encodingvideo_set",
+                    queryset=mp4.select_related("rendition"),
+                    to_attr="feed_mp4",
+                ),
+                Prefetch(
+                    "encodingaudio_set",
+                    queryset=EncodingAudio.objects.filter(name="audio"),
+                    to_attr="feed_audio",
+                ),
+            )
+            .order_by("-date_added")[:VIDEO_FEED_NB_ITEMS]
+        )
+
+    def get_enclosure(self, item):
+        """Get the encoding of the item enclosure, the smallest mp4 or the m4a."""
+        if item.feed_mp4:
+            return min(item.feed_mp4, key=lambda mp4: mp4.height)
+        for audio in item.feed_audio:
+            if audio.encoding_format == "video/mp4":
+                return audio
+        return None
 
     def item_title(self, item) -> str:
         sub = re.sub(r"[\x00-\x08\x0B-\x0C\x0E-\x1F]", "", item.title)
@@ -226,29 +304,19 @@ class RssSiteVideosFeed(Feed):
     def item_enclosure_url(self, item) -> str:
         if (item.password is not None) or item.is_restricted:
             return ""
-        if item.get_video_mp4().count() > 0:
-            mp4 = sorted(item.get_video_mp4(), key=lambda m: m.height)[0]
-            return "".join([self.author_link, mp4.source_file.url])
-        elif item.get_video_m4a():
-            return "".join([self.author_link, item.get_video_m4a().source_file.url])
+        enclosure = self.get_enclosure(item)
+        if enclosure:
+            return "".join([self.author_link, enclosure.source_file.url])
         return ""
 
     def item_enclosure_mime_type(self, item):
-        if item.get_video_mp4().count() > 0 or item.get_video_m4a():
+        if self.get_enclosure(item):
             return "video/mp4"
         return ""
 
     def item_enclosure_length(self, item):
-        if item.get_video_mp4().count() > 0:
-            mp4 = sorted(item.get_video_mp4(), key=lambda m: m.height)[0]
-            return mp4.source_file.size if (os.path.isfile(mp4.source_file.path)) else 0
-        elif item.get_video_m4a():
-            return (
-                item.get_video_m4a().source_file.size
-                if (os.path.isfile(item.get_video_m4a().source_file.path))
-                else 0
-            )
-        return ""
+        enclosure = self.get_enclosure(item)
+        return enclosure.size if enclosure else ""
 
     def item_categories(self, item) -> tuple:
         return (item.type,)
@@ -258,28 +326,12 @@ class RssSiteVideosFeed(Feed):
 
 
 class RssSiteAudiosFeed(RssSiteVideosFeed):
-    def item_enclosure_url(self, item) -> str:
-        try:
-            mp3 = EncodingAudio.objects.get(
-                name="audio", video=item, encoding_format="audio/mp3"
-            )
-            if (item.password is not None) or item.is_restricted:
-                return ""
-            return "".join([self.author_link, mp3.source_file.url])
-        except EncodingAudio.DoesNotExist:
-            return ""
+    def get_enclosure(self, item):
+        """Get the mp3 encoding of the item enclosure."""
+        for audio in item.feed_audio:
+            if audio.encoding_format == "audio/mp3":
+                return audio
+        return None
 
     def item_enclosure_mime_type(self, item):
-        try:
-            return "audio/mpeg"
-        except EncodingAudio.DoesNotExist:
-            return ""
-
-    def item_enclosure_length(self, item):
-        try:
-            mp3 = EncodingAudio.objects.get(
-                name="audio", video=item, encoding_format="audio/mp3"
-            )
-            return mp3.source_file.size if (os.path.isfile(mp3.source_file.path)) else 0
-        except EncodingAudio.DoesNotExist:
-            return ""
+        return "audio/mpeg"
@@ -0,0 +1,160 @@
+"""Esup-Pod videos listing.
+
+The number of videos of a list is cached per filters (the site is one of
+them) and the pages are fetched with keyset pagination: the next page starts
+after the sort value and id of the last video of the previous one, given by
+the cursor parameter, so only the displayed videos are read.
+"""
+
+import base64
+import hashlib
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.core.exceptions import EmptyResultSet
+from django.db.models import F, Q
+from django.db.models.functions import Lower
+from django.utils.dateparse import parse_datetime
+
+from .card import annotate_cards
+from .context_processors import get_video_data_version
+
+CACHE_VIDEO_DEFAULT_TIMEOUT = getattr(settings, "CACHE_VIDEO_DEFAULT_TIMEOUT", 600)
+VIDEOS_PER_PAGE = 12
+
+# not null fields of Video supported by sort_videos_list
+KEYSET_SORT_FIELDS = {"date_added", "duration", "id", "order", "title"}
+
+
+class VideosPage:
+    """Page of videos with the cursor of the next page."""
+
+    def __init__(self, videos: list, number: int, paginator, cursor: str = None):
+        self.object_list = videos
+        self.number = number
+        self.paginator = paginator
+        self.cursor = cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    def has_next(self) -> bool:
+        return self.cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.number > 1
+
+    def next_page_number(self) -> int:
+        return self.number + 1
+
+
+def get_videos_count(videos_list) -> int:
+    """Get the number of videos of the list, cached per filters."""
+    try:
+        query = str(videos_list.order_by().query)
+    except EmptyResultSet:
+        return 0
+    key = "videos_count_%s_%s" % (
+        get_video_data_version(),
+        hashlib.sha1(query.encode("utf-8")).hexdigest(),
+    )
+    count = cache.get(key)
+    if count is None:
+        count = videos_list.order_by().count()
+        cache.set(key, count, timeout=CACHE_VIDEO_DEFAULT_TIMEOUT)
+    return count
+
+
+def get_paginator(videos_list, per_page: int = VIDEOS_PER_PAGE) -> Paginator:
+    """Get a paginator of the videos list using the cached count.
+
+    The videos of the pages are annotated with the data of their card.
+    """
+    paginator = Paginator(annotate_cards(videos_list), per_page)
+    paginator.count = get_videos_count(videos_list)
+    return paginator
+
+
+def encode_cursor(video) -> str:
+    """Get the cursor of the page following the video."""
+    value = video.sort_key
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    data = json.dumps([value, video.id]).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii")
+
+
+def decode_cursor(cursor: str, sort_field: str):
+    """Get the sort value and the id of the last video of the previous page."""
+    try:
+        value, video_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if sort_field == "date_added":
+            value = parse_datetime(value)
+        return (value, int(video_id)) if value is not None else None
+    except (ValueError, TypeError):
+        return None
+
+
+def get_keyset_page(paginator, sort_field: str, descending: bool, after, number: int):
+    """Get the page of the videos following the given sort value and id."""
+    sort_key = Lower(sort_field) if sort_field == "title" else F(sort_field)
+    videos_list = paginator.object_list.annotate(sort_key=sort_key)
+    if descending:
+        videos_list = videos_list.order_by("-sort_key", "-id")
+    else:
+        videos_list = videos_list.order_by("sort_key", "id")
+    if after:
+        lookup = "lt" if descending else "gt"
+        videos_list = videos_list.filter(
+            Q(**{"sort_key__%s" % lookup: after[0]})
+            | Q(sort_key=after[0], **{"id__%s" % lookup: after[1]})
+        )
+    videos = list(videos_list[: paginator.per_page + 1])
+    cursor = None
+    if len(videos) > paginator.per_page:
+        videos = videos[: paginator.per_page]
+        cursor = encode_cursor(videos[-1])
+    return VideosPage(videos, number, paginator, cursor)
+
+
+def get_page_number(request) -> int:
+    """Get the page number of the request."""
+    try:
+        return max(int(request.GET.get("page") or 1), 1)
+    except ValueError:
+        return 1
+
+
+def get_videos_page(request, videos_list, sort_field: str, sort_direction: str = ""):
+    """Get the requested page of the sorted videos list.
+
+    The first page and the pages requested with a cursor use keyset pagination
+    when sorted by a field of KEYSET_SORT_FIELDS, the others are read by offset.
+    """
+    paginator = get_paginator(videos_list)
+    number = get_page_number(request)
+    if sort_field in KEYSET_SORT_FIELDS:
+        after = None
+        if request.GET.get("cursor"):
+            after = decode_cursor(request.GET["cursor"], sort_field)
+        if number == 1 or after:
+            return get_keyset_page(
+                paginator, sort_field, not sort_direction, after, number
+            )
+    return get_offset_page(paginator, number)
+
+
+def get_offset_page(paginator, page):
+    """Return the page of the paginator, or the first or last one if invalid."""
+    try:
+        return paginator.page(page)
+    except PageNotAnInteger:
+        return paginator.page(1)
+    except EmptyPage:
+        return paginator.page(paginator.num_pages)
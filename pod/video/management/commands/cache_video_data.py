@@ -1,31 +1,24 @@
 """Esup-Pod Video data caching command."""
 
+from django.contrib.sites.models import Site
 from django.core.management.base import BaseCommand
-from django.core.cache import cache
-from pod.video.context_processors import context_video_data
-from django.core import serializers
-import json
+from pod.video.context_processors import get_cached_video_data
 
 
 class Command(BaseCommand):
     """Command to store video data in cache."""
 
     help = (
-        "Store video data in django cache: "
+        "Store video data of all sites in django cache: "
         + "types, discipline, video count and videos duration"
     )
 
     def handle(self, *args, **options):
-        """Store video data in cache."""
-        cache.delete_many(["DISCIPLINES", "VIDEOS_COUNT", "VIDEOS_DURATION", "TYPES"])
-        video_data = context_video_data(request=None)
+        """Store video data of each site in cache."""
         msg = "Successfully store video data in cache"
-        for data in video_data:
-            try:
-                msg += "\n %s: %s" % (
-                    data,
-                    json.dumps(serializers.serialize("json", video_data[data])),
-                )
-            except (TypeError, AttributeError):
+        for site in Site.objects.all():
+            video_data = get_cached_video_data(site, refresh=True)
+            msg += "\n%s:" % site.domain
+            for data in video_data:
                 msg += "\n %s: %s" % (data, video_data[data])
         self.stdout.write(self.style.SUCCESS(msg))
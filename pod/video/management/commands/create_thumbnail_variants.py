@@ -0,0 +1,39 @@
+"""Esup-Pod - Create the thumbnail variants of the existing videos.
+
+*  run with 'python manage.py create_thumbnail_variants [--workers N] [--force]'
+*  run it once after the upgrade, and after changing VIDEO_THUMBNAIL_SIZES
+"""
+
+from django.core.management.base import BaseCommand
+
+from pod.video.thumbnail import backfill_thumbnail_variants
+
+
+class Command(BaseCommand):
+    """Create the missing or outdated thumbnail variants of the videos."""
+
+    help = "Create the thumbnail variants of the videos, in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Number of thumbnails resized at the same time.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            default=False,
+            help="Create again the variants which are up to date.",
+        )
+
+    def handle(self, *args, **options):
+        """Handle a create_thumbnail_variants command call."""
+        nb_videos, nb_errors = backfill_thumbnail_variants(
+            max(options["workers"], 1), options["force"]
+        )
+        msg = "Thumbnail variants of %s video(s) created." % (nb_videos - nb_errors)
+        self.stdout.write(self.style.SUCCESS(msg))
+        if nb_errors:
+            self.stdout.write(self.style.ERROR("%s error(s)." % nb_errors))
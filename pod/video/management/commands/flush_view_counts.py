@@ -0,0 +1,23 @@
+"""Esup-Pod - Write the buffered video views in database.
+
+*  run with 'python manage.py flush_view_counts'
+*  to be run every few minutes by cron when VIEW_COUNT_BUFFER is True
+"""
+
+from django.core.management.base import BaseCommand
+
+from pod.video.view_count import flush_views
+
+
+class Command(BaseCommand):
+    """Write the views buffered in Redis in the ViewCount table."""
+
+    help = "Write the video views buffered in Redis in the database."
+
+    def handle(self, *args, **options):
+        """Handle a flush_view_counts command call."""
+        nb_views = flush_views()
+        if nb_views is None:
+            self.stdout.write(self.style.WARNING("Another flush is running."))
+            return
+        self.stdout.write(self.style.SUCCESS("%s view(s) written." % nb_views))
@@ -0,0 +1,34 @@
+"""Esup-Pod - Update the view count rollups.
+
+*  run with 'python manage.py rollup_view_counts [--all]'
+*  to be run every night by cron to update the recent views of the videos
+*  run it with --all once after the upgrade to build the rollups
+"""
+
+from django.core.management.base import BaseCommand
+
+from pod.video.view_count import rebuild_view_rollups, rollup_recent_views
+
+
+class Command(BaseCommand):
+    """Update the ViewCountMonth and ViewCountTotal rollups."""
+
+    help = "Update the recent views of the videos, or rebuild all view count rollups."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            default=False,
+            help="Rebuild the monthly and total view counts from the daily ones.",
+        )
+
+    def handle(self, *args, **options):
+        """Handle a rollup_view_counts command call."""
+        if options["all"]:
+            nb_videos = rebuild_view_rollups()
+            msg = "View count rollups of %s video(s) rebuilt." % nb_videos
+        else:
+            nb_videos = rollup_recent_views()
+            msg = "Recent views of %s video(s) updated." % nb_videos
+        self.stdout.write(self.style.SUCCESS(msg))
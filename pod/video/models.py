@@ -23,14 +23,14 @@ from django.core.exceptions import ObjectDoesNotExist
 from django.contrib.sites.shortcuts import get_current_site
 from django.templatetags.static import static
 from django.dispatch import receiver
-from django.db.models.signals import pre_delete, post_delete
-from tagging.models import Tag
+from django.db.models.signals import pre_delete, post_delete, m2m_changed
 from datetime import date
 from django.utils import timezone
 from django.utils.html import format_html, escape
 from django.utils.text import capfirst
 from ckeditor.fields import RichTextField
 from tagging.fields import TagField
+from tagging.utils import parse_tag_input
 from django.contrib.sites.models import Site
 from django.db.models.signals import post_save
 from django.db.models.signals import pre_save
@@ -47,6 +47,7 @@ from pod.main.lang_settings import PREF_LANG_CHOICES as __PREF_LANG_CHOICES__
 from django.db.models import Count, Case, When, Value, BooleanField, Q
 from django.db.models.functions import Concat
 from os.path import splitext
+from pod.video.view_count import get_pending_views
 
 USE_PODFILE = getattr(settings, "USE_PODFILE", False)
 if USE_PODFILE:
@@ -61,6 +62,7 @@ RESTRICT_EDIT_VIDEO_ACCESS_TO_STAFF_ONLY = getattr(
     settings, "RESTRICT_EDIT_VIDEO_ACCESS_TO_STAFF_ONLY", False
 )
 VIDEO_RECENT_VIEWCOUNT = getattr(settings, "VIDEO_RECENT_VIEWCOUNT", 180)
+VIEW_COUNT_BUFFER = getattr(settings, "VIEW_COUNT_BUFFER", False)
 VIDEOS_DIR = getattr(settings, "VIDEOS_DIR", "videos")
 SITE_ID = getattr(settings, "SITE_ID", 1)
 
@@ -851,6 +853,9 @@ class Video(models.Model):
         verbose_name=_("Thumbnails"),
         related_name="videos",
     )
+    thumbnail_variants = models.JSONField(
+        _("Thumbnail variants"), default=dict, blank=True, editable=False
+    )
     duration = models.IntegerField(_("Duration"), default=0, editable=False, blank=True)
     overview = models.ImageField(
         _("Overview"),
@@ -864,6 +869,8 @@ class Video(models.Model):
         _("Encoding in progress"), default=False, editable=False
     )
     is_video = models.BooleanField(_("Is Video"), default=True, editable=False)
+    # has an mp4, HLS or audio encoding, updated with the encodings
+    is_available = models.BooleanField(_("Available"), default=False, editable=False)
 
     date_delete = models.DateField(
         _("Date to delete"),
@@ -882,6 +889,12 @@ class Video(models.Model):
 
         ordering = ["-date_added", "-id"]
         get_latest_by = "date_added"
+        indexes = [
+            models.Index(
+                fields=["is_available", "is_draft", "encoding_in_progress"],
+                name="video_available_idx",
+            ),
+        ]
         verbose_name = _("video")
         verbose_name_plural = _("videos")
 
@@ -917,6 +930,10 @@ class Video(models.Model):
         # Modifying existing Video
         else:
             newid = self.id
+            # the flag is only changed with the encodings
+            self.is_available = Video.objects.filter(
+                id=self.id, is_available=True
+            ).exists()
         newid = "%04d" % newid
         self.slug = "%s-%s" % (newid, slugify(self.title))
         self.tags = remove_accents(self.tags)
@@ -1011,6 +1028,24 @@ class Video(models.Model):
         """
         return 360 if self.is_video else 244
 
+    def get_thumbnail_variant(self, size: str) -> Optional[dict]:
+        """Get the url and dimensions of the thumbnail variant of the size, if any."""
+        variants = self.thumbnail_variants or {}
+        if size in variants and self.thumbnail:
+            if variants.get("file") == self.thumbnail.file.name:
+                return variants[size]
+        return None
+
+    @property
+    def thumbnail_dimensions(self) -> tuple:
+        """Get the width and height of the thumbnail of the default size."""
+        variant = self.get_thumbnail_variant("x720")
+        if variant:
+            return variant["width"], variant["height"]
+        if self.thumbnail and self.thumbnail.file_exist():
+            return self.thumbnail.file.width, self.thumbnail.file.height
+        return 640, 360
+
     def get_thumbnail_url(self, size="x720") -> str:
         """Get a thumbnail url for the video, with defined max size."""
         request = None
@@ -1022,6 +1057,9 @@ class Video(models.Model):
                 static(DEFAULT_THUMBNAIL),
             ]
         )
+        variant = self.get_thumbnail_variant(size)
+        if variant:
+            return variant["url"]
         if self.thumbnail and self.thumbnail.file_exist():
             # Do not serve thumbnail url directly, as it can lead to the video URL
             # Handle exception to avoid sending an error email
@@ -1042,7 +1080,10 @@ class Video(models.Model):
         thumbnail_url = ""
         # fix title for xml description
         title = re.sub(r"[\x00-\x08\x0B-\x0C\x0E-\x1F]", "", self.title)
-        if self.thumbnail and self.thumbnail.file_exist():
+        variant = self.get_thumbnail_variant("100x100")
+        if variant:
+            thumbnail_url = variant["url"]
+        elif self.thumbnail and self.thumbnail.file_exist():
             # Handle exception to avoid sending an error email
             try:
                 im = get_thumbnail(
@@ -1069,7 +1110,10 @@ class Video(models.Model):
     def get_thumbnail_card(self) -> str:
         """Return thumbnail image card of current video."""
         thumbnail_url = ""
-        if self.thumbnail and self.thumbnail.file_exist():
+        variant = self.get_thumbnail_variant("x170")
+        if variant:
+            thumbnail_url = variant["url"]
+        elif self.thumbnail and self.thumbnail.file_exist():
             # Handle exception to avoid sending an error email
             try:
                 im = get_thumbnail(self.thumbnail.file, "x170", crop="center", quality=72)
@@ -1158,19 +1202,28 @@ class Video(models.Model):
                 else:
                     return version["url"]
 
+    def get_rolled_up_viewcount(self, from_nb_day=0):
+        """Get the total or recent view counter from ViewCountTotal, if any."""
+        if from_nb_day not in (0, VIDEO_RECENT_VIEWCOUNT):
+            return None
+        try:
+            view_count_total = self.viewcounttotal
+        except ObjectDoesNotExist:
+            return None
+        return view_count_total.recent if from_nb_day else view_count_total.total
+
     def get_viewcount(self, from_nb_day=0):
         """Get the view counter of a video."""
+        d = None
         if from_nb_day > 0:
             d = date.today() - timezone.timedelta(days=from_nb_day)
-            set = self.viewcount_set.filter(date__gte=d)
-        else:
-            set = self.viewcount_set.all()
-
-        count_sum = set.aggregate(Sum("count"))
-
-        if count_sum["count__sum"] is None:
-            return 0
-        return count_sum["count__sum"]
+        count_sum = self.get_rolled_up_viewcount(from_nb_day)
+        if count_sum is None:
+            set = self.viewcount_set.filter(date__gte=d) if d else self.viewcount_set
+            count_sum = set.aggregate(Sum("count"))["count__sum"] or 0
+        if VIEW_COUNT_BUFFER:
+            count_sum += get_pending_views(self.id, d)
+        return count_sum
 
     def get_marker_time_for_user(self, user):
         """Get the marker time of a video for the user in parameter."""
@@ -1227,7 +1280,8 @@ class Video(models.Model):
     def get_video_json(self, extensions):
         """Get the JSON representation of the video."""
         extension_list = extensions.split(",") if extensions else []
-        list_video = self.encodingvideo_set.all()
+        # the CMAF streams are fragmented mp4 files only read through their playlists
+        list_video = self.encodingvideo_set.exclude(encoding_format="video/iso.segment")
         dict_src = Video.get_media_json(extension_list, list_video)
         sorted_dict_src = {
             x: sorted(dict_src[x], key=lambda i: i["height"]) for x in dict_src.keys()
@@ -1242,7 +1296,9 @@ class Video(models.Model):
     def get_audio_json(self, extensions) -> dict:
         """Get the JSON representation of the audio."""
         extension_list = extensions.split(",") if extensions else []
-        list_audio = self.encodingaudio_set.filter(name="audio")
+        list_audio = self.encodingaudio_set.filter(name="audio").exclude(
+            encoding_format="video/iso.segment"
+        )
         dict_src = Video.get_media_json(extension_list, list_audio)
         return dict_src
 
@@ -1298,25 +1354,38 @@ class Video(models.Model):
                 "description": "%s" % self.description,
                 "thumbnail": "%s" % self.get_thumbnail_url(),
                 "duration": "%s" % self.duration,
-                "tags": list(
-                    [
-                        {"name": name[0], "slug": slugify(name)}
-                        for name in Tag.objects.get_for_object(self).values_list("name")
-                    ]
-                ),
+                # related rows are read with all() to use prefetched objects
+                "tags": [
+                    {"name": name, "slug": slugify(name)}
+                    for name in parse_tag_input(self.tags)
+                ],
                 "type": {"title": self.type.title, "slug": self.type.slug},
-                "disciplines": list(
-                    self.discipline.all()
-                    .filter(site=current_site)
-                    .values("title", "slug")
-                ),
-                "channels": list(
-                    self.channel.all().filter(site=current_site).values("title", "slug")
-                ),
-                "themes": list(self.theme.all().values("title", "slug")),
-                "contributors": list(self.contributor_set.values("name", "role")),
-                "chapters": list(self.chapter_set.values("title", "slug")),
-                "overlays": list(self.overlay_set.values("title", "slug")),
+                "disciplines": [
+                    {"title": discipline.title, "slug": discipline.slug}
+                    for discipline in self.discipline.all()
+                    if discipline.site_id == current_site.id
+                ],
+                "channels": [
+                    {"title": channel.title, "slug": channel.slug}
+                    for channel in self.channel.all()
+                    if channel.site_id == current_site.id
+                ],
+                "themes": [
+                    {"title": theme.title, "slug": theme.slug}
+                    for theme in self.theme.all()
+                ],
+                "contributors": [
+                    {"name": contributor.name, "role": contributor.role}
+                    for contributor in self.contributor_set.all()
+                ],
+                "chapters": [
+                    {"title": chapter.title, "slug": chapter.slug}
+                    for chapter in self.chapter_set.all()
+                ],
+                "overlays": [
+                    {"title": overlay.title, "slug": overlay.slug}
+                    for overlay in self.overlay_set.all()
+                ],
                 "full_url": self.get_full_url(),
                 "is_restricted": self.is_restricted,
                 "password": True if self.password != "" else False,
@@ -1421,8 +1490,8 @@ class Video(models.Model):
         """Export Dublin Core items for current video."""
         contributors = []
         current_site = Site.objects.get_current()
-        for contrib in self.contributor_set.values_list("name", "role"):
-            contributors.append(" ".join(contrib))
+        for contrib in self.contributor_set.all():
+            contributors.append(" ".join((contrib.name, contrib.role)))
         try:
             data_to_dump = {
                 "dc.title": "%s" % escape(self.title),
@@ -1432,9 +1501,9 @@ class Video(models.Model):
                 % (
                     self.type.title,
                     ", ".join(
-                        self.discipline.all()
-                        .filter(site=current_site)
-                        .values_list("title", flat=True)
+                        discipline.title
+                        for discipline in self.discipline.all()
+                        if discipline.site_id == current_site.id
                     ),
                 ),
                 "dc.publisher": __TITLE_ETB__,
@@ -1550,6 +1619,81 @@ def video_podfiles_removal(sender, instance, **kwargs) -> None:
             video_folder[0].delete()
 
 
+@receiver([post_save, post_delete], sender=Video)
+@receiver([post_save, post_delete], sender=Type)
+@receiver([post_save, post_delete], sender=Discipline)
+@receiver([post_save, post_delete], sender=Channel)
+@receiver([post_save, post_delete], sender=Theme)
+@receiver(m2m_changed, sender=Video.sites.through)
+@receiver(m2m_changed, sender=Video.discipline.through)
+@receiver(m2m_changed, sender=Video.channel.through)
+@receiver(m2m_changed, sender=Video.theme.through)
+@receiver(m2m_changed, sender=Type.sites.through)
+def video_data_invalidation(sender, **kwargs) -> None:
+    """Invalidate the cached video data, video counts and feeds."""
+    from pod.video.context_processors import invalidate_video_data
+
+    if kwargs.get("action", "post").startswith("post"):
+        invalidate_video_data()
+
+
+@receiver([post_save, post_delete], sender=Video)
+@receiver([post_save, post_delete], sender="completion.Contributor")
+@receiver(m2m_changed, sender=Video.discipline.through)
+def dublin_core_invalidation(sender, instance, **kwargs) -> None:
+    """Remove the cached Dublin Core record of the changed videos."""
+    from pod.video.dublincore import invalidate_dublin_core
+
+    if isinstance(instance, Video):
+        invalidate_dublin_core([instance.id])
+    elif kwargs.get("pk_set"):
+        # disciplines changed from the discipline side
+        invalidate_dublin_core(kwargs["pk_set"])
+    elif not kwargs.get("action"):
+        invalidate_dublin_core([instance.video_id])
+
+
+@receiver(post_save, sender=User)
+def dublin_core_owner_invalidation(sender, instance, update_fields=None, **kwargs):
+    """Remove the cached Dublin Core records of the videos of a changed user."""
+    from pod.video.dublincore import invalidate_dublin_core
+
+    # the name of the user is not changed by a login
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+    invalidate_dublin_core(
+        Video.objects.filter(owner=instance).values_list("id", flat=True)
+    )
+
+
+@receiver(post_save, sender=Type)
+@receiver([post_save, pre_delete], sender=Discipline)
+def dublin_core_subject_invalidation(sender, instance, **kwargs) -> None:
+    """Remove the cached Dublin Core records of the videos of a type or discipline."""
+    from pod.video.dublincore import invalidate_dublin_core
+
+    invalidate_dublin_core(instance.video_set.values_list("id", flat=True))
+
+
+@receiver([post_save, post_delete], sender=Video)
+@receiver([post_save, post_delete], sender="quiz.Quiz")
+@receiver([post_save, post_delete], sender="chapter.Chapter")
+@receiver([post_save, pre_delete], sender=CustomImageModel)
+def video_card_invalidation(sender, instance, **kwargs) -> None:
+    """Remove the cached cards of the changed videos."""
+    from pod.video.card import invalidate_cards
+
+    if isinstance(instance, Video):
+        invalidate_cards([instance.id])
+    elif isinstance(instance, CustomImageModel):
+        # before the thumbnail is removed from its videos
+        invalidate_cards(
+            Video.objects.filter(thumbnail=instance).values_list("id", flat=True)
+        )
+    else:
+        invalidate_cards([instance.video_id])
+
+
 class ViewCount(models.Model):
     video = models.ForeignKey(
         Video, verbose_name=_("Video"), editable=False, on_delete=models.CASCADE
@@ -1567,6 +1711,58 @@ class ViewCount(models.Model):
         verbose_name_plural = _("View counts")
 
 
+class ViewCountMonth(models.Model):
+    """Views of a video in a month, rolled up from ViewCount."""
+
+    video = models.ForeignKey(
+        Video, verbose_name=_("Video"), editable=False, on_delete=models.CASCADE
+    )
+    month = models.DateField(_("Month"), editable=False)
+    count = models.IntegerField(_("Number of view"), default=0, editable=False)
+
+    @property
+    def sites(self):
+        return self.video.sites
+
+    class Meta:
+        unique_together = ("video", "month")
+        verbose_name = _("Monthly view count")
+        verbose_name_plural = _("Monthly view counts")
+
+
+class ViewCountTotal(models.Model):
+    """Total and recent views of a video, rolled up from ViewCount."""
+
+    video = models.OneToOneField(
+        Video, verbose_name=_("Video"), editable=False, on_delete=models.CASCADE
+    )
+    total = models.IntegerField(_("Sum of view"), default=0, editable=False)
+    recent = models.IntegerField(
+        _("Sum of view of last %(ndays)s days" % {"ndays": VIDEO_RECENT_VIEWCOUNT}),
+        default=0,
+        editable=False,
+    )
+
+    @property
+    def sites(self):
+        return self.video.sites
+
+    class Meta:
+        verbose_name = _("Total view count")
+        verbose_name_plural = _("Total view counts")
+
+
+class ViewCountFlush(models.Model):
+    """Redis hash of buffered views already written in ViewCount."""
+
+    key = models.CharField(_("Key"), max_length=100, unique=True, editable=False)
+    date = models.DateTimeField(_("Date"), default=timezone.now, editable=False)
+
+    class Meta:
+        verbose_name = _("Flushed view count")
+        verbose_name_plural = _("Flushed view counts")
+
+
 class UserMarkerTime(models.Model):
     """Record the time of video played by a user."""
 
@@ -7,14 +7,15 @@ from rest_framework.response import Response
 # from rest_framework import authentication, permissions
 from rest_framework.decorators import action
 
-from django.template.loader import render_to_string
+from django.http import StreamingHttpResponse
 
 from .models import Channel, Theme
 from .models import Type, Discipline, Video
 from .models import ViewCount
 from .context_processors import get_available_videos
-
-from pod.main.utils import remove_trailing_spaces
+from .dublincore import PAGING_PARAMETERS
+from .dublincore import decode_resumption_token, encode_resumption_token
+from .dublincore import get_page_size, stream_dublin_core
 
 # commented for v3
 # from .remote_encode import start_store_remote_encoding_video
@@ -261,34 +262,55 @@ class XmlTextRenderer(renderers.BaseRenderer):
 
 
 class DublinCoreView(APIView):
+    """Stream the Dublin Core records of the available videos, by id."""
+
     # authentication_classes = [authentication.TokenAuthentication]
     renderer_classes = (XmlTextRenderer,)
-    pagination_class = "rest_framework.pagination.PageNumberPagination"
     page_size = 12
-    page_size_query_param = "page_size"
-    max_page_size = 1000
-
-    def get(self, request, format=None) -> Response:
-        list_videos = get_available_videos(request)
-        if request.GET:
-            list_videos = list_videos.filter(**request.GET.dict())
-        xmlcontent = '<?xml version="1.0" encoding="utf-8"?>\n'
-        xmlcontent += (
-            "<!DOCTYPE rdf:RDF PUBLIC " '"-//DUBLIN CORE//DCMES DTD 2002/07/31//EN" \n'
-        )
-        xmlcontent += (
-            '"http://dublincore.org/documents/2002/07'
-            '/31/dcmes-xml/dcmes-xml-dtd.dtd">\n'
-        )
-        xmlcontent += (
-            "<rdf:RDF xmlns:rdf="
-            '"http://www.w3.org/1999/02/22-rdf-syntax-ns#"'
-            ' xmlns:dc ="http://purl.org/dc/elements/1.1/">\n'
+
+    def get_paging(self, request):
+        """Get the video filters, the last exported id and the page size.
+
+        Returns None if the resumption token is not valid.
+        """
+        token = request.GET.get("resumptionToken")
+        if token:
+            return decode_resumption_token(token)
+        filters = {
+            key: value
+            for key, value in request.GET.dict().items()
+            if key not in PAGING_PARAMETERS
+        }
+        if "page" not in request.GET and "page_size" not in request.GET:
+            return filters, None, None
+        page_size = get_page_size(request.GET.get("page_size", self.page_size))
+        try:
+            page = max(int(request.GET.get("page", 1)), 1)
+        except ValueError:
+            page = 1
+        return filters, (page - 1) * page_size, page_size
+
+    def get(self, request, format=None):
+        paging = self.get_paging(request)
+        if paging is None:
+            return Response("badResumptionToken", status=400)
+        filters, position, page_size = paging
+        list_videos = get_available_videos(request).filter(**filters)
+        video_ids = list_videos.order_by("id").values_list("id", flat=True)
+        token = None
+        if page_size:
+            if request.GET.get("resumptionToken"):
+                video_ids = video_ids.filter(id__gt=position)[: page_size + 1]
+            else:
+                video_ids = video_ids[position : position + page_size + 1]
+            video_ids = list(video_ids)
+            if len(video_ids) > page_size:
+                video_ids = video_ids[:page_size]
+                token = encode_resumption_token(filters, video_ids[-1], page_size)
+        response = StreamingHttpResponse(
+            stream_dublin_core(list(video_ids)),
+            content_type="text/xml; charset=utf-8",
         )
-        for video in list_videos:
-            rendered = render_to_string(
-                "videos/dublincore.html", {"video": video, "xml": True}, request
-            )
-            xmlcontent += remove_trailing_spaces(rendered)
-        xmlcontent += "</rdf:RDF>"
-        return Response(xmlcontent)
+        if token:
+            response["X-Resumption-Token"] = token
+        return response
@@ -0,0 +1,152 @@
+"""Esup-Pod video viewing statistics.
+
+The statistics of a set of videos are computed by batches with a few grouped
+queries (daily views, monthly views and playlist additions) using conditional
+aggregation. The views of the videos without rollups are read from the daily
+views.
+"""
+
+import json
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Q, Sum
+
+from pod.playlist.apps import FAVORITE_PLAYLIST_NAME
+from pod.playlist.models import PlaylistContent
+
+from .models import ViewCount, ViewCountMonth, ViewCountTotal
+
+STATS_VIEW_BATCH_SIZE = getattr(settings, "STATS_VIEW_BATCH_SIZE", 500)
+STATS_VIEW_CACHE_TIMEOUT = getattr(settings, "STATS_VIEW_CACHE_TIMEOUT", 300)
+
+VIEW_PERIODS = ("day", "month", "year", "since_created")
+
+
+def get_period_filters(field: str, date_filter: date) -> dict:
+    """Get the filter of each period on the date field."""
+    day_lookup = "%s__date" % field if field == "date_added" else field
+    return {
+        "day": Q(**{day_lookup: date_filter}),
+        "month": Q(
+            **{
+                "%s__year" % field: date_filter.year,
+                "%s__month" % field: date_filter.month,
+            }
+        ),
+        "year": Q(**{"%s__year" % field: date_filter.year}),
+        "since_created": Q(),
+    }
+
+
+def get_period_views(views, field: str, date_filter: date, periods: tuple) -> dict:
+    """Get the sum of the counts of the views rows in each period for each video."""
+    filters = get_period_filters(field, date_filter)
+    # the annotations cannot be named after the date fields
+    rows = (
+        views.values_list("video_id")
+        .order_by()
+        .annotate(
+            **{
+                "%s_views" % period: Sum("count", filter=filters[period])
+                for period in periods
+            }
+        )
+    )
+    return {row[0]: dict(zip(periods, row[1:])) for row in rows}
+
+
+def get_views_stats(video_ids: list, date_filter: date) -> dict:
+    """Get the view counts of each period for each video.
+
+    The views of the day come from ViewCount, the others from ViewCountMonth,
+    or from ViewCount for the videos without rollups yet.
+    """
+    rolled_up = set(
+        ViewCountTotal.objects.filter(video_id__in=video_ids).values_list(
+            "video_id", flat=True
+        )
+    )
+    stats = get_period_views(
+        ViewCountMonth.objects.filter(video_id__in=rolled_up),
+        "month",
+        date_filter,
+        VIEW_PERIODS[1:],
+    )
+    views = ViewCount.objects.filter(video_id__in=video_ids).filter(
+        Q(date=date_filter) | ~Q(video_id__in=rolled_up)
+    )
+    for video_id, row in get_period_views(
+        views, "date", date_filter, VIEW_PERIODS
+    ).items():
+        if video_id in rolled_up:
+            stats.setdefault(video_id, {})["day"] = row["day"]
+        else:
+            stats[video_id] = row
+    return stats
+
+
+def get_playlists_stats(video_ids: list, date_filter: date) -> dict:
+    """Get the playlist and favorite additions of each period for each video."""
+    filters = get_period_filters("date_added", date_filter)
+    favorite = Q(playlist__name=FAVORITE_PLAYLIST_NAME)
+    annotations = {}
+    for period in VIEW_PERIODS:
+        annotations["playlist_%s" % period] = Count("id", filter=filters[period])
+        annotations["fav_%s" % period] = Count("id", filter=favorite & filters[period])
+    rows = (
+        PlaylistContent.objects.filter(video_id__in=video_ids)
+        .values("video_id")
+        .order_by()
+        .annotate(**annotations)
+    )
+    return {row.pop("video_id"): row for row in rows}
+
+
+def get_videos_stats(video_ids: list, date_filter: date) -> dict:
+    """Get the viewing statistics of the videos, by video id."""
+    views = get_views_stats(video_ids, date_filter)
+    playlists = get_playlists_stats(video_ids, date_filter)
+    stats = {}
+    for video_id in video_ids:
+        stats[video_id] = {}
+        for prefix, rows in (("", views), ("playlist_", playlists), ("fav_", playlists)):
+            row = rows.get(video_id, {})
+            for period in VIEW_PERIODS:
+                stats[video_id][prefix + period] = row.get(prefix + period) or 0
+    return stats
+
+
+def get_videos_values(videos) -> list:
+    """Get the id, title and slug of a list or a queryset of videos."""
+    if isinstance(videos, list):
+        return [{"id": v.id, "title": v.title, "slug": v.slug} for v in videos]
+    return list(videos.values("id", "title", "slug"))
+
+
+def iter_videos_stats(videos, date_filter: date):
+    """Yield the JSON statistics of the videos, computed by batches."""
+    videos = get_videos_values(videos)
+    for start in range(0, len(videos), STATS_VIEW_BATCH_SIZE):
+        batch = videos[start : start + STATS_VIEW_BATCH_SIZE]
+        stats = get_videos_stats([v["id"] for v in batch], date_filter)
+        for video in batch:
+            data = {"title": video["title"], "slug": video["slug"], **stats[video["id"]]}
+            yield json.dumps(data, cls=DjangoJSONEncoder)
+
+
+def stream_stats_json(cache_key: str, videos, date_filter: date, min_date: date):
+    """Stream the JSON list of the videos statistics, then cache it."""
+    items = cache.get(cache_key)
+    if items is None:
+        items = []
+        for item in iter_videos_stats(videos, date_filter):
+            items.append(item)
+            yield ("[" if len(items) == 1 else ", ") + item
+        items.append(json.dumps({"min_date": min_date}, cls=DjangoJSONEncoder))
+        yield ("[" if len(items) == 1 else ", ") + items[-1] + "]"
+        cache.set(cache_key, items, timeout=STATS_VIEW_CACHE_TIMEOUT)
+    else:
+        yield "[" + ", ".join(items) + "]"
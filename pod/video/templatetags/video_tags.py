@@ -13,6 +13,7 @@ from tagging.models import Tag
 from tagging.utils import LINEAR
 from tagging.utils import LOGARITHMIC
 
+from ..card import get_card
 from ..forms import VideoVersionForm
 from pod.video_encode_transcript.utils import check_file
 from django.contrib.auth.models import User
@@ -41,6 +42,12 @@ def get_percent_marker_for_user(video: Video, user: User):
         return 0
 
 
+@register.simple_tag(name="get_video_card")
+def get_video_card(video: Video) -> dict:
+    """Tag to get the cached header and thumbnail of the card of the video."""
+    return get_card(video)
+
+
 @register.filter(name="file_exists")
 def file_exists(filepath):
     return check_file(filepath.path)
@@ -0,0 +1,77 @@
+"""Unit tests for the video cards.
+
+*  run with `python manage.py test pod.video.tests.test_card`
+"""
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils.translation import get_language
+
+from pod.chapter.models import Chapter
+from pod.quiz.models import Quiz
+from pod.video.card import annotate_cards, get_card, get_card_key
+from pod.video.models import Type, Video
+
+
+class VideoCardTestCase(TestCase):
+    """Test the annotated and cached video cards."""
+
+    fixtures = [
+        "initial_data.json",
+    ]
+
+    def setUp(self):
+        """Set up 3 videos, the first one with a quiz and the second with chapters."""
+        cache.clear()
+        user = User.objects.create(username="pod", password="pod1234pod")
+        self.videos = [
+            Video.objects.create(
+                title="Video%s" % i,
+                owner=user,
+                video="test%s.mp4" % i,
+                type=Type.objects.get(id=1),
+            )
+            for i in range(3)
+        ]
+        Quiz.objects.create(video=self.videos[0])
+        Chapter.objects.create(video=self.videos[1], title="Chapter")
+
+    def test_annotate_cards(self):
+        """Test the cards of a list are rendered without query per video."""
+        with self.assertNumQueries(1):
+            videos = list(annotate_cards(Video.objects.order_by("id")))
+            cards = [get_card(video) for video in videos]
+        self.assertEqual(
+            [(video.has_quiz, video.has_chapters) for video in videos],
+            [(True, False), (False, True), (False, False)],
+        )
+        self.assertIn("bi-controller", cards[0]["header"])
+        self.assertNotIn("bi-card-list", cards[0]["header"])
+        self.assertIn("bi-card-list", cards[1]["header"])
+        self.assertIn("pod-thumbnail", cards[2]["thumbnail"])
+        print(" --->  test_annotate_cards: OK!")
+
+    def test_cached_card(self):
+        """Test a card is read from the cache, even without annotations."""
+        video = Video.objects.get(id=self.videos[0].id)
+        card = get_card(video)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_card(video), card)
+        print(" --->  test_cached_card: OK!")
+
+    def test_invalidate_card(self):
+        """Test the card is removed from the cache when the video data change."""
+        key = get_card_key(self.videos[2].id, get_language())
+        changes = [
+            lambda: Quiz.objects.create(video=self.videos[2]),
+            lambda: Chapter.objects.create(video=self.videos[2], title="Chapter"),
+            lambda: Chapter.objects.filter(video=self.videos[2]).delete(),
+            lambda: self.videos[2].save(),
+        ]
+        for change in changes:
+            get_card(self.videos[2])
+            self.assertIsNotNone(cache.get(key))
+            change()
+            self.assertIsNone(cache.get(key))
+        print(" --->  test_invalidate_card: OK!")
@@ -0,0 +1,53 @@
+"""Unit tests for the video context processors.
+
+*  run with `python manage.py test pod.video.tests.test_context_processors`
+"""
+
+from django.contrib.auth.models import User
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.test import TestCase
+
+from pod.video.context_processors import get_cached_video_data
+from pod.video.models import Type, Video
+
+
+class VideoDataCacheTestCase(TestCase):
+    """Test the per-site cache of the video data."""
+
+    fixtures = [
+        "initial_data.json",
+    ]
+
+    def setUp(self):
+        """Set up a video on the default site and a second site."""
+        cache.clear()
+        self.site = Site.objects.get(id=1)
+        self.other_site = Site.objects.create(domain="other.localhost", name="other")
+        user = User.objects.create(username="pod", password="pod1234pod")
+        Video.objects.create(
+            title="Video1",
+            owner=user,
+            video="test.mp4",
+            type=Type.objects.get(id=1),
+            is_draft=False,
+        )
+
+    def test_video_data_per_site(self):
+        """Test each site has its own materialised video data."""
+        video_data = get_cached_video_data(self.site)
+        self.assertIsInstance(video_data["TYPES"], list)
+        self.assertEqual(len(video_data["TYPES"]), 1)
+        self.assertEqual(get_cached_video_data(self.other_site)["TYPES"], [])
+        with self.assertNumQueries(0):
+            self.assertEqual(len(get_cached_video_data(self.site)["TYPES"]), 1)
+        print(" --->  test_video_data_per_site: OK!")
+
+    def test_video_data_invalidation(self):
+        """Test the cached video data are invalidated when a type is saved."""
+        get_cached_video_data(self.site)
+        video_type = Type.objects.get(id=1)
+        video_type.title = "Other"
+        video_type.save()
+        self.assertEqual(get_cached_video_data(self.site)["TYPES"][0].title, "Other")
+        print(" --->  test_video_data_invalidation: OK!")
@@ -0,0 +1,124 @@
+"""Unit tests for the Dublin Core export.
+
+*  run with `python manage.py test pod.video.tests.test_dublincore`
+"""
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils.translation import get_language
+
+from defusedxml import minidom
+from rest_framework.test import APIClient
+
+from pod.completion.models import Contributor
+from pod.video.dublincore import get_record_key
+from pod.video.models import Discipline, Type, Video
+from pod.video_encode_transcript.models import EncodingVideo, VideoRendition
+
+
+class DublinCoreViewTestCase(TestCase):
+    """Test the streamed and paginated Dublin Core export."""
+
+    fixtures = [
+        "initial_data.json",
+    ]
+
+    def setUp(self):
+        """Set up 5 available videos."""
+        cache.clear()
+        user = User.objects.create(username="pod", password="pod1234pod", is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+        for i in range(5):
+            video = Video.objects.create(
+                title="Video%s" % i,
+                owner=user,
+                video="test%s.mp4" % i,
+                type=Type.objects.get(id=1),
+                is_draft=False,
+            )
+            EncodingVideo.objects.create(
+                video=video,
+                encoding_format="video/mp4",
+                rendition=VideoRendition.objects.get(id=1),
+            )
+
+    def get_record(self, video):
+        """Get the cached record of a video on the current site and language."""
+        return cache.get(get_record_key(video.id, settings.SITE_ID, get_language()))
+
+    def get_titles(self, response):
+        """Get the titles of the records of a streamed response."""
+        content = b"".join(response.streaming_content)
+        return [
+            node.firstChild.data
+            for node in minidom.parseString(content).getElementsByTagName("dc.title")
+        ]
+
+    def test_export_all(self):
+        """Test all records are exported, then read from the cache."""
+        response = self.client.get("/rest/dublincore/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/xml; charset=utf-8")
+        self.assertEqual(self.get_titles(response), ["Video%s" % i for i in range(5)])
+        self.assertFalse(response.has_header("X-Resumption-Token"))
+        with self.assertNumQueries(1):
+            response = self.client.get("/rest/dublincore/", {"title": "Video3"})
+            self.assertEqual(self.get_titles(response), ["Video3"])
+        print(" --->  test_export_all: OK!")
+
+    def test_pages(self):
+        """Test the page parameters and the resumption token."""
+        response = self.client.get("/rest/dublincore/", {"page": 2, "page_size": 2})
+        self.assertEqual(self.get_titles(response), ["Video2", "Video3"])
+        response = self.client.get("/rest/dublincore/", {"page_size": 2})
+        self.assertEqual(self.get_titles(response), ["Video0", "Video1"])
+        titles = []
+        while response.has_header("X-Resumption-Token"):
+            response = self.client.get(
+                "/rest/dublincore/",
+                {"resumptionToken": response["X-Resumption-Token"]},
+            )
+            titles += self.get_titles(response)
+        self.assertEqual(titles, ["Video2", "Video3", "Video4"])
+        response = self.client.get("/rest/dublincore/", {"resumptionToken": "bad"})
+        self.assertEqual(response.status_code, 400)
+        print(" --->  test_pages: OK!")
+
+    def test_record_invalidation(self):
+        """Test the cached record is removed when the video changes."""
+        video = Video.objects.get(title="Video0")
+        self.client.get("/rest/dublincore/").getvalue()
+        self.assertIsNotNone(self.get_record(video))
+        Contributor.objects.create(video=video, name="Contributor", role="author")
+        self.assertIsNone(self.get_record(video))
+        response = self.client.get("/rest/dublincore/", {"title": "Video0"})
+        self.assertIn(b"Contributor author", b"".join(response.streaming_content))
+        video.title = "Video0 bis"
+        video.save()
+        response = self.client.get("/rest/dublincore/", {"id": video.id})
+        self.assertEqual(self.get_titles(response), ["Video0 bis"])
+        print(" --->  test_record_invalidation: OK!")
+
+    def test_related_invalidation(self):
+        """Test the cached record is removed when its owner, type or discipline change."""
+        video = Video.objects.get(title="Video0")
+        discipline = Discipline.objects.create(title="Discipline")
+        video.discipline.add(discipline)
+        changes = [
+            lambda: video.type.save(),
+            lambda: discipline.save(),
+            lambda: discipline.delete(),
+            lambda: video.owner.save(),
+        ]
+        for change in changes:
+            self.client.get("/rest/dublincore/").getvalue()
+            self.assertIsNotNone(self.get_record(video))
+            change()
+            self.assertIsNone(self.get_record(video))
+        self.client.get("/rest/dublincore/").getvalue()
+        video.owner.save(update_fields=["last_login"])
+        self.assertIsNotNone(self.get_record(video))
+        print(" --->  test_related_invalidation: OK!")
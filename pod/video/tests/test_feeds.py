@@ -1,12 +1,22 @@
 """Unit test case for Pod video feeds."""
 
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
 from django.test import Client
+from django.test.utils import CaptureQueriesContext
 from http import HTTPStatus
 from django.urls import reverse
+from django.utils import timezone
+from datetime import timedelta
 
 from defusedxml import minidom
 
+from pod.video.models import Type, Video
+from pod.video_encode_transcript.models import EncodingAudio, EncodingVideo
+from pod.video_encode_transcript.models import VideoRendition
+
 
 class FeedTestView(TestCase):
     """Test case for Pod video feeds view."""
@@ -37,3 +47,106 @@ class FeedTestView(TestCase):
         mediapackage = mediaPackage_content.getElementsByTagName("rss")[0]
         self.assertTrue(mediapackage)
         print(" -->  test_get_rss_audio_from_video of FeedTestView", ": OK!")
+
+
+class FeedCacheTestView(TestCase):
+    """Test case for the queries, the cache and the conditional GET of the feeds."""
+
+    fixtures = [
+        "initial_data.json",
+    ]
+
+    def setUp(self) -> None:
+        """Set up available videos with an mp4 and an mp3 encoding."""
+        cache.clear()
+        user = User.objects.create(username="pod", password="pod1234pod")
+        for i in range(2):
+            self.add_video(user, i)
+
+    def add_video(self, user, number) -> Video:
+        """Add an available video with encodings of known size."""
+        video = Video.objects.create(
+            title="Video%s" % number,
+            owner=user,
+            video="test%s.mp4" % number,
+            type=Type.objects.get(id=1),
+            is_draft=False,
+        )
+        EncodingVideo.objects.create(
+            video=video,
+            encoding_format="video/mp4",
+            rendition=VideoRendition.objects.get(id=1),
+            source_file="videos/test%s_360.mp4" % number,
+            size=1000 + number,
+        )
+        EncodingAudio.objects.create(
+            video=video,
+            name="audio",
+            encoding_format="audio/mp3",
+            source_file="videos/test%s.mp3" % number,
+            size=2000 + number,
+        )
+        return video
+
+    def get_feed_queries(self, url) -> int:
+        """Get the number of queries to render the feed without cache."""
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return len(queries)
+
+    def test_feed_queries(self) -> None:
+        """Test the number of queries does not depend on the number of videos."""
+        url = reverse("rss-video:rss-video")
+        nb_queries = self.get_feed_queries(url)
+        self.add_video(User.objects.get(username="pod"), 2)
+        self.assertEqual(self.get_feed_queries(url), nb_queries)
+        print(" -->  test_feed_queries of FeedCacheTestView: OK!")
+
+    def test_enclosure_length(self) -> None:
+        """Test the enclosure length is the stored size of the encoding."""
+        response = self.client.get(reverse("rss-video:rss-video"))
+        enclosures = minidom.parseString(response.content).getElementsByTagName(
+            "enclosure"
+        )
+        self.assertEqual(
+            sorted(enclosure.getAttribute("length") for enclosure in enclosures),
+            ["1000", "1001"],
+        )
+        response = self.client.get(reverse("rss-video:rss-audio"))
+        enclosures = minidom.parseString(response.content).getElementsByTagName(
+            "enclosure"
+        )
+        self.assertEqual(enclosures[0].getAttribute("type"), "audio/mpeg")
+        self.assertEqual(enclosures[0].getAttribute("length"), "2001")
+        print(" -->  test_enclosure_length of FeedCacheTestView: OK!")
+
+    def test_conditional_get(self) -> None:
+        """Test the feed is not sent again until a video changes."""
+        url = reverse("rss-video:rss-video")
+        response = self.client.get(url)
+        etag = response["ETag"]
+        self.assertTrue(response.has_header("Last-Modified"))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        video = Video.objects.get(title="Video0")
+        video.title = "Video0 bis"
+        video.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn(b"Video0 bis", response.content)
+        print(" -->  test_conditional_get of FeedCacheTestView: OK!")
+
+    def test_if_modified_since(self) -> None:
+        """Test the feed is not sent again until a newer video is added."""
+        url = reverse("rss-video:rss-video")
+        last_modified = self.client.get(url)["Last-Modified"]
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Video.objects.filter(title="Video0").update(
+            date_added=timezone.now() + timedelta(days=1)
+        )
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        print(" -->  test_if_modified_since of FeedCacheTestView: OK!")
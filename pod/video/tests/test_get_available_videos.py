@@ -1,11 +1,15 @@
 """Video Models test cases."""
 
+from django.core.management import call_command
 from django.test import TestCase
+from io import StringIO
+from unittest.mock import patch
 from django.contrib.auth.models import User
 from ..models import Video, Type
 
 from ..context_processors import __AVAILABLE_VIDEO_FILTER__
 from ..context_processors import get_available_videos
+from ..context_processors import get_video_data_version
 
 from pod.video_encode_transcript.models import EncodingVideo
 from pod.video_encode_transcript.models import PlaylistVideo
@@ -50,6 +54,11 @@ class VideoAvailableTestCase(TestCase):
         vids = Video.objects.filter(**__AVAILABLE_VIDEO_FILTER__)
         self.assertEqual(vids.count(), 0)
         vid1 = Video.objects.get(id=1)
+        EncodingVideo.objects.create(
+            video=vid1,
+            encoding_format="video/mp4",
+            rendition=VideoRendition.objects.get(id=1),
+        )
         vid1.is_draft = False
         vid1.save()
         vids = Video.objects.filter(**__AVAILABLE_VIDEO_FILTER__)
@@ -67,8 +76,9 @@ class VideoAvailableTestCase(TestCase):
 
         vid1.is_draft = False
         vid1.save()
+        # not available without encoding
         vids = Video.objects.filter(**__AVAILABLE_VIDEO_FILTER__)
-        self.assertEqual(vids.count(), 1)
+        self.assertEqual(vids.count(), 0)
         EncodingVideo.objects.create(
             video=vid1,
             encoding_format="video/mp4",
@@ -116,3 +126,28 @@ class VideoAvailableTestCase(TestCase):
         plvid1.delete()
         vids = get_available_videos()
         self.assertEqual(vids.count(), 1)
+
+    def test_rebuild_video_availability(self):
+        """Test the availability flag is rebuilt from the encodings."""
+        EncodingAudio.objects.create(
+            video_id=1, name="audio", encoding_format="video/mp4"
+        )
+        Video.objects.update(is_available=False, is_draft=False)
+        Video.objects.filter(id=2).update(is_available=True)
+        self.assertEqual(get_available_videos().count(), 1)
+        version = get_video_data_version()
+        with patch("pod.video_search.models.mark_video_changed") as mock_changed:
+            call_command("rebuild_video_availability", stdout=StringIO())
+        self.assertEqual(list(get_available_videos().values_list("id", flat=True)), [1])
+        # the cached video data and the index of the changed videos are updated
+        self.assertNotEqual(get_video_data_version(), version)
+        mock_changed.assert_called_once_with(1, 2)
+        with patch("pod.video_search.models.mark_video_changed") as mock_changed:
+            call_command("rebuild_video_availability", stdout=StringIO())
+        mock_changed.assert_not_called()
+        # saving a video loaded before the rebuild keeps the flag
+        vid1 = Video.objects.get(id=1)
+        vid1.is_available = False
+        vid1.save()
+        self.assertTrue(Video.objects.get(id=1).is_available)
+        print(" --->  test_rebuild_video_availability: OK!")
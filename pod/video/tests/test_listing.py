@@ -0,0 +1,96 @@
+"""Unit tests for the videos listing.
+
+*  run with `python manage.py test pod.video.tests.test_listing`
+"""
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+
+from pod.video.listing import decode_cursor, get_videos_count, get_videos_page
+from pod.video.models import Type, Video
+from pod.video.utils import sort_videos_list
+
+
+class VideosListingTestCase(TestCase):
+    """Test the cached count and the keyset pagination of the videos lists."""
+
+    fixtures = [
+        "initial_data.json",
+    ]
+
+    def setUp(self):
+        """Set up 30 videos, some of them with the same title."""
+        cache.clear()
+        self.factory = RequestFactory()
+        user = User.objects.create(username="pod", password="pod1234pod")
+        for i in range(30):
+            Video.objects.create(
+                title="Video%s" % (i // 2),
+                owner=user,
+                video="test%s.mp4" % i,
+                type=Type.objects.get(id=1),
+                duration=i % 4,
+            )
+
+    def get_all_pages(self, sort_field, sort_direction=""):
+        """Get the ids of the videos of each page, following the cursors."""
+        videos_list = sort_videos_list(Video.objects.all(), sort_field, sort_direction)
+        pages = []
+        cursor = None
+        while len(pages) < 5:
+            params = {"page": len(pages) + 1}
+            if cursor:
+                params["cursor"] = cursor
+            page = get_videos_page(
+                self.factory.get("/videos/", params),
+                videos_list,
+                sort_field,
+                sort_direction,
+            )
+            pages.append([video.id for video in page])
+            cursor = page.cursor
+            if not page.has_next():
+                break
+        return videos_list, pages
+
+    def test_videos_count(self):
+        """Test the count of the videos is cached and invalidated on save."""
+        videos_list = Video.objects.all()
+        self.assertEqual(get_videos_count(videos_list), 30)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_videos_count(videos_list), 30)
+        self.assertEqual(get_videos_count(videos_list.filter(duration=0)), 8)
+        Video.objects.first().delete()
+        self.assertEqual(get_videos_count(videos_list), 29)
+        print(" --->  test_videos_count: OK!")
+
+    def test_keyset_pages(self):
+        """Test the pages follow the order of the list, without duplicates."""
+        for sort_field, sort_direction in (
+            ("date_added", ""),
+            ("title", ""),
+            ("title", "on"),
+            ("duration", ""),
+        ):
+            videos_list, pages = self.get_all_pages(sort_field, sort_direction)
+            self.assertEqual([len(page) for page in pages], [12, 12, 6])
+            ids = [video_id for page in pages for video_id in page]
+            self.assertEqual(len(set(ids)), 30)
+            values = dict(videos_list.values_list("id", sort_field))
+            if sort_field == "title":
+                values = {key: value.lower() for key, value in values.items()}
+            keys = [(values[video_id], video_id) for video_id in ids]
+            self.assertEqual(keys, sorted(keys, reverse=not sort_direction))
+        print(" --->  test_keyset_pages: OK!")
+
+    def test_page_without_cursor(self):
+        """Test a page requested without cursor is read by offset."""
+        request = self.factory.get("/videos/", {"page": 2})
+        videos_list = sort_videos_list(Video.objects.all(), "date_added")
+        page = get_videos_page(request, videos_list, "date_added")
+        self.assertEqual(page.number, 2)
+        self.assertEqual(len(page), 12)
+        self.assertEqual(page.paginator.count, 30)
+        self.assertEqual(decode_cursor("not a cursor", "date_added"), None)
+        print(" --->  test_page_without_cursor: OK!")
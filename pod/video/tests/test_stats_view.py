@@ -7,6 +7,15 @@ from django.urls import reverse, NoReverseMatch
 from pod.authentication.models import User
 from pod.video.models import Channel, Theme, Video, Type
 from pod.video.views import get_all_views_count, stats_view
+from pod.video.models import ViewCount
+from pod.video.view_count import add_view_counts
+from pod.video.stats import get_videos_stats, stream_stats_json
+from pod.playlist.apps import FAVORITE_PLAYLIST_NAME
+from pod.playlist.models import Playlist, PlaylistContent
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from datetime import timedelta
 from django.contrib.sites.models import Site
 from pod.authentication.models import AccessGroup
 
@@ -28,6 +37,7 @@ class TestStatsView(TestCase):
     ]
 
     def setUp(self):
+        cache.clear()
         self.logger = logging.getLogger("django.request")
         # self.previous_level = self.logger.getEffectiveLevel()
         # Remove warning log
@@ -245,12 +255,13 @@ class TestStatsView(TestCase):
         # Check that the response is 200 OK and
         self.assertEqual(response.status_code, 200)
         # the content contains the title of the video and expected data
-        self.assertEqual(response.content, expected_content)
+        self.assertEqual(b"".join(response.streaming_content), expected_content)
 
     @skipUnless(USE_STATS_VIEW, "Require activate URL video_stats_view")
     def test_stats_view_POST_request_videos(self):
         stat_url_videos = reverse("video:video_stats_view")
         response = self.client.post(stat_url_videos)
+        content = b"".join(response.streaming_content).decode("utf-8")
         # Check that the view function is stats_view
         self.assertEqual(response.resolver_match.func, stats_view)
         # Check that the response is 200 OK and
@@ -263,15 +274,14 @@ class TestStatsView(TestCase):
                 **get_all_views_count(video.id),
             }
             # the content contains the title of the video and expected data
-            self.assertIn(json.dumps(data), response.content.decode("utf-8"))
+            self.assertIn(json.dumps(data), content)
         # the content contains the title of the video and expected data
-        self.assertContains(
-            response, json.dumps({"min_date": TODAY.strftime("%Y-%m-%d")})
-        )
+        self.assertIn(json.dumps({"min_date": TODAY.strftime("%Y-%m-%d")}), content)
 
     @skipUnless(USE_STATS_VIEW, "Require URL video_stats_view")
     def test_stats_view_POST_request_channel(self):
         response = self.client.post(self.stat_channel_url)
+        content = b"".join(response.streaming_content).decode("utf-8")
         # Check that the view function is stats_view
         self.assertEqual(response.resolver_match.func, stats_view)
         # Check that the response is 200 OK and
@@ -284,15 +294,14 @@ class TestStatsView(TestCase):
                 **get_all_views_count(video.id),
             }
             # the content contains the expected data
-            self.assertIn(json.dumps(data), response.content.decode("utf-8"))
+            self.assertIn(json.dumps(data), content)
         # the content contains the expected data
-        self.assertContains(
-            response, json.dumps({"min_date": TODAY.strftime("%Y-%m-%d")})
-        )
+        self.assertIn(json.dumps({"min_date": TODAY.strftime("%Y-%m-%d")}), content)
 
     @skipUnless(USE_STATS_VIEW, "Require URL video_stats_view")
     def test_stats_view_POST_request_theme(self):
         response = self.client.post(self.stat_theme_url)
+        content = b"".join(response.streaming_content).decode("utf-8")
         # Check that the view function is stats_view
         self.assertEqual(response.resolver_match.func, stats_view)
         # Check that the response is 200 OK and
@@ -305,11 +314,9 @@ class TestStatsView(TestCase):
                 **get_all_views_count(video.id),
             }
             # the content contains the expected data
-            self.assertIn(json.dumps(data), response.content.decode("utf-8"))
+            self.assertIn(json.dumps(data), content)
         # the content contains the expected data
-        self.assertContains(
-            response, json.dumps({"min_date": TODAY.strftime("%Y-%m-%d")})
-        )
+        self.assertIn(json.dumps({"min_date": TODAY.strftime("%Y-%m-%d")}), content)
 
     @skipUnless(USE_STATS_VIEW, "Require URL video_stats_view")
     def test_stats_view_GET_request_video_access_rights(self):
@@ -429,3 +436,87 @@ class TestStatsView(TestCase):
         del self.superuser
         del self.client
         del self.t1
+
+
+class TestVideosStats(TestCase):
+    """Test the set-based statistics engine."""
+
+    fixtures = [
+        "initial_data.json",
+    ]
+
+    def setUp(self):
+        """Set up two videos with views and playlist additions."""
+        cache.clear()
+        user = User.objects.create(username="pod", password="pod1234pod")
+        self.videos = [
+            Video.objects.create(
+                title="Video %s" % i,
+                owner=user,
+                video="test%s.mp4" % i,
+                type=Type.objects.get(id=1),
+            )
+            for i in range(2)
+        ]
+        last_year = TODAY - timedelta(days=366)
+        add_view_counts(TODAY, {self.videos[0].id: 3})
+        add_view_counts(last_year, {self.videos[0].id: 5})
+        favorites, _ = Playlist.objects.get_or_create(
+            name=FAVORITE_PLAYLIST_NAME, owner=user
+        )
+        playlist = Playlist.objects.create(name="Playlist", owner=user)
+        PlaylistContent.objects.create(playlist=favorites, video=self.videos[0])
+        PlaylistContent.objects.create(playlist=playlist, video=self.videos[0])
+
+    def test_get_videos_stats(self):
+        """Test the statistics of all videos are computed with four queries."""
+        ids = [video.id for video in self.videos]
+        with CaptureQueriesContext(connection) as queries:
+            stats = get_videos_stats(ids, TODAY)
+        self.assertEqual(len(queries), 4)
+        self.assertEqual(
+            stats[ids[0]],
+            {
+                "day": 3,
+                "month": 3,
+                "year": 3,
+                "since_created": 8,
+                "playlist_day": 2,
+                "playlist_month": 2,
+                "playlist_year": 2,
+                "playlist_since_created": 2,
+                "fav_day": 1,
+                "fav_month": 1,
+                "fav_year": 1,
+                "fav_since_created": 1,
+            },
+        )
+        self.assertEqual(set(stats[ids[1]].values()), {0})
+        self.assertEqual(stats[ids[0]], get_all_views_count(ids[0]))
+        print(" --->  test_get_videos_stats: OK!")
+
+    def test_views_without_rollups(self):
+        """Test the views of a video without rollups are read from ViewCount."""
+        ViewCount.objects.create(video=self.videos[1], date=TODAY, count=2)
+        ViewCount.objects.create(
+            video=self.videos[1], date=TODAY - timedelta(days=366), count=1
+        )
+        stats = get_videos_stats([self.videos[1].id], TODAY)[self.videos[1].id]
+        self.assertEqual(
+            [stats[period] for period in ("day", "month", "year", "since_created")],
+            [2, 2, 2, 3],
+        )
+        print(" --->  test_views_without_rollups: OK!")
+
+    def test_stream_stats_json(self):
+        """Test the streamed JSON is valid and cached."""
+        videos = Video.objects.filter(id__in=[video.id for video in self.videos])
+        content = "".join(stream_stats_json("stats_test", videos, TODAY, TODAY))
+        data = json.loads(content)
+        self.assertEqual(len(data), 3)
+        self.assertEqual(data[-1], {"min_date": TODAY.isoformat()})
+        with CaptureQueriesContext(connection) as queries:
+            cached = "".join(stream_stats_json("stats_test", videos, TODAY, TODAY))
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(cached, content)
+        print(" --->  test_stream_stats_json: OK!")
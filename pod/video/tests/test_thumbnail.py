@@ -0,0 +1,109 @@
+"""Unit tests for the video thumbnail variants.
+
+*  run with `python manage.py test pod.video.tests.test_thumbnail`
+"""
+
+from io import BytesIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from PIL import Image
+
+from pod.video.models import Type, Video
+from pod.video.thumbnail import (
+    backfill_thumbnail_variants,
+    has_thumbnail_variants,
+    store_thumbnail_variants,
+)
+
+if getattr(settings, "USE_PODFILE", False):
+    __FILEPICKER__ = True
+    from pod.podfile.models import CustomImageModel, UserFolder
+else:
+    __FILEPICKER__ = False
+    from pod.main.models import CustomImageModel
+
+
+class ThumbnailVariantsTestCase(TestCase):
+    """Test the thumbnail variants of the videos."""
+
+    fixtures = [
+        "initial_data.json",
+    ]
+
+    def setUp(self):
+        """Set up a video with a 1280x720 thumbnail and a video without."""
+        user = User.objects.create(username="pod", password="pod1234pod")
+        content = BytesIO()
+        Image.new("RGB", (1280, 720), "blue").save(content, "PNG")
+        image = SimpleUploadedFile("thumbnail.png", content.getvalue(), "image/png")
+        if __FILEPICKER__:
+            homedir, created = UserFolder.objects.get_or_create(name="Home", owner=user)
+            self.thumbnail = CustomImageModel.objects.create(
+                folder=homedir, created_by=user, file=image
+            )
+        else:
+            self.thumbnail = CustomImageModel.objects.create(file=image)
+        self.video = Video.objects.create(
+            title="Video",
+            owner=user,
+            video="test.mp4",
+            type=Type.objects.get(id=1),
+            thumbnail=self.thumbnail,
+        )
+        Video.objects.create(
+            title="Video without thumbnail",
+            owner=user,
+            video="test2.mp4",
+            type=Type.objects.get(id=1),
+        )
+
+    def tearDown(self):
+        """Remove the thumbnail file."""
+        self.thumbnail.delete()
+
+    def test_store_thumbnail_variants(self):
+        """Test the variants are created and used without reading the image."""
+        self.assertFalse(has_thumbnail_variants(self.video))
+        self.assertTrue(store_thumbnail_variants(self.video.id))
+        video = Video.objects.select_related("thumbnail").get(id=self.video.id)
+        self.assertTrue(has_thumbnail_variants(video))
+        self.assertEqual(
+            (video.thumbnail_variants["x720"]["width"], video.thumbnail_dimensions),
+            (1280, (1280, 720)),
+        )
+        self.assertEqual(video.thumbnail_variants["x170"]["height"], 170)
+        with patch.object(CustomImageModel, "file_exist") as mock_file_exist:
+            self.assertEqual(
+                video.get_thumbnail_url(), video.thumbnail_variants["x720"]["url"]
+            )
+            self.assertIn(
+                video.thumbnail_variants["x170"]["url"], video.get_thumbnail_card()
+            )
+            self.assertIn(
+                video.thumbnail_variants["100x100"]["url"], video.get_thumbnail_admin
+            )
+        mock_file_exist.assert_not_called()
+        print(" --->  test_store_thumbnail_variants: OK!")
+
+    def test_outdated_variants(self):
+        """Test the variants of another thumbnail file are not used."""
+        store_thumbnail_variants(self.video.id)
+        video = Video.objects.get(id=self.video.id)
+        video.thumbnail.file.name = "other.png"
+        self.assertFalse(has_thumbnail_variants(video))
+        self.assertIsNone(video.get_thumbnail_variant("x720"))
+        print(" --->  test_outdated_variants: OK!")
+
+    @patch("pod.video.thumbnail.store_thumbnail_variants_thread", return_value=True)
+    def test_backfill_thumbnail_variants(self, mock_store):
+        """Test only the videos with missing variants are processed."""
+        self.assertEqual(backfill_thumbnail_variants(workers=2), (1, 0))
+        mock_store.assert_called_once_with(self.video.id)
+        store_thumbnail_variants(self.video.id)
+        self.assertEqual(backfill_thumbnail_variants(workers=2), (0, 0))
+        self.assertEqual(backfill_thumbnail_variants(workers=2, force=True), (1, 0))
+        print(" --->  test_backfill_thumbnail_variants: OK!")
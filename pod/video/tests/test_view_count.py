@@ -0,0 +1,253 @@
+"""Unit tests for the buffered video view counter.
+
+*  run with `python manage.py test pod.video.tests.test_view_count`
+"""
+
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from redis.exceptions import ResponseError
+
+from pod.video.models import Type, Video, ViewCount, ViewCountMonth, ViewCountTotal
+from pod.video.view_count import (
+    add_view,
+    add_view_counts,
+    flush_views,
+    get_pending_views,
+    rebuild_view_rollups,
+    rollup_recent_views,
+    start_flushing,
+    write_flushed_views,
+)
+
+
+class FakeRedis:
+    """Minimal in memory Redis with the commands used by the view counter."""
+
+    def __init__(self):
+        self.data = {}
+
+    def hincrby(self, key, field, amount):
+        fields = self.data.setdefault(key, {})
+        fields[str(field).encode()] = int(fields.get(str(field).encode(), 0)) + amount
+        return fields[str(field).encode()]
+
+    def hget(self, key, field):
+        return self.data.get(key, {}).get(str(field).encode())
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def sadd(self, key, member):
+        self.data.setdefault(key, set()).add(member.encode())
+
+    def srem(self, key, member):
+        self.data.get(key, set()).discard(member.encode())
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    def rename(self, key, new_key):
+        if key not in self.data:
+            raise ResponseError("no such key")
+        self.data[new_key] = self.data.pop(key)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value.encode()
+        return True
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Queue the commands and run them on execute."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self.commands.append((name, args))
+
+        return queue
+
+    def execute(self):
+        return [getattr(self.redis, name)(*args) for name, args in self.commands]
+
+
+class ViewCountBufferTestCase(TestCase):
+    """Test the views are buffered in Redis then written in ViewCount."""
+
+    fixtures = [
+        "initial_data.json",
+    ]
+
+    def setUp(self):
+        """Set up a video and a fake Redis connection."""
+        user = User.objects.create(username="pod", password="pod1234pod")
+        self.video = Video.objects.create(
+            title="Video1",
+            owner=user,
+            video="test.mp4",
+            type=Type.objects.get(id=1),
+        )
+        self.redis = FakeRedis()
+        patcher = patch("pod.video.view_count.get_redis", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pending_views(self):
+        """Test the buffered views are merged in the view counter."""
+        add_view(self.video.id)
+        add_view(self.video.id)
+        self.assertEqual(get_pending_views(self.video.id), 2)
+        self.assertEqual(get_pending_views(self.video.id, date.today()), 2)
+        self.assertEqual(
+            get_pending_views(self.video.id, date.today() + timedelta(days=1)), 0
+        )
+        self.assertEqual(self.video.get_viewcount(), 0)
+        with patch("pod.video.models.VIEW_COUNT_BUFFER", True):
+            self.assertEqual(self.video.get_viewcount(), 2)
+        print(" --->  test_pending_views: OK!")
+
+    def test_flush_views(self):
+        """Test the buffered views are added to the existing view counts."""
+        add_view(self.video.id)
+        add_view(99999)
+        self.assertEqual(flush_views(), 2)
+        self.assertEqual(ViewCount.objects.get(video=self.video).count, 1)
+        add_view(self.video.id)
+        add_view(self.video.id)
+        self.assertEqual(flush_views(), 2)
+        self.assertEqual(ViewCount.objects.get(video=self.video).count, 3)
+        self.assertEqual(ViewCount.objects.count(), 1)
+        self.assertEqual(get_pending_views(self.video.id), 0)
+        self.assertEqual(self.redis.smembers("viewcount:keys"), set())
+        print(" --->  test_flush_views: OK!")
+
+    def test_flush_lock(self):
+        """Test the views are not written while another flush is running."""
+        add_view(self.video.id)
+        self.redis.set("viewcount:flush", "other")
+        self.assertIsNone(flush_views())
+        self.assertEqual(ViewCount.objects.count(), 0)
+        self.assertEqual(get_pending_views(self.video.id), 1)
+        self.redis.delete("viewcount:flush")
+        self.assertEqual(flush_views(), 1)
+        self.assertIsNone(self.redis.get("viewcount:flush"))
+        print(" --->  test_flush_lock: OK!")
+
+    def test_flush_once(self):
+        """Test a hash written by an interrupted flush is not written twice."""
+        add_view(self.video.id)
+        key = start_flushing(self.redis, "viewcount:%s" % date.today().isoformat())
+        # the flush stopped after writing the views, before deleting the hash
+        self.assertTrue(write_flushed_views(key, {self.video.id: 1}))
+        self.assertEqual(flush_views(), 0)
+        self.assertEqual(ViewCount.objects.get(video=self.video).count, 1)
+        self.assertEqual(self.redis.smembers("viewcount:keys"), set())
+        self.assertEqual(self.redis.hgetall(key), {})
+        print(" --->  test_flush_once: OK!")
+
+    @patch("pod.video.views.VIEW_COUNT_BUFFER", True)
+    def test_video_count_view(self):
+        """Test the video_count view only counts the view in Redis."""
+        url = reverse("video:video_count", kwargs={"id": self.video.id})
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ViewCount.objects.count(), 0)
+        self.assertEqual(get_pending_views(self.video.id), 1)
+        print(" --->  test_video_count_view: OK!")
+
+
+class ViewCountRollupTestCase(TestCase):
+    """Test the monthly and total view count rollups."""
+
+    fixtures = [
+        "initial_data.json",
+    ]
+
+    def setUp(self):
+        """Set up a video viewed today and last year."""
+        user = User.objects.create(username="pod", password="pod1234pod")
+        self.video = Video.objects.create(
+            title="Video1",
+            owner=user,
+            video="test.mp4",
+            type=Type.objects.get(id=1),
+        )
+        self.last_year = date.today() - timedelta(days=366)
+        add_view_counts(date.today(), {self.video.id: 2})
+        add_view_counts(date.today(), {self.video.id: 1})
+        add_view_counts(self.last_year, {self.video.id: 4})
+
+    def test_add_view_counts(self):
+        """Test the rollups are updated with the daily view counts."""
+        self.assertEqual(
+            ViewCount.objects.get(video=self.video, date=date.today()).count, 3
+        )
+        self.assertEqual(
+            ViewCountMonth.objects.get(
+                video=self.video, month=date.today().replace(day=1)
+            ).count,
+            3,
+        )
+        total = ViewCountTotal.objects.get(video=self.video)
+        self.assertEqual((total.total, total.recent), (7, 3))
+        video = Video.objects.get(id=self.video.id)
+        with self.assertNumQueries(1):
+            self.assertEqual(video.viewcount, 7)
+            self.assertEqual(video.recentViewcount, 3)
+        print(" --->  test_add_view_counts: OK!")
+
+    def test_rollup_recent_views(self):
+        """Test the recent views are recomputed from the daily view counts."""
+        ViewCount.objects.filter(date=date.today()).update(
+            date=self.last_year - timedelta(days=1)
+        )
+        self.assertEqual(rollup_recent_views(), 1)
+        self.assertEqual(ViewCountTotal.objects.get(video=self.video).recent, 0)
+        self.assertEqual(rollup_recent_views(), 0)
+        print(" --->  test_rollup_recent_views: OK!")
+
+    def test_first_rollups(self):
+        """Test the first rollups of a video include the views counted before them."""
+        ViewCountMonth.objects.all().delete()
+        ViewCountTotal.objects.all().delete()
+        add_view_counts(date.today(), {self.video.id: 1})
+        total = ViewCountTotal.objects.get(video=self.video)
+        self.assertEqual((total.total, total.recent), (8, 4))
+        self.assertEqual(
+            ViewCountMonth.objects.get(
+                video=self.video, month=self.last_year.replace(day=1)
+            ).count,
+            4,
+        )
+        print(" --->  test_first_rollups: OK!")
+
+    def test_rebuild_view_rollups(self):
+        """Test the rollups are rebuilt from the daily view counts."""
+        ViewCountMonth.objects.all().delete()
+        ViewCountTotal.objects.filter(video=self.video).update(total=0, recent=0)
+        self.assertEqual(rebuild_view_rollups(batch_size=1), 1)
+        self.assertEqual(ViewCountMonth.objects.filter(video=self.video).count(), 2)
+        total = ViewCountTotal.objects.get(video=self.video)
+        self.assertEqual((total.total, total.recent), (7, 3))
+        ViewCount.objects.all().delete()
+        self.assertEqual(rebuild_view_rollups(), 0)
+        self.assertFalse(ViewCountTotal.objects.exists())
+        self.assertFalse(ViewCountMonth.objects.exists())
+        print(" --->  test_rebuild_view_rollups: OK!")
@@ -154,7 +154,7 @@ class ChannelTestView(TestCase):
         self.assertEqual(response.context["videos"].paginator.count, 1)
         self.assertEqual(response.context["theme"], None)
         self.assertTrue(
-            b'id="videos_list" data-nextpage="false" data-countvideos="">'
+            b'id="videos_list" data-nextpage="false" data-countvideos="" data-cursor="">'
             in response.content
         )
 
@@ -195,7 +195,7 @@ class ChannelTestView(TestCase):
         self.assertEqual(response.context["videos"].paginator.count, 1)
         self.assertEqual(response.context["theme"], None)
         self.assertTrue(
-            b'id="videos_list" data-nextpage="false" data-countvideos="">'
+            b'id="videos_list" data-nextpage="false" data-countvideos="" data-cursor="">'
             in response.content
         )
 
@@ -0,0 +1,87 @@
+"""Esup-Pod video thumbnail variants.
+
+The thumbnail of a video is resized once in each size of
+VIDEO_THUMBNAIL_SIZES, when it is created by the encoding or chosen by the
+owner. The url and dimensions of each variant are stored in the
+thumbnail_variants field of the video, with the name of the thumbnail file,
+so the pages display them without reading the image. The variants of the
+existing videos are created by the create_thumbnail_variants command.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from sorl.thumbnail import get_thumbnail
+
+from .card import invalidate_cards
+from .models import Video
+
+# quality of the thumbnail for each size
+VIDEO_THUMBNAIL_SIZES = getattr(
+    settings, "VIDEO_THUMBNAIL_SIZES", {"x720": 80, "x170": 72, "100x100": 72}
+)
+VIDEO_THUMBNAIL_FORMAT = getattr(settings, "VIDEO_THUMBNAIL_FORMAT", "")
+
+log = logging.getLogger(__name__)
+
+
+def create_thumbnail_variants(image) -> dict:
+    """Create the variants of a thumbnail image, return their url and dimensions."""
+    if not image or not image.file_exist():
+        return {}
+    variants = {"file": image.file.name, "format": VIDEO_THUMBNAIL_FORMAT}
+    options = {"crop": "center"}
+    if VIDEO_THUMBNAIL_FORMAT:
+        options["format"] = VIDEO_THUMBNAIL_FORMAT
+    try:
+        for size, quality in VIDEO_THUMBNAIL_SIZES.items():
+            im = get_thumbnail(image.file, size, quality=quality, **options)
+            variants[size] = {"url": im.url, "width": im.width, "height": im.height}
+    except Exception as e:
+        log.error("Error creating the variants of %s: %s" % (image.file.name, e))
+        return {}
+    return variants
+
+
+def has_thumbnail_variants(video) -> bool:
+    """Check the thumbnail variants of a video are up to date."""
+    variants = video.thumbnail_variants or {}
+    return (
+        video.thumbnail is not None
+        and variants.get("file") == video.thumbnail.file.name
+        and variants.get("format") == VIDEO_THUMBNAIL_FORMAT
+        and all(size in variants for size in VIDEO_THUMBNAIL_SIZES)
+    )
+
+
+def store_thumbnail_variants(video_id: int) -> bool:
+    """Create and store the thumbnail variants of a video, return their success."""
+    video = Video.objects.select_related("thumbnail").get(id=video_id)
+    variants = create_thumbnail_variants(video.thumbnail)
+    # no save signal: only the cached card shows the thumbnail
+    Video.objects.filter(id=video_id).update(thumbnail_variants=variants)
+    invalidate_cards([video_id])
+    return bool(variants)
+
+
+def store_thumbnail_variants_thread(video_id: int) -> bool:
+    """Store the thumbnail variants of a video in a thread with its own connection."""
+    try:
+        return store_thumbnail_variants(video_id)
+    finally:
+        connection.close()
+
+
+def backfill_thumbnail_variants(workers: int = 4, force: bool = False) -> tuple:
+    """Create the missing variants in threads, return the videos and errors numbers."""
+    videos = Video.objects.filter(thumbnail__isnull=False).select_related("thumbnail")
+    video_ids = [
+        video.id
+        for video in videos.only("id", "thumbnail_variants", "thumbnail__file")
+        if force or not has_thumbnail_variants(video)
+    ]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(store_thumbnail_variants_thread, video_ids))
+    return len(results), results.count(False)
@@ -0,0 +1,323 @@
+"""Esup-Pod buffered video view counter.
+
+With VIEW_COUNT_BUFFER, the views are counted in Redis hashes (one per day,
+a field per video) and written in ViewCount by the flush_view_counts command.
+ViewCountMonth and ViewCountTotal are updated with ViewCount, the recent
+views are recomputed every night by the rollup_view_counts command. The
+rollups of a video are built from all its daily views on its first view.
+"""
+
+import logging
+import uuid
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from redis.exceptions import RedisError, ResponseError
+
+VIEW_COUNT_BUFFER = getattr(settings, "VIEW_COUNT_BUFFER", False)
+
+# set of the names of the hashes holding views not written in database
+VIEW_COUNT_KEYS = "viewcount:keys"
+# lock of the flush and its maximum duration in seconds
+VIEW_COUNT_FLUSH_LOCK = "viewcount:flush"
+VIEW_COUNT_FLUSH_LOCK_TIMEOUT = 3600
+# days during which the names of the written hashes are kept
+VIEW_COUNT_FLUSH_DAYS = 30
+
+logger = logging.getLogger(__name__)
+
+
+def get_redis():
+    """Get the Redis connection of the default cache."""
+    from django_redis import get_redis_connection
+
+    return get_redis_connection("default")
+
+
+def get_key_date(key: str) -> date:
+    """Get the day of a view count hash name (viewcount:<day>[:flushing:<id>])."""
+    return date.fromisoformat(key.split(":")[1])
+
+
+def get_keys(redis) -> list:
+    """Get the names of the view count hashes."""
+    return sorted(key.decode() for key in redis.smembers(VIEW_COUNT_KEYS))
+
+
+def add_view(video_id: int) -> None:
+    """Count a view of the video in the hash of the day."""
+    key = "viewcount:%s" % date.today().isoformat()
+    pipe = get_redis().pipeline()
+    pipe.hincrby(key, video_id, 1)
+    pipe.sadd(VIEW_COUNT_KEYS, key)
+    pipe.execute()
+
+
+def get_pending_views(video_id: int, from_date=None) -> int:
+    """Get the views of the video not yet written in database."""
+    try:
+        redis = get_redis()
+        keys = [
+            key
+            for key in get_keys(redis)
+            if from_date is None or get_key_date(key) >= from_date
+        ]
+        pipe = redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.hget(key, video_id)
+        return sum(int(count) for count in pipe.execute() if count)
+    except RedisError as e:
+        logger.error("Unable to get the buffered views: %s" % e)
+        return 0
+
+
+def add_counts(model, filters: dict, counts: dict, fields: list) -> None:
+    """Add the counts of each video to the fields of the model rows, creating them."""
+    rows = list(
+        model.objects.select_for_update().filter(video_id__in=counts.keys(), **filters)
+    )
+    for row in rows:
+        for field in fields:
+            setattr(row, field, F(field) + counts[row.video_id])
+    model.objects.bulk_update(rows, fields)
+    new_ids = counts.keys() - set(row.video_id for row in rows)
+    model.objects.bulk_create(
+        [
+            model(video_id=video_id, **filters, **{f: counts[video_id] for f in fields})
+            for video_id in new_ids
+        ]
+    )
+
+
+def run_atomic(function, *args):
+    """Run the function in a transaction, again if a concurrent view created a row."""
+    for attempt in (1, 2):
+        try:
+            with transaction.atomic():
+                return function(*args)
+        except IntegrityError:
+            # the row created by the concurrent view is now updated
+            if attempt == 2:
+                raise
+
+
+def add_view_counts(day: date, counts: dict) -> None:
+    """Add the view counts of the day to ViewCount and to its rollups."""
+    run_atomic(add_day_counts, day, counts)
+
+
+def add_day_counts(day: date, counts: dict) -> None:
+    """Add the view counts of the day, the first rollups of a video include its past."""
+    from .models import ViewCount, ViewCountMonth, ViewCountTotal, VIDEO_RECENT_VIEWCOUNT
+
+    add_counts(ViewCount, {"date": day}, counts, ["count"])
+    # the totals are locked before the months, as by build_view_rollups
+    rolled_up = set(
+        ViewCountTotal.objects.select_for_update()
+        .filter(video_id__in=counts.keys())
+        .values_list("video_id", flat=True)
+    )
+    rolled_up_counts = {video_id: counts[video_id] for video_id in rolled_up}
+    total_fields = ["total"]
+    if day >= date.today() - timedelta(days=VIDEO_RECENT_VIEWCOUNT):
+        total_fields.append("recent")
+    add_counts(ViewCountMonth, {"month": day.replace(day=1)}, rolled_up_counts, ["count"])
+    add_counts(ViewCountTotal, {}, rolled_up_counts, total_fields)
+    build_view_rollups(counts.keys() - rolled_up)
+
+
+def write_view_counts(day: date, counts: dict) -> None:
+    """Add the view counts of the day of the existing videos."""
+    from .models import Video
+
+    video_ids = Video.objects.filter(id__in=counts.keys()).values_list("id", flat=True)
+    add_view_counts(day, {video_id: counts[video_id] for video_id in video_ids})
+
+
+def rollup_recent_views() -> int:
+    """Recompute the recent views of ViewCountTotal, return the number of updates."""
+    from .models import ViewCount, ViewCountTotal, VIDEO_RECENT_VIEWCOUNT
+
+    from_date = date.today() - timedelta(days=VIDEO_RECENT_VIEWCOUNT)
+    with transaction.atomic():
+        recent = dict(
+            ViewCount.objects.filter(date__gte=from_date)
+            .values_list("video_id")
+            .annotate(Sum("count"))
+            .order_by()
+        )
+        rows = [
+            row
+            for row in ViewCountTotal.objects.select_for_update().only("video", "recent")
+            if row.recent != recent.get(row.video_id, 0)
+        ]
+        for row in rows:
+            row.recent = recent.get(row.video_id, 0)
+        ViewCountTotal.objects.bulk_update(rows, ["recent"], batch_size=1000)
+    return len(rows)
+
+
+def set_counts(model, video_ids: list, values: dict, keys: list, fields: list) -> None:
+    """
+    Set the fields of the rows of the videos to the values, by their keys fields.
+
+    The existing rows are updated rather than recreated, so a concurrent view
+    never misses a row nor creates one twice.
+    """
+    rows = {
+        tuple(getattr(row, key) for key in keys): row
+        for row in model.objects.select_for_update().filter(video_id__in=video_ids)
+    }
+    model.objects.filter(
+        pk__in=[row.pk for key, row in rows.items() if key not in values]
+    ).delete()
+    to_update = []
+    for key, counts in values.items():
+        if key in rows:
+            for field in fields:
+                setattr(rows[key], field, counts[field])
+            to_update.append(rows[key])
+    model.objects.bulk_update(to_update, fields, batch_size=1000)
+    model.objects.bulk_create(
+        [
+            model(**dict(zip(keys, key)), **counts)
+            for key, counts in values.items()
+            if key not in rows
+        ],
+        batch_size=1000,
+    )
+
+
+def build_view_rollups(video_ids) -> int:
+    """Set the rollups of the videos from their daily views, return their number."""
+    from .models import ViewCount, ViewCountMonth, ViewCountTotal, VIDEO_RECENT_VIEWCOUNT
+
+    video_ids = list(video_ids)
+    if not video_ids:
+        return 0
+    # the views of the videos are read once their rollups are locked
+    list(ViewCountTotal.objects.select_for_update().filter(video_id__in=video_ids))
+    from_date = date.today() - timedelta(days=VIDEO_RECENT_VIEWCOUNT)
+    views = ViewCount.objects.filter(video_id__in=video_ids)
+    totals = (
+        views.values_list("video_id")
+        .annotate(total=Sum("count"), recent=Sum("count", filter=Q(date__gte=from_date)))
+        .order_by()
+    )
+    set_counts(
+        ViewCountTotal,
+        video_ids,
+        {
+            (video_id,): {"total": total, "recent": recent or 0}
+            for video_id, total, recent in totals
+        },
+        ["video_id"],
+        ["total", "recent"],
+    )
+    months = (
+        views.annotate(month=TruncMonth("date"))
+        .values_list("video_id", "month")
+        .annotate(Sum("count"))
+        .order_by()
+    )
+    set_counts(
+        ViewCountMonth,
+        video_ids,
+        {(video_id, month): {"count": count} for video_id, month, count in months},
+        ["video_id", "month"],
+        ["count"],
+    )
+    return len(totals)
+
+
+def rebuild_view_rollups(batch_size: int = 1000) -> int:
+    """Rebuild ViewCountMonth and ViewCountTotal from ViewCount, return the videos."""
+    from .models import ViewCount, ViewCountTotal
+
+    video_ids = sorted(
+        set(ViewCount.objects.values_list("video_id", flat=True).distinct())
+        | set(ViewCountTotal.objects.values_list("video_id", flat=True))
+    )
+    nb_videos = 0
+    # one transaction by batch, the views of the other videos are not blocked
+    for start in range(0, len(video_ids), batch_size):
+        nb_videos += run_atomic(build_view_rollups, video_ids[start : start + batch_size])
+    return nb_videos
+
+
+def start_flushing(redis, key: str):
+    """Rename the hash so new views go to a new one, return the new name."""
+    flushing_key = "%s:flushing:%s" % (key, uuid.uuid4().hex)
+    pipe = redis.pipeline()
+    pipe.rename(key, flushing_key)
+    pipe.srem(VIEW_COUNT_KEYS, key)
+    pipe.sadd(VIEW_COUNT_KEYS, flushing_key)
+    try:
+        pipe.execute()
+    except ResponseError:
+        # the hash no longer exists
+        redis.srem(VIEW_COUNT_KEYS, key)
+        return None
+    return flushing_key
+
+
+def write_flushed_views(key: str, counts: dict) -> bool:
+    """Write the views of a hash unless they already are, return if they were."""
+    from .models import ViewCountFlush
+
+    with transaction.atomic():
+        # the name of the hash is stored with its views, never written twice
+        if ViewCountFlush.objects.filter(key=key).exists():
+            return False
+        ViewCountFlush.objects.create(key=key)
+        write_view_counts(get_key_date(key), counts)
+    return True
+
+
+def flush_keys(redis) -> int:
+    """Write the views of all the hashes in ViewCount, return their number."""
+    from .models import ViewCountFlush
+
+    nb_views = 0
+    for key in get_keys(redis):
+        # a hash left by an interrupted flush is written if it was not yet
+        if ":flushing:" not in key:
+            key = start_flushing(redis, key)
+            if key is None:
+                continue
+        counts = {
+            int(video_id): int(count) for video_id, count in redis.hgetall(key).items()
+        }
+        if write_flushed_views(key, counts):
+            nb_views += sum(counts.values())
+        pipe = redis.pipeline()
+        pipe.delete(key)
+        pipe.srem(VIEW_COUNT_KEYS, key)
+        pipe.execute()
+    ViewCountFlush.objects.filter(
+        date__lt=timezone.now() - timedelta(days=VIEW_COUNT_FLUSH_DAYS)
+    ).delete()
+    return nb_views
+
+
+def flush_views():
+    """Write the buffered views in ViewCount, return the number of views written.
+
+    Return None without writing anything while another flush is running.
+    """
+    redis = get_redis()
+    token = uuid.uuid4().hex
+    if not redis.set(
+        VIEW_COUNT_FLUSH_LOCK, token, nx=True, ex=VIEW_COUNT_FLUSH_LOCK_TIMEOUT
+    ):
+        return None
+    try:
+        return flush_keys(redis)
+    finally:
+        # the lock may have expired and been taken by another flush
+        if redis.get(VIEW_COUNT_FLUSH_LOCK) == token.encode():
+            redis.delete(VIEW_COUNT_FLUSH_LOCK)
@@ -7,11 +7,12 @@ from django.core.exceptions import PermissionDenied, SuspiciousOperation
 from django.core.handlers.wsgi import WSGIRequest
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.core.serializers.json import DjangoJSONEncoder
-from django.db.models import Count, F, Q, Case, When, Value, BooleanField
+from django.db.models import Count, Q, Case, When, Value, BooleanField
+from django.db.models import Exists, OuterRef
 from django.db.models.functions import Concat
 from django.shortcuts import get_object_or_404
 from django.shortcuts import render
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.http import HttpResponseNotFound
 from django.http import HttpResponseForbidden, HttpResponseBadRequest
 from django.http import QueryDict, Http404
@@ -27,7 +28,7 @@ from django.conf import settings
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.utils import timezone
-from django.db.models import Sum, Min
+from django.db.models import Min
 
 
 # from django.contrib.auth.hashers import check_password
@@ -39,8 +40,7 @@ from pod.main.models import AdditionalChannelTab
 from pod.main.views import in_maintenance
 from pod.main.decorators import ajax_required, ajax_login_required, admin_required
 from pod.authentication.utils import get_owners as auth_get_owners
-from pod.playlist.apps import FAVORITE_PLAYLIST_NAME
-from pod.playlist.models import Playlist, PlaylistContent
+from pod.playlist.models import Playlist
 from pod.playlist.utils import (
     get_video_list_for_playlist,
     playlist_can_be_displayed,
@@ -52,7 +52,7 @@ from pod.video.models import Type
 from pod.video.models import Channel
 from pod.video.models import Theme
 from pod.video.models import AdvancedNotes, NoteComments, NOTES_STATUS
-from pod.video.models import ViewCount, VideoVersion
+from pod.video.models import VideoVersion
 from pod.video.models import Comment, Vote, Category
 from pod.video.models import get_transcription_choices
 from pod.video.models import UserMarkerTime, VideoAccessToken
@@ -75,6 +75,11 @@ from .utils import (
 )
 from .context_processors import get_available_videos
 from .utils import sort_videos_list
+from .view_count import add_view, add_view_counts
+from .stats import get_videos_stats, stream_stats_json
+from .thumbnail import create_thumbnail_variants
+from .card import annotate_cards
+from .listing import get_offset_page, get_videos_count, get_videos_page
 
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.core.exceptions import ObjectDoesNotExist
@@ -85,11 +90,14 @@ import uuid
 from datetime import date
 from chunked_upload.models import ChunkedUpload
 from chunked_upload.views import ChunkedUploadView, ChunkedUploadCompleteView
-from itertools import chain
 
 from django.db import IntegrityError
 from django.db.models import QuerySet
 from django.db import transaction
+from redis.exceptions import RedisError
+import logging
+
+logger = logging.getLogger(__name__)
 
 RESTRICT_EDIT_VIDEO_ACCESS_TO_STAFF_ONLY = getattr(
     settings, "RESTRICT_EDIT_VIDEO_ACCESS_TO_STAFF_ONLY", False
@@ -172,6 +180,7 @@ CURSUS_CODES = getattr(
 )
 
 VIEW_STATS_AUTH = getattr(settings, "VIEW_STATS_AUTH", False)
+VIEW_COUNT_BUFFER = getattr(settings, "VIEW_COUNT_BUFFER", False)
 ACTIVE_VIDEO_COMMENT = getattr(settings, "ACTIVE_VIDEO_COMMENT", False)
 USER_VIDEO_CATEGORY = getattr(settings, "USER_VIDEO_CATEGORY", False)
 DEFAULT_TYPE_ID = getattr(settings, "DEFAULT_TYPE_ID", 1)
@@ -362,7 +371,7 @@ def channel(request, slug_c, slug_t=None):
     channel = get_object_or_404(Channel, slug=slug_c, site=get_current_site(request))
     videos_list = get_available_videos().filter(channel=channel)
     videos_list = sort_videos_list(videos_list, "order", "on")
-    channel.video_count = videos_list.count()
+    channel.video_count = get_videos_count(videos_list)
 
     theme = None
     if slug_t:
@@ -378,7 +387,7 @@ def channel(request, slug_c, slug_t=None):
             .replace("?page=%s" % page, "")
             .replace("&page=%s" % page, "")
         )
-    videos = paginator(videos_list, page)
+    videos = get_videos_page(request, videos_list, "order", "on")
 
     if ORGANIZE_BY_THEME:
         # Specific case
@@ -609,10 +618,8 @@ def dashboard(request):
     ownersInstances = get_owners_has_instances(request.GET.getlist("owner"))
     owner_filter = owner_is_searchable(request.user)
 
-    count_videos = len(sorted_videos_list)
-
-    paginator = Paginator(sorted_videos_list, 12)
-    videos = get_paginated_videos(paginator, page)
+    videos = get_videos_page(request, sorted_videos_list, sort_field, sort_direction)
+    count_videos = videos.paginator.count
 
     videos_list_templates = {
         "grid": "videos/video_list_grid_selectable.html",
@@ -879,16 +886,6 @@ def get_recap_message_bulk_update(request, update_action, counter, delta) -> str
     return msg
 
 
-def get_paginated_videos(paginator, page):
-    """Return paginated videos in paginator object."""
-    try:
-        return paginator.page(page)
-    except PageNotAnInteger:
-        return paginator.page(1)
-    except EmptyPage:
-        return paginator.page(paginator.num_pages)
-
-
 def get_filtered_videos_list(request, videos_list):
     """Return filtered videos list by get parameters."""
     if request.GET.getlist("type"):
@@ -954,8 +951,6 @@ def videos(request):
     if not sort_field:
         # Get the default Video ordering
         sort_field = Video._meta.ordering[0].lstrip("-")
-    count_videos = len(videos_list)
-
     page = request.GET.get("page", 1)
     if page == "" or page is None:
         page = 1
@@ -967,8 +962,8 @@ def videos(request):
             .replace("&page=%s" % page, "")
         )
 
-    paginator = Paginator(videos_list, 12)
-    videos = get_paginated_videos(paginator, page)
+    videos = get_videos_page(request, videos_list, sort_field, sort_direction)
+    count_videos = videos.paginator.count
     ownersInstances = get_owners_has_instances(request.GET.getlist("owner"))
     owner_filter = owner_is_searchable(request.user)
 
@@ -1373,6 +1368,8 @@ def save_video_form(request, form):
 
     elif getattr(video, "owner", None) is None:
         video.owner = request.user
+    if "thumbnail" in form.changed_data:
+        video.thumbnail_variants = create_thumbnail_variants(video.thumbnail)
     video.save()
     form.save_m2m()
     video.sites.add(get_current_site(request))
@@ -2266,19 +2263,16 @@ def video_note_download(request, slug):
 @csrf_protect
 def video_count(request, id):
     """View to store the video count."""
+    if request.method == "POST" and VIEW_COUNT_BUFFER:
+        # counted in Redis, unknown videos are ignored when flushing
+        try:
+            add_view(int(id))
+            return HttpResponse("ok")
+        except RedisError as e:
+            logger.error("Unable to buffer the view of video %s: %s" % (id, e))
     video = get_object_or_404(Video, id=id)
     if request.method == "POST":
-        try:
-            view_count = ViewCount.objects.get(video=video, date=date.today())
-        except ViewCount.DoesNotExist:
-            try:
-                with transaction.atomic():
-                    ViewCount.objects.create(video=video, count=1)
-                    return HttpResponse("ok")
-            except IntegrityError:
-                view_count = ViewCount.objects.get(video=video, date=date.today())
-        view_count.count = F("count") + 1
-        view_count.save(update_fields=["count"])
+        add_view_counts(date.today(), {video.id: 1})
         return HttpResponse("ok")
     messages.add_message(request, messages.ERROR, _("You cannot access to this view."))
     raise PermissionDenied
@@ -2436,88 +2430,8 @@ def video_oembed(request):
 
 
 def get_all_views_count(v_id, date_filter=date.today()):
-    all_views = {}
-
-    # view count in day
-    count = ViewCount.objects.filter(video_id=v_id, date=date_filter).aggregate(
-        Sum("count")
-    )["count__sum"]
-    all_views["day"] = count if count else 0
-
-    # view count in month
-    count = ViewCount.objects.filter(
-        video_id=v_id,
-        date__year=date_filter.year,
-        date__month=date_filter.month,
-    ).aggregate(Sum("count"))["count__sum"]
-    all_views["month"] = count if count else 0
-
-    # view count in year
-    count = ViewCount.objects.filter(
-        date__year=date_filter.year, video_id=v_id
-    ).aggregate(Sum("count"))["count__sum"]
-    all_views["year"] = count if count else 0
-
-    # view count since video was created
-    count = ViewCount.objects.filter(video_id=v_id).aggregate(Sum("count"))["count__sum"]
-    all_views["since_created"] = count if count else 0
-
-    # playlist addition in day
-    count = PlaylistContent.objects.filter(
-        video_id=v_id, date_added__date=date_filter
-    ).count()
-    all_views["playlist_day"] = count if count else 0
-
-    # playlist addition in month
-    count = PlaylistContent.objects.filter(
-        video_id=v_id,
-        date_added__year=date_filter.year,
-        date_added__month=date_filter.month,
-    ).count()
-    all_views["playlist_month"] = count if count else 0
-
-    # playlist addition in year
-    count = PlaylistContent.objects.filter(
-        video_id=v_id,
-        date_added__year=date_filter.year,
-    ).count()
-    all_views["playlist_year"] = count if count else 0
-
-    # playlist addition since video was created
-    count = PlaylistContent.objects.filter(video_id=v_id).count()
-    all_views["playlist_since_created"] = count if count else 0
-
-    favorites_playlists = Playlist.objects.filter(name=FAVORITE_PLAYLIST_NAME)
-
-    # favorite addition in day
-    count = PlaylistContent.objects.filter(
-        playlist__in=favorites_playlists, video_id=v_id, date_added__date=date_filter
-    ).count()
-    all_views["fav_day"] = count if count else 0
-
-    # favorite addition in month
-    count = PlaylistContent.objects.filter(
-        playlist__in=favorites_playlists,
-        video_id=v_id,
-        date_added__year=date_filter.year,
-        date_added__month=date_filter.month,
-    ).count()
-    all_views["fav_month"] = count if count else 0
-
-    # favorite addition in year
-    count = PlaylistContent.objects.filter(
-        playlist__in=favorites_playlists, video_id=v_id, date_added__year=date_filter.year
-    ).count()
-    all_views["fav_year"] = count if count else 0
-
-    # favorite addition since video was created
-    count = PlaylistContent.objects.filter(
-        playlist__in=favorites_playlists,
-        video_id=v_id,
-    ).count()
-    all_views["fav_since_created"] = count if count else 0
-
-    return all_views
+    """Get the viewing statistics of a video."""
+    return get_videos_stats([v_id], date_filter)[v_id]
 
 
 def get_videos(p_slug, target, p_slug_t=None):
@@ -2662,23 +2576,20 @@ def stats_view(request, slug=None, slug_t=None):
         if isinstance(date_filter, str):
             date_filter = parse(date_filter).date()
 
-        data = list(
-            map(
-                lambda v: {
-                    "title": v.title,
-                    "slug": v.slug,
-                    **get_all_views_count(v.id, date_filter),
-                },
-                videos,
-            )
-        )
-
         min_date = (
             get_available_videos().aggregate(Min("date_added"))["date_added__min"].date()
         )
-        data.append({"min_date": min_date})
-
-        return JsonResponse(data, safe=False)
+        cache_key = "stats_view_%s_%s_%s_%s_%s" % (
+            get_current_site(request).id,
+            target,
+            slug,
+            slug_t,
+            date_filter.isoformat(),
+        )
+        return StreamingHttpResponse(
+            stream_stats_json(cache_key, videos, date_filter, min_date),
+            content_type="application/json",
+        )
 
 
 @login_required(redirect_field_name="referrer")
@@ -3008,18 +2919,24 @@ def get_videos_for_category(request, videos_list: dict, category=None):
     Returns:
         Return paginated videos in paginator object.
     """
-    cats = Category.objects.prefetch_related("video").filter(owner=request.user)
-    videos = videos_list.exclude(category__in=cats)
-
+    cats = Category.objects.filter(owner=request.user)
+    in_categories = Category.video.through.objects.filter(video=OuterRef("pk"))
+    videos = videos_list.annotate(
+        in_categories=Exists(in_categories.filter(category__in=cats))
+    )
     if category is not None:
-        videos = list(chain(category.video.all(), videos))
+        # the videos of the category come first
+        videos = videos.annotate(
+            in_category=Exists(in_categories.filter(category=category))
+        )
+        videos = videos.filter(Q(in_category=True) | Q(in_categories=False))
+        ordering = videos_list.query.order_by or Video._meta.ordering
+        videos = videos.order_by("-in_category", *ordering)
+    else:
+        videos = videos.filter(in_categories=False)
 
     page = request.GET.get("page", 1)
-
-    paginator = Paginator(videos, 12)
-    paginated_videos_without_cat = get_paginated_videos(paginator, page)
-
-    return paginated_videos_without_cat
+    return get_offset_page(Paginator(annotate_cards(videos), 12), page)
 
 
 @login_required(redirect_field_name="referrer")
@@ -1,8 +1,11 @@
 """Esup-Pod video encoding."""
 
+import glob
 import json
 import os
+import shutil
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from webvtt import WebVTT, Caption
 import argparse
 import unicodedata
@@ -44,6 +47,26 @@ if __name__ == "__main__":
         FFMPEG_DRESSING_FILTER_COMPLEX,
         FFMPEG_DRESSING_SCALE,
         FFMPEG_DRESSING_CONCAT,
+        FFMPEG_SINGLE_PASS_ENCODE,
+        FFMPEG_SINGLE_PASS_SPLIT,
+        FFMPEG_SINGLE_PASS_SCALE,
+        FFMPEG_SINGLE_PASS_THUMBNAIL,
+        FFMPEG_SINGLE_PASS_MP4_ENCODE,
+        FFMPEG_SINGLE_PASS_HLS_ENCODE,
+        FFMPEG_SINGLE_PASS_MP3_ENCODE,
+        FFMPEG_SINGLE_PASS_CREATE_THUMBNAIL,
+        FFMPEG_CHUNK_DURATION,
+        FFMPEG_NB_CHUNK_WORKERS,
+        FFMPEG_CHUNK_CELERY,
+        FFMPEG_SPLIT_CHUNK,
+        FFMPEG_CHUNK_ENCODE,
+        FFMPEG_CHUNK_CONCAT_INPUT,
+        FFMPEG_CHUNK_CONCAT_MP4,
+        FFMPEG_CHUNK_CONCAT_HLS,
+        FFMPEG_CMAF_ENCODE,
+        FFMPEG_CMAF_VIDEO_ENCODE,
+        FFMPEG_CMAF_AUDIO_ENCODE,
+        FFMPEG_CMAF_OUTPUT,
     )
 else:
     from .encoding_utils import (
@@ -82,6 +105,26 @@ else:
         FFMPEG_DRESSING_FILTER_COMPLEX,
         FFMPEG_DRESSING_SCALE,
         FFMPEG_DRESSING_CONCAT,
+        FFMPEG_SINGLE_PASS_ENCODE,
+        FFMPEG_SINGLE_PASS_SPLIT,
+        FFMPEG_SINGLE_PASS_SCALE,
+        FFMPEG_SINGLE_PASS_THUMBNAIL,
+        FFMPEG_SINGLE_PASS_MP4_ENCODE,
+        FFMPEG_SINGLE_PASS_HLS_ENCODE,
+        FFMPEG_SINGLE_PASS_MP3_ENCODE,
+        FFMPEG_SINGLE_PASS_CREATE_THUMBNAIL,
+        FFMPEG_CHUNK_DURATION,
+        FFMPEG_NB_CHUNK_WORKERS,
+        FFMPEG_CHUNK_CELERY,
+        FFMPEG_SPLIT_CHUNK,
+        FFMPEG_CHUNK_ENCODE,
+        FFMPEG_CHUNK_CONCAT_INPUT,
+        FFMPEG_CHUNK_CONCAT_MP4,
+        FFMPEG_CHUNK_CONCAT_HLS,
+        FFMPEG_CMAF_ENCODE,
+        FFMPEG_CMAF_VIDEO_ENCODE,
+        FFMPEG_CMAF_AUDIO_ENCODE,
+        FFMPEG_CMAF_OUTPUT,
     )
 
 
@@ -149,6 +192,58 @@ try:
     FFMPEG_DRESSING_CONCAT = getattr(
         settings, "FFMPEG_DRESSING_CONCAT", FFMPEG_DRESSING_CONCAT
     )
+    FFMPEG_SINGLE_PASS_ENCODE = getattr(
+        settings, "FFMPEG_SINGLE_PASS_ENCODE", FFMPEG_SINGLE_PASS_ENCODE
+    )
+    FFMPEG_SINGLE_PASS_SPLIT = getattr(
+        settings, "FFMPEG_SINGLE_PASS_SPLIT", FFMPEG_SINGLE_PASS_SPLIT
+    )
+    FFMPEG_SINGLE_PASS_SCALE = getattr(
+        settings, "FFMPEG_SINGLE_PASS_SCALE", FFMPEG_SINGLE_PASS_SCALE
+    )
+    FFMPEG_SINGLE_PASS_THUMBNAIL = getattr(
+        settings, "FFMPEG_SINGLE_PASS_THUMBNAIL", FFMPEG_SINGLE_PASS_THUMBNAIL
+    )
+    FFMPEG_SINGLE_PASS_MP4_ENCODE = getattr(
+        settings, "FFMPEG_SINGLE_PASS_MP4_ENCODE", FFMPEG_SINGLE_PASS_MP4_ENCODE
+    )
+    FFMPEG_SINGLE_PASS_HLS_ENCODE = getattr(
+        settings, "FFMPEG_SINGLE_PASS_HLS_ENCODE", FFMPEG_SINGLE_PASS_HLS_ENCODE
+    )
+    FFMPEG_SINGLE_PASS_MP3_ENCODE = getattr(
+        settings, "FFMPEG_SINGLE_PASS_MP3_ENCODE", FFMPEG_SINGLE_PASS_MP3_ENCODE
+    )
+    FFMPEG_SINGLE_PASS_CREATE_THUMBNAIL = getattr(
+        settings,
+        "FFMPEG_SINGLE_PASS_CREATE_THUMBNAIL",
+        FFMPEG_SINGLE_PASS_CREATE_THUMBNAIL,
+    )
+    FFMPEG_CHUNK_DURATION = getattr(
+        settings, "FFMPEG_CHUNK_DURATION", FFMPEG_CHUNK_DURATION
+    )
+    FFMPEG_NB_CHUNK_WORKERS = getattr(
+        settings, "FFMPEG_NB_CHUNK_WORKERS", FFMPEG_NB_CHUNK_WORKERS
+    )
+    FFMPEG_CHUNK_CELERY = getattr(settings, "FFMPEG_CHUNK_CELERY", FFMPEG_CHUNK_CELERY)
+    FFMPEG_SPLIT_CHUNK = getattr(settings, "FFMPEG_SPLIT_CHUNK", FFMPEG_SPLIT_CHUNK)
+    FFMPEG_CHUNK_ENCODE = getattr(settings, "FFMPEG_CHUNK_ENCODE", FFMPEG_CHUNK_ENCODE)
+    FFMPEG_CHUNK_CONCAT_INPUT = getattr(
+        settings, "FFMPEG_CHUNK_CONCAT_INPUT", FFMPEG_CHUNK_CONCAT_INPUT
+    )
+    FFMPEG_CHUNK_CONCAT_MP4 = getattr(
+        settings, "FFMPEG_CHUNK_CONCAT_MP4", FFMPEG_CHUNK_CONCAT_MP4
+    )
+    FFMPEG_CHUNK_CONCAT_HLS = getattr(
+        settings, "FFMPEG_CHUNK_CONCAT_HLS", FFMPEG_CHUNK_CONCAT_HLS
+    )
+    FFMPEG_CMAF_ENCODE = getattr(settings, "FFMPEG_CMAF_ENCODE", FFMPEG_CMAF_ENCODE)
+    FFMPEG_CMAF_VIDEO_ENCODE = getattr(
+        settings, "FFMPEG_CMAF_VIDEO_ENCODE", FFMPEG_CMAF_VIDEO_ENCODE
+    )
+    FFMPEG_CMAF_AUDIO_ENCODE = getattr(
+        settings, "FFMPEG_CMAF_AUDIO_ENCODE", FFMPEG_CMAF_AUDIO_ENCODE
+    )
+    FFMPEG_CMAF_OUTPUT = getattr(settings, "FFMPEG_CMAF_OUTPUT", FFMPEG_CMAF_OUTPUT)
 except ImportError:  # pragma: no cover
     pass
 
@@ -165,6 +260,7 @@ class Encoding_video:
     list_image_track = {}
     list_mp4_files = {}
     list_hls_files = {}
+    list_cmaf_files = {}
     list_mp3_files = {}
     list_m4a_files = {}
     list_thumbnail_files = {}
@@ -179,6 +275,7 @@ class Encoding_video:
     cutting_stop = 0
     json_dressing = None
     dressing_input = ""
+    cmaf_encode = False
 
     def __init__(
         self, id=0, video_file="", start=0, stop=0, json_dressing=None, dressing_input=""
@@ -193,6 +290,7 @@ class Encoding_video:
         self.list_image_track = {}
         self.list_mp4_files = {}
         self.list_hls_files = {}
+        self.list_cmaf_files = {}
         self.list_mp3_files = {}
         self.list_m4a_files = {}
         self.list_thumbnail_files = {}
@@ -207,6 +305,7 @@ class Encoding_video:
         self.cutting_stop = stop or 0
         self.json_dressing = json_dressing
         self.dressing_input = dressing_input
+        self.cmaf_encode = FFMPEG_CMAF_ENCODE
 
     def is_video(self) -> bool:
         """Check if current encoding correspond to a video."""
@@ -400,6 +499,61 @@ class Encoding_video:
                 self.list_hls_files[rend] = output_file
         return hls_command
 
+    def add_cmaf_file(self, key, index: int) -> None:
+        """Add the fragmented mp4 file and the HLS playlist of a CMAF stream."""
+        self.list_cmaf_files[key] = {
+            "file": os.path.join(self.output_dir, "stream_%s.mp4" % index),
+            "playlist": os.path.join(self.output_dir, "media_%s.m3u8" % index),
+        }
+
+    def get_cmaf_command(self) -> str:
+        """Get the command encoding the CMAF renditions and their manifests.
+
+        Each rendition is a fragmented mp4 file, the audio being in its own
+        file, referenced by byte ranges from the HLS playlists and the DASH
+        manifest.
+        """
+        cmaf_command = "%s " % FFMPEG_CMD
+        list_rendition = get_list_rendition()
+        cmaf_command += FFMPEG_INPUT % {
+            "input": self.video_file,
+            "nb_threads": FFMPEG_NB_THREADS,
+        }
+        cmaf_command += FFMPEG_HLS_COMMON_PARAMS % {
+            "cut": self.get_subtime(self.cutting_start, self.cutting_stop),
+            "libx": FFMPEG_LIBX,
+            "preset": FFMPEG_PRESET,
+            "profile": FFMPEG_PROFILE,
+            "level": FFMPEG_LEVEL,
+            "crf": FFMPEG_CRF,
+        }
+        in_height = list(self.list_video_track.items())[0][1]["height"]
+        nb_stream = 0
+        for index, rend in enumerate(list_rendition):
+            resolution_threshold = rend - rend * (
+                list_rendition[rend]["encoding_resolution_threshold"] / 100
+            )
+            if in_height >= resolution_threshold or index == 0:
+                cmaf_command += FFMPEG_CMAF_VIDEO_ENCODE % {
+                    "index": nb_stream,
+                    "height": min(rend, in_height),
+                    "maxrate": list_rendition[rend]["maxrate"],
+                    "bufsize": list_rendition[rend]["maxrate"],
+                }
+                self.add_cmaf_file(rend, nb_stream)
+                nb_stream += 1
+        adaptation_sets = "id=0,streams=v"
+        if len(self.list_audio_track) > 0:
+            cmaf_command += FFMPEG_CMAF_AUDIO_ENCODE % {"ba": FFMPEG_AUDIO_BITRATE}
+            self.add_cmaf_file("audio", nb_stream)
+            adaptation_sets += " id=1,streams=a"
+        cmaf_command += FFMPEG_CMAF_OUTPUT % {
+            "hls_time": FFMPEG_HLS_TIME,
+            "adaptation_sets": adaptation_sets,
+            "output": os.path.join(self.output_dir, "manifest.mpd"),
+        }
+        return cmaf_command
+
     def get_dressing_file(self) -> str:
         """Create or replace the dressed video file."""
         dirname = os.path.dirname(self.video_file)
@@ -407,19 +561,20 @@ class Encoding_video:
         output_file = os.path.join(dirname, filename + "_dressing" + ext)
         return output_file
 
-    def get_dressing_command(self) -> str:
-        """Get the command based on the dressing object parameters."""
+    def get_dressing_filter(self, name_out="") -> list:
+        """
+        Get the filter graph parts based on the dressing object parameters.
+
+        Args:
+            name_out (str): label of the watermarked video when there are no credits.
+
+        Returns:
+            list: filters to join in the filter_complex parameter.
+        """
         height = str(list(self.list_video_track.items())[0][1]["height"])
         order_opening_credits = 0
         dressing_command_params = "[vid][0:a]"
         number_concat = 1
-        dressing_command = "%s " % FFMPEG_CMD
-        dressing_command += FFMPEG_INPUT % {
-            "input": self.video_file,
-            "nb_threads": FFMPEG_NB_THREADS,
-        }
-
-        dressing_command += self.dressing_input
         dressing_command_filter = []
         dressing_command_filter.append(
             FFMPEG_DRESSING_SCALE
@@ -432,7 +587,6 @@ class Encoding_video:
         if self.json_dressing["watermark"]:
             dressing_command_params = "[video][0:a]"
             order_opening_credits = order_opening_credits + 1
-            name_out = ""
             if (
                 self.json_dressing["opening_credits"]
                 or self.json_dressing["ending_credits"]
@@ -486,9 +640,19 @@ class Encoding_video:
                     "number": number_concat,
                 }
             )
+        return dressing_command_filter
 
+    def get_dressing_command(self) -> str:
+        """Get the command based on the dressing object parameters."""
+        dressing_command = "%s " % FFMPEG_CMD
+        dressing_command += FFMPEG_INPUT % {
+            "input": self.video_file,
+            "nb_threads": FFMPEG_NB_THREADS,
+        }
+
+        dressing_command += self.dressing_input
         dressing_command += FFMPEG_DRESSING_FILTER_COMPLEX % {
-            "filter": ";".join(dressing_command_filter),
+            "filter": ";".join(self.get_dressing_filter()),
         }
 
         if self.json_dressing["opening_credits"] or self.json_dressing["ending_credits"]:
@@ -520,12 +684,419 @@ class Encoding_video:
             list_rendition = get_list_rendition()
             first_item = list_rendition.popitem(last=False)
             self.fix_duration(self.list_mp4_files[first_item[0]])
+        if self.cmaf_encode:
+            # the HLS master playlist is written by ffmpeg with the DASH manifest
+            cmaf_command = self.get_cmaf_command()
+            return_value, return_msg = launch_cmd(cmaf_command)
+            self.add_encoding_log("cmaf_command", cmaf_command, return_value, return_msg)
+            return
         hls_command = self.get_hls_command()
         return_value, return_msg = launch_cmd(hls_command)
         if return_value:
             self.create_main_livestream()
         self.add_encoding_log("hls_command", hls_command, return_value, return_msg)
 
+    def get_single_pass_renditions(self) -> dict:
+        """
+        Get the mp4 and HLS outputs of the single pass, grouped by scaled height.
+
+        Returns:
+            dict: {height: [("mp4" or "hls", rendition, rendition settings), ...]}
+        """
+        list_rendition = get_list_rendition()
+        in_height = list(self.list_video_track.items())[0][1]["height"]
+        renditions = {}
+        first_mp4 = True
+        for index, rend in enumerate(list_rendition):
+            resolution_threshold = rend - rend * (
+                list_rendition[rend]["encoding_resolution_threshold"] / 100
+            )
+            if list_rendition[rend]["encode_mp4"] is True and (
+                first_mp4 or in_height >= resolution_threshold
+            ):
+                height = rend if first_mp4 else min(rend, in_height)
+                renditions.setdefault(height, []).append(
+                    ("mp4", rend, list_rendition[rend])
+                )
+                first_mp4 = False
+            if in_height >= resolution_threshold or index == 0:
+                renditions.setdefault(min(rend, in_height), []).append(
+                    ("hls", rend, list_rendition[rend])
+                )
+        return renditions
+
+    def use_single_pass_thumbnail(self) -> bool:
+        """Check if thumbnails can be created by the single pass."""
+        # thumbnails need the real duration and can not be computed on a cut
+        return (
+            len(self.list_image_track) == 0
+            and self.duration > 0
+            and self.cutting_start == 0
+            and self.cutting_stop == 0
+        )
+
+    def get_single_pass_filter(self, renditions: dict) -> tuple:
+        """
+        Get the filter graph shared by all outputs of the single pass.
+
+        Args:
+            renditions (dict): outputs grouped by height, see get_single_pass_renditions.
+
+        Returns:
+            tuple: the filter graph and the audio map of each output.
+        """
+        nb_video_output = len(renditions)
+        if self.use_single_pass_thumbnail():
+            nb_video_output += 1
+        # one audio per mp4 and HLS output, plus the mp3 file
+        nb_audio_output = sum(len(outputs) for outputs in renditions.values()) + 1
+        filters = []
+        video_source = "0:v:0"
+        map_audio = ["-map 0:a:0" if len(self.list_audio_track) > 0 else ""]
+        map_audio = map_audio * nb_audio_output
+        if self.json_dressing is not None:
+            filters += self.get_dressing_filter("[v]")
+            video_source = "v"
+            if (
+                self.json_dressing["opening_credits"]
+                or self.json_dressing["ending_credits"]
+            ):
+                filters.append(
+                    "[a]asplit=%s%s"
+                    % (
+                        nb_audio_output,
+                        "".join("[a%s]" % i for i in range(nb_audio_output)),
+                    )
+                )
+                map_audio = ['-map "[a%s]"' % i for i in range(nb_audio_output)]
+        filters.append(
+            FFMPEG_SINGLE_PASS_SPLIT
+            % {
+                "input": video_source,
+                "number": nb_video_output,
+                "outputs": "".join("[src%s]" % i for i in range(nb_video_output)),
+            }
+        )
+        for index, height in enumerate(renditions):
+            filters.append(
+                FFMPEG_SINGLE_PASS_SCALE
+                % {
+                    "input": "src%s" % index,
+                    "height": height,
+                    "number": len(renditions[height]),
+                    "outputs": "".join(
+                        "[%s%s]" % (kind, rend) for kind, rend, _ in renditions[height]
+                    ),
+                }
+            )
+        if self.use_single_pass_thumbnail():
+            filters.append(
+                FFMPEG_SINGLE_PASS_THUMBNAIL
+                % {
+                    "input": "src%s" % len(renditions),
+                    "duration": self.duration,
+                    "nb_thumbnail": FFMPEG_NB_THUMBNAIL,
+                    "name": "thumbnail",
+                }
+            )
+        return ";".join(filters), map_audio
+
+    def get_single_pass_video_outputs(self, renditions: dict, map_audio: list) -> str:
+        """Get the mp4 and HLS outputs parameters of the single pass."""
+        outputs = ""
+        audio_index = 0
+        for height in renditions:
+            for kind, rend, rendition in renditions[height]:
+                template = FFMPEG_SINGLE_PASS_MP4_ENCODE
+                output_file = os.path.join(self.output_dir, "%sp.mp4" % rend)
+                if kind == "hls":
+                    template = FFMPEG_SINGLE_PASS_HLS_ENCODE
+                    output_file = os.path.join(self.output_dir, "%sp.m3u8" % rend)
+                outputs += template % {
+                    "cut": self.get_subtime(self.cutting_start, self.cutting_stop),
+                    "video": "%s%s" % (kind, rend),
+                    "map_audio": map_audio[audio_index],
+                    "libx": FFMPEG_LIBX,
+                    "height": height,
+                    "preset": FFMPEG_PRESET,
+                    "profile": FFMPEG_PROFILE,
+                    "level": FFMPEG_LEVEL,
+                    "crf": FFMPEG_CRF,
+                    "maxrate": rendition["maxrate"],
+                    "bufsize": rendition["maxrate"],
+                    "ba": rendition["audio_bitrate"],
+                    "hls_time": FFMPEG_HLS_TIME,
+                    "output": output_file,
+                }
+                audio_index += 1
+                if kind == "hls":
+                    self.list_hls_files[rend] = output_file
+                else:
+                    self.list_mp4_files[rend] = output_file
+        return outputs
+
+    def get_single_pass_command(self) -> str:
+        """Get the command decoding the source once to feed all outputs."""
+        single_pass_command = "%s " % FFMPEG_CMD
+        single_pass_command += FFMPEG_INPUT % {
+            "input": self.video_file,
+            "nb_threads": FFMPEG_NB_THREADS,
+        }
+        if self.json_dressing is not None:
+            single_pass_command += self.dressing_input
+        renditions = self.get_single_pass_renditions()
+        filters, map_audio = self.get_single_pass_filter(renditions)
+        single_pass_command += FFMPEG_DRESSING_FILTER_COMPLEX % {
+            "filter": filters,
+        }
+        single_pass_command += self.get_single_pass_video_outputs(renditions, map_audio)
+
+        if len(self.list_audio_track) > 0:
+            output_file = os.path.join(
+                self.output_dir, "audio_%s.mp3" % FFMPEG_AUDIO_BITRATE
+            )
+            single_pass_command += FFMPEG_SINGLE_PASS_MP3_ENCODE % {
+                "cut": self.get_subtime(self.cutting_start, self.cutting_stop),
+                "map_audio": map_audio[-1],
+                "output": output_file,
+            }
+            self.list_mp3_files[FFMPEG_AUDIO_BITRATE] = output_file
+
+        if self.use_single_pass_thumbnail():
+            output_file = os.path.join(self.output_dir, "thumbnail")
+            single_pass_command += FFMPEG_SINGLE_PASS_CREATE_THUMBNAIL % {
+                "video": "thumbnail",
+                "output": output_file,
+            }
+            for nb in range(0, FFMPEG_NB_THUMBNAIL):
+                num_thumb = str(nb + 1)
+                self.list_thumbnail_files[num_thumb] = "%s_000%s.png" % (
+                    output_file,
+                    num_thumb,
+                )
+        return single_pass_command
+
+    def encode_single_pass(self) -> bool:
+        """
+        Encode all the outputs of a video with only one decoding of the source.
+
+        Returns:
+            bool: True if the single pass succeeded, False to use the per-step commands.
+        """
+        single_pass_command = self.get_single_pass_command()
+        encode_start = time.time()
+        return_value, return_msg = launch_cmd(single_pass_command)
+        encode_time = time.time() - encode_start
+        # not added with add_encoding_log: a failure here is not an encoding
+        # error since the per-step commands are used as a fallback
+        self.encoding_log["single_pass_command"] = {
+            "command": single_pass_command,
+            "result": return_value,
+            "msg": return_msg,
+        }
+        outputs = {
+            "mp4": self.list_mp4_files,
+            "hls": self.list_hls_files,
+            "mp3": self.list_mp3_files,
+            "thumbnail": self.list_thumbnail_files,
+        }
+        # the last write of an output file gives its own encoding time
+        for kind, list_files in outputs.items():
+            for key, output_file in list_files.items():
+                output_time = encode_time
+                if check_file(output_file):
+                    output_time = os.path.getmtime(output_file) - encode_start
+                self.encoding_log["single_pass_%s_%s" % (kind, key)] = {
+                    "command": "",
+                    "result": check_file(output_file),
+                    "msg": "{} encoded in {:.3f}s.".format(output_file, output_time),
+                }
+        if not return_value:
+            # clean lists to let the per-step commands fill them again
+            for list_files in outputs.values():
+                list_files.clear()
+            return False
+        if self.duration == 0 and len(self.list_mp4_files) > 0:
+            self.fix_duration(list(self.list_mp4_files.values())[0])
+        self.create_main_livestream()
+        return True
+
+    def use_chunk_encoding(self) -> bool:
+        """Check if the video is long enough to be encoded by chunks in parallel."""
+        # a cut made on a keyframe split would not be accurate
+        return (
+            FFMPEG_CHUNK_DURATION > 0
+            and self.duration > 2 * FFMPEG_CHUNK_DURATION
+            and self.cutting_start == 0
+            and self.cutting_stop == 0
+        )
+
+    def get_chunk_dir(self) -> str:
+        """Get the directory of the chunks of the video."""
+        return os.path.join(self.output_dir, "chunks")
+
+    def split_chunks(self) -> list:
+        """Split the video stream at keyframes in chunks and return their paths."""
+        chunk_dir = self.get_chunk_dir()
+        if os.path.exists(chunk_dir):
+            shutil.rmtree(chunk_dir)
+        os.makedirs(chunk_dir)
+        split_command = "%s " % FFMPEG_CMD
+        split_command += FFMPEG_INPUT % {
+            "input": self.video_file,
+            "nb_threads": FFMPEG_NB_THREADS,
+        }
+        split_command += FFMPEG_SPLIT_CHUNK % {
+            "chunk_duration": FFMPEG_CHUNK_DURATION,
+            "output": os.path.join(chunk_dir, "chunk"),
+        }
+        return_value, return_msg = launch_cmd(split_command)
+        self.encoding_log["split_chunk_command"] = {
+            "command": split_command,
+            "result": return_value,
+            "msg": return_msg,
+        }
+        if not return_value:
+            return []
+        return sorted(glob.glob(os.path.join(chunk_dir, "chunk_*.mkv")))
+
+    def get_chunk_command(self, chunk_file: str, renditions: dict) -> str:
+        """Get the command encoding one chunk in all renditions."""
+        chunk_command = "%s " % FFMPEG_CMD
+        chunk_command += FFMPEG_INPUT % {
+            "input": chunk_file,
+            "nb_threads": FFMPEG_NB_THREADS,
+        }
+        chunk_name = os.path.splitext(os.path.basename(chunk_file))[0]
+        for height in renditions:
+            rendition = renditions[height][0][2]
+            chunk_command += FFMPEG_CHUNK_ENCODE % {
+                "libx": FFMPEG_LIBX,
+                "height": height,
+                "preset": FFMPEG_PRESET,
+                "profile": FFMPEG_PROFILE,
+                "level": FFMPEG_LEVEL,
+                "crf": FFMPEG_CRF,
+                "maxrate": rendition["maxrate"],
+                "bufsize": rendition["maxrate"],
+                "output": os.path.join(
+                    self.get_chunk_dir(), "%sp_%s.mp4" % (height, chunk_name)
+                ),
+            }
+        return chunk_command
+
+    def encoding_chunk_progress(self, nb_done: int, nb_chunks: int) -> None:
+        """Report the progress of the chunked encoding."""
+        print("%s: encoding chunk %s/%s" % (self.id, nb_done, nb_chunks))
+
+    def launch_chunk_commands(self, chunk_commands: list) -> list:
+        """
+        Launch the chunk commands concurrently.
+
+        The commands are sent to the encoding_chunk Celery queue if
+        FFMPEG_CHUNK_CELERY, else they run in a local pool of
+        FFMPEG_NB_CHUNK_WORKERS ffmpeg processes. The chunk workers never wait
+        for other tasks, so the encoding tasks waiting for their chunks cannot
+        hold all of them.
+
+        Returns:
+            list: (return_value, return_msg) of each command.
+        """
+        results = []
+        if FFMPEG_CHUNK_CELERY:
+            from celery import group
+            from .encoding_tasks import encode_chunk_task
+
+            group_result = group(
+                encode_chunk_task.s(command) for command in chunk_commands
+            ).apply_async()
+            for task_result in group_result.results:
+                results.append(tuple(task_result.get(disable_sync_subtasks=False)))
+                self.encoding_chunk_progress(len(results), len(chunk_commands))
+            return results
+        with ThreadPoolExecutor(max_workers=FFMPEG_NB_CHUNK_WORKERS) as executor:
+            futures = [executor.submit(launch_cmd, cmd) for cmd in chunk_commands]
+            for nb_done, _future in enumerate(as_completed(futures), start=1):
+                self.encoding_chunk_progress(nb_done, len(chunk_commands))
+        return [future.result() for future in futures]
+
+    def concat_chunks(self, renditions: dict, chunk_files: list) -> bool:
+        """Concatenate the encoded chunks in mp4 and HLS files without re-encoding."""
+        return_values = []
+        for height in renditions:
+            list_file = os.path.join(self.get_chunk_dir(), "%sp.txt" % height)
+            with open(list_file, "w") as file:
+                for chunk_file in chunk_files:
+                    chunk_name = os.path.splitext(os.path.basename(chunk_file))[0]
+                    file.write("file '%sp_%s.mp4'\n" % (height, chunk_name))
+            concat_command = "%s " % FFMPEG_CMD
+            concat_command += FFMPEG_CHUNK_CONCAT_INPUT % {
+                "input": list_file,
+                "source": self.video_file,
+                "nb_threads": FFMPEG_NB_THREADS,
+            }
+            for kind, rend, rendition in renditions[height]:
+                template = FFMPEG_CHUNK_CONCAT_MP4
+                output_file = os.path.join(self.output_dir, "%sp.mp4" % rend)
+                if kind == "hls":
+                    template = FFMPEG_CHUNK_CONCAT_HLS
+                    output_file = os.path.join(self.output_dir, "%sp.m3u8" % rend)
+                concat_command += template % {
+                    "map_audio": "-map 1:a:0" if len(self.list_audio_track) > 0 else "",
+                    "ba": rendition["audio_bitrate"],
+                    "height": height,
+                    "hls_time": FFMPEG_HLS_TIME,
+                    "output": output_file,
+                }
+                if kind == "hls":
+                    self.list_hls_files[rend] = output_file
+                else:
+                    self.list_mp4_files[rend] = output_file
+            return_value, return_msg = launch_cmd(concat_command)
+            # not added with add_encoding_log: encode_video_part is the fallback
+            self.encoding_log["concat_chunk_%sp_command" % height] = {
+                "command": concat_command,
+                "result": return_value,
+                "msg": return_msg,
+            }
+            return_values.append(return_value)
+        if not all(return_values):
+            # the renditions are encoded again by encode_video_part
+            self.list_mp4_files = {}
+            self.list_hls_files = {}
+            return False
+        return True
+
+    def encode_video_chunks(self) -> bool:
+        """
+        Encode the video part of a file by chunks in parallel.
+
+        Returns:
+            bool: True if the chunked encoding succeeded, False to use encode_video_part.
+        """
+        chunk_files = self.split_chunks()
+        if len(chunk_files) == 0:
+            return False
+        renditions = self.get_single_pass_renditions()
+        chunk_commands = [
+            self.get_chunk_command(chunk_file, renditions) for chunk_file in chunk_files
+        ]
+        results = self.launch_chunk_commands(chunk_commands)
+        for index, (return_value, return_msg) in enumerate(results):
+            # not added with add_encoding_log: encode_video_part is the fallback
+            self.encoding_log["chunk_%04d_command" % index] = {
+                "command": chunk_commands[index],
+                "result": return_value,
+                "msg": return_msg,
+            }
+        concatenated = all(result[0] for result in results) and self.concat_chunks(
+            renditions, chunk_files
+        )
+        if concatenated:
+            self.create_main_livestream()
+        shutil.rmtree(self.get_chunk_dir())
+        return concatenated
+
     def create_main_livestream(self):
         list_rendition = get_list_rendition()
         livestream_content = ""
@@ -706,7 +1277,7 @@ class Encoding_video:
             self.add_encoding_log(
                 "extract_thumbnail_command", thumbnail_command, return_value, return_msg
             )
-        elif self.is_video():
+        elif self.is_video() and len(self.list_thumbnail_files) == 0:
             thumbnail_command = self.get_create_thumbnail_command()
             return_value, return_msg = launch_cmd(thumbnail_command)
             self.add_encoding_log(
@@ -758,12 +1329,26 @@ class Encoding_video:
         self.start = time.ctime()
         self.create_output_dir()
         self.get_video_data()
-        if self.json_dressing is not None:
+        # the single pass and the chunks only produce MPEG-TS HLS renditions
+        chunk_encoding = (
+            self.is_video() and not self.cmaf_encode and self.use_chunk_encoding()
+        )
+        single_pass = False
+        if (
+            self.is_video()
+            and FFMPEG_SINGLE_PASS_ENCODE
+            and not self.cmaf_encode
+            and not chunk_encoding
+        ):
+            single_pass = self.encode_single_pass()
+        if self.json_dressing is not None and not single_pass:
             self.encode_video_dressing()
         print(self.id, self.video_file, self.duration)
-        if self.is_video():
+        if chunk_encoding:
+            chunk_encoding = self.encode_video_chunks()
+        if self.is_video() and not single_pass and not chunk_encoding:
             self.encode_video_part()
-        if len(self.list_audio_track) > 0:
+        if len(self.list_audio_track) > 0 and not single_pass:
             self.encode_audio_part()
         self.encode_image_part()
         if len(self.list_subtitle_track) > 0:
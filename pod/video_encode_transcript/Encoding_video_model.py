@@ -9,6 +9,7 @@ from .models import VideoRendition
 from .models import PlaylistVideo
 from .models import EncodingLog
 from pod.video.models import Video
+from pod.video.thumbnail import create_thumbnail_variants
 from pod.completion.models import Track
 from django.core.files import File
 from .Encoding_video import (
@@ -26,6 +27,7 @@ from .encoding_utils import (
     launch_cmd,
     check_file,
 )
+from .utils import change_encoding_step
 
 ENCODING_CHOICES = getattr(
     settings,
@@ -187,6 +189,45 @@ class Encoding_video_model(Encoding_video):
                 source_file=playlist_file,
             )
 
+    def store_json_list_cmaf_files(self, info_video, video_to_encode) -> None:
+        """Store the CMAF fragmented mp4 files, their playlists and the DASH manifest."""
+        cmaf_files = info_video.get("list_cmaf_files", {})
+        for key, cmaf_file in cmaf_files.items():
+            if not check_file(cmaf_file["file"]):
+                continue
+            name = "audio" if key == "audio" else key + "p"
+            if key == "audio":
+                EncodingAudio.objects.get_or_create(
+                    name=name,
+                    video=video_to_encode,
+                    encoding_format="video/iso.segment",
+                    source_file=self.get_true_path(cmaf_file["file"]),
+                )
+            else:
+                EncodingVideo.objects.get_or_create(
+                    name=name,
+                    video=video_to_encode,
+                    rendition=VideoRendition.objects.get(resolution__contains="x" + key),
+                    encoding_format="video/iso.segment",
+                    source_file=self.get_true_path(cmaf_file["file"]),
+                )
+            if check_file(cmaf_file["playlist"]):
+                PlaylistVideo.objects.get_or_create(
+                    name=name,
+                    video=video_to_encode,
+                    encoding_format="application/x-mpegURL",
+                    source_file=self.get_true_path(cmaf_file["playlist"]),
+                )
+
+        manifest_file = os.path.join(self.get_output_dir(), "manifest.mpd")
+        if len(cmaf_files) > 0 and check_file(manifest_file):
+            PlaylistVideo.objects.get_or_create(
+                name="playlist",
+                video=video_to_encode,
+                encoding_format="application/dash+xml",
+                source_file=self.get_true_path(manifest_file),
+            )
+
     def store_json_encoding_log(self, info_video, video_to_encode) -> None:
         # Need to modify start and stop
         log_to_text = ""
@@ -276,6 +317,10 @@ class Encoding_video_model(Encoding_video):
                     video.save()
                 # rm temp location
                 os.remove(list_thumbnail_files[thumbnail_path])
+        if video.thumbnail:
+            # resize the thumbnail once, not while rendering the pages
+            video.thumbnail_variants = create_thumbnail_variants(video.thumbnail)
+            video.save()
         return video
 
     def store_json_list_overview_files(self, info_video) -> Video:
@@ -316,6 +361,7 @@ class Encoding_video_model(Encoding_video):
 
             self.store_json_list_mp3_m4a_files(info_video, video_to_encode)
             self.store_json_list_mp4_hls_files(info_video, video_to_encode)
+            self.store_json_list_cmaf_files(info_video, video_to_encode)
             self.store_json_encoding_log(info_video, video_to_encode)
             self.store_json_list_subtitle_files(info_video, video_to_encode)
             # update and create new video to be sur that thumbnail and overview be present
@@ -394,6 +440,10 @@ class Encoding_video_model(Encoding_video):
             info_video["list_thumbnail_files"] = self.list_thumbnail_files
             self.store_json_list_thumbnail_files(info_video)
 
+    def encoding_chunk_progress(self, nb_done: int, nb_chunks: int) -> None:
+        """Report the progress of the chunked encoding in the encoding step."""
+        change_encoding_step(self.id, 2, "encoding chunk %s/%s" % (nb_done, nb_chunks))
+
     def encode_video(self):
         """Start video encoding."""
         self.start_encode()
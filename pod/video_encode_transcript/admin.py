@@ -3,6 +3,7 @@ from django.contrib import admin
 from django.contrib.sites.shortcuts import get_current_site
 from django.contrib.sites.models import Site
 from .models import EncodingAudio, EncodingVideo, VideoRendition
+from .models import EncodingJob
 from .models import EncodingLog
 from .models import EncodingStep
 from .models import PlaylistVideo
@@ -99,6 +100,26 @@ class EncodingStepAdmin(admin.ModelAdmin):
         return qs
 
 
+class EncodingJobAdmin(admin.ModelAdmin):
+    """Admin model for EncodingJob."""
+
+    list_display = ("video", "kind", "priority", "status", "node", "date_added")
+    list_filter = ["status", "kind", "priority"]
+    readonly_fields = ("video", "kind", "status", "node", "date_added", "date_started")
+    search_fields = ["id", "video__id", "video__title"]
+
+    def has_add_permission(self, request):
+        """Jobs are added by the scheduler only."""
+        return False
+
+    def get_queryset(self, request):
+        """Get the queryset based on the request."""
+        qs = super().get_queryset(request).select_related("video")
+        if not request.user.is_superuser:
+            qs = qs.filter(video__sites=get_current_site(request))
+        return qs
+
+
 class VideoRenditionAdmin(admin.ModelAdmin):
     """Admin model for VideoRendition."""
 
@@ -156,5 +177,6 @@ admin.site.register(EncodingVideo, EncodingVideoAdmin)
 admin.site.register(EncodingAudio, EncodingAudioAdmin)
 admin.site.register(EncodingLog, EncodingLogAdmin)
 admin.site.register(EncodingStep, EncodingStepAdmin)
+admin.site.register(EncodingJob, EncodingJobAdmin)
 admin.site.register(VideoRendition, VideoRenditionAdmin)
 admin.site.register(PlaylistVideo, PlaylistVideoAdmin)
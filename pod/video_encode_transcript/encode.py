@@ -6,12 +6,13 @@ from webpush.models import PushInformation
 from pod.video.models import Video
 from .Encoding_video_model import Encoding_video_model
 from .encoding_studio import start_encode_video_studio
-from .models import EncodingLog
+from .models import EncodingJob, EncodingLog
+from .scheduler import submit_job
 
 from pod.cut.models import CutVideo
 from pod.dressing.models import Dressing
 from pod.dressing.utils import get_dressing_input
-from pod.main.tasks import task_start_encode, task_start_encode_studio
+from pod.main.tasks import task_start_encode_studio
 from pod.recorder.models import Recording
 from .encoding_settings import FFMPEG_DRESSING_INPUT
 from .utils import (
@@ -60,13 +61,7 @@ FFMPEG_DRESSING_INPUT = getattr(settings, "FFMPEG_DRESSING_INPUT", FFMPEG_DRESSI
 def start_encode(video_id: int, threaded=True):
     """Start video encoding."""
     if threaded:
-        if CELERY_TO_ENCODE:
-            task_start_encode.delay(video_id)
-        else:
-            log.info("START ENCODE VIDEO ID %s" % video_id)
-            t = threading.Thread(target=encode_video, args=[video_id])
-            t.setDaemon(True)
-            t.start()
+        submit_job(EncodingJob.ENCODE, video_id)
     else:
         encode_video(video_id)
 
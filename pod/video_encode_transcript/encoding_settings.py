@@ -46,12 +46,94 @@ FFMPEG_HLS_ENCODE_PARAMS = (
     + '-y "%(output)s" '
 )
 
+# Single pass encoding: the source is decoded once and a shared split/scale
+# filter graph feeds all mp4 and HLS renditions, audio and thumbnails.
+FFMPEG_SINGLE_PASS_ENCODE = False
+FFMPEG_SINGLE_PASS_SPLIT = "[%(input)s]split=%(number)s%(outputs)s"
+FFMPEG_SINGLE_PASS_SCALE = "[%(input)s]scale=-2:%(height)s,split=%(number)s%(outputs)s"
+FFMPEG_SINGLE_PASS_THUMBNAIL = (
+    "[%(input)s]fps=1/(%(duration)s/%(nb_thumbnail)s)[%(name)s]"
+)
+FFMPEG_SINGLE_PASS_MP4_ENCODE = (
+    '%(cut)s -map "[%(video)s]" %(map_audio)s -c:v %(libx)s '
+    + "-preset %(preset)s -profile:v %(profile)s "
+    + "-pix_fmt yuv420p -level %(level)s -crf %(crf)s "
+    + "-maxrate %(maxrate)s -bufsize %(bufsize)s "
+    + '-sc_threshold 0 -force_key_frames "expr:gte(t,n_forced*1)" '
+    + "-max_muxing_queue_size 4000 "
+    + '-c:a aac -ar 48000 -b:a %(ba)s -movflags faststart -y -vsync 0 "%(output)s" '
+)
+FFMPEG_SINGLE_PASS_HLS_ENCODE = (
+    '%(cut)s -map "[%(video)s]" %(map_audio)s '
+    + "-c:v %(libx)s -preset %(preset)s -profile:v %(profile)s -pix_fmt yuv420p "
+    + "-level %(level)s -crf %(crf)s -sc_threshold 0 "
+    + '-force_key_frames "expr:gte(t,n_forced*1)" '
+    + "-c:a aac -ar 48000 -max_muxing_queue_size 4000 "
+    + "-maxrate %(maxrate)s -bufsize %(bufsize)s -b:a:0 %(ba)s "
+    + "-hls_playlist_type vod -hls_time %(hls_time)s  -hls_flags single_file "
+    + '-master_pl_name "livestream%(height)s.m3u8" '
+    + '-y "%(output)s" '
+)
+# CMAF encoding: one set of fragmented mp4 renditions (one file per video
+# rendition plus one audio file) shared by the HLS and the DASH manifests,
+# replacing the MPEG-TS HLS renditions.
+FFMPEG_CMAF_ENCODE = False
+FFMPEG_CMAF_VIDEO_ENCODE = (
+    '-map 0:v:0 -filter:v:%(index)s "scale=-2:%(height)s" '
+    + "-maxrate:v:%(index)s %(maxrate)s -bufsize:v:%(index)s %(bufsize)s "
+)
+FFMPEG_CMAF_AUDIO_ENCODE = "-map 0:a:0 -b:a %(ba)s "
+FFMPEG_CMAF_OUTPUT = (
+    "-f dash -seg_duration %(hls_time)s -single_file 1 "
+    + "-single_file_name 'stream_$RepresentationID$.mp4' "
+    + "-hls_playlist 1 -hls_master_name livestream.m3u8 "
+    + '-adaptation_sets "%(adaptation_sets)s" -y "%(output)s" '
+)
+FFMPEG_SINGLE_PASS_MP3_ENCODE = (
+    '%(cut)s %(map_audio)s -vn -codec:a libmp3lame -qscale:a 2 -y "%(output)s" '
+)
+FFMPEG_SINGLE_PASS_CREATE_THUMBNAIL = (
+    '-map "[%(video)s]" -an -vsync vfr -y "%(output)s_%%04d.png" '
+)
+
 # FFMPEG_MP3_ENCODE = '-vn -b:a %(audio_bitrate)s -f mp3 -y "%(output)s" '
 FFMPEG_MP3_ENCODE = '%(cut)s -vn -codec:a libmp3lame -qscale:a 2 -y "%(output)s" '
 # In our example above, we selected -qscale:a 2, meaning we used LAME's option -V 2,
 # which gives us a VBR MP3 audio stream with an average stereo bitrate of 170-210 kBit/s.
 FFMPEG_M4A_ENCODE = '%(cut)s -vn -c:a aac -b:a %(audio_bitrate)s "%(output)s" '
 FFMPEG_NB_THREADS = 0
+# Chunked parallel encoding: split long videos at keyframes in chunks of
+# FFMPEG_CHUNK_DURATION seconds (0 to disable), encode them concurrently then
+# concatenate them without re-encoding.
+FFMPEG_CHUNK_DURATION = 0
+FFMPEG_NB_CHUNK_WORKERS = 2
+FFMPEG_CHUNK_CELERY = False
+FFMPEG_SPLIT_CHUNK = (
+    "-map 0:v:0 -an -c copy -f segment -segment_time %(chunk_duration)s "
+    + '-reset_timestamps 1 -y "%(output)s_%%04d.mkv" '
+)
+FFMPEG_CHUNK_ENCODE = (
+    '-map 0:v:0 -an -c:v %(libx)s  -vf "scale=-2:%(height)s" '
+    + "-preset %(preset)s -profile:v %(profile)s "
+    + "-pix_fmt yuv420p -level %(level)s -crf %(crf)s "
+    + "-maxrate %(maxrate)s -bufsize %(bufsize)s "
+    + '-sc_threshold 0 -force_key_frames "expr:gte(t,n_forced*1)" '
+    + '-max_muxing_queue_size 4000 -y -vsync 0 "%(output)s" '
+)
+FFMPEG_CHUNK_CONCAT_INPUT = (
+    '-hide_banner -threads %(nb_threads)s -f concat -safe 0 -i "%(input)s" '
+    + '-i "%(source)s" '
+)
+FFMPEG_CHUNK_CONCAT_MP4 = (
+    "-map 0:v:0 %(map_audio)s -c:v copy "
+    + '-c:a aac -ar 48000 -b:a %(ba)s -movflags faststart -y "%(output)s" '
+)
+FFMPEG_CHUNK_CONCAT_HLS = (
+    "-map 0:v:0 %(map_audio)s -c:v copy -c:a aac -ar 48000 -b:a:0 %(ba)s "
+    + "-hls_playlist_type vod -hls_time %(hls_time)s  -hls_flags single_file "
+    + '-master_pl_name "livestream%(height)s.m3u8" '
+    + '-y "%(output)s" '
+)
 FFMPEG_AUDIO_BITRATE = "192k"
 
 FFMPEG_EXTRACT_THUMBNAIL = '-map 0:%(index)s -an -c:v copy -y  "%(output)s" '
@@ -40,9 +40,19 @@ ENCODING_TRANSCODING_CELERY_BROKER_URL = getattr(
 )
 POD_API_URL = getattr(settings_local, "POD_API_URL", "")
 POD_API_TOKEN = getattr(settings_local, "POD_API_TOKEN", "")
-encoding_app = Celery("encoding_tasks", broker=ENCODING_TRANSCODING_CELERY_BROKER_URL)
+FFMPEG_CHUNK_CELERY = getattr(settings_local, "FFMPEG_CHUNK_CELERY", False)
+# the result backend is only used to wait for the chunks of a parallel encoding
+encoding_app = Celery(
+    "encoding_tasks",
+    broker=ENCODING_TRANSCODING_CELERY_BROKER_URL,
+    backend=ENCODING_TRANSCODING_CELERY_BROKER_URL if FFMPEG_CHUNK_CELERY else None,
+)
+# the chunks have their own workers, the encoding tasks wait for them
 encoding_app.conf.task_routes = {
-    "pod.video_encode_transcript.encoding_tasks.*": {"queue": "encoding"}
+    "pod.video_encode_transcript.encoding_tasks.encode_chunk_task": {
+        "queue": "encoding_chunk"
+    },
+    "pod.video_encode_transcript.encoding_tasks.*": {"queue": "encoding"},
 }
 
 
@@ -94,6 +104,15 @@ def start_encoding_task(
         logger.error(msg)
 
 
+# celery -A pod.video_encode_transcript.encoding_tasks worker -l INFO -Q encoding_chunk
+@encoding_app.task
+def encode_chunk_task(chunk_command):
+    """Encode one chunk of a video split for parallel encoding."""
+    from .encoding_utils import launch_cmd
+
+    return launch_cmd(chunk_command)
+
+
 @encoding_app.task
 def start_studio_task(recording_id, video_output, videos, subtime, presenter):
     from .encoding_studio import start_encode_video_studio
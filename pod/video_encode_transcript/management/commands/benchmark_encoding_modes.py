@@ -0,0 +1,87 @@
+"""Esup-Pod - Compare the encoding time and the storage of the encoding modes.
+
+*  run with 'python manage.py benchmark_encoding_modes [--source video_file]'
+*  hls: mp4 and MPEG-TS HLS renditions, cmaf: mp4 and CMAF renditions
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pod.video_encode_transcript.Encoding_video import Encoding_video
+
+VIDEO_TEST = "pod/main/static/video_test/video_test_encodage_transcription.mp4"
+# value of the cmaf_encode attribute of the encoding for each mode
+ENCODING_MODES = {"hls": False, "cmaf": True}
+
+
+def get_storage(directory: str, excluded=()) -> tuple:
+    """Get the number of files of a directory and their total size in bytes."""
+    nb_files = 0
+    size = 0
+    for root, dirs, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            if path not in excluded:
+                nb_files += 1
+                size += os.path.getsize(path)
+    return nb_files, size
+
+
+class Command(BaseCommand):
+    """Encode a video in each mode and print the time, files and bytes of each."""
+
+    help = "Compare the encoding time and the storage of the HLS and CMAF modes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source", default=VIDEO_TEST, help="Video file to encode in each mode."
+        )
+        parser.add_argument(
+            "--mode",
+            action="append",
+            choices=list(ENCODING_MODES),
+            help="Mode to benchmark, all modes by default.",
+        )
+
+    def handle(self, *args, **options):
+        """Handle a benchmark_encoding_modes command call."""
+        if not os.path.isfile(options["source"]):
+            raise CommandError("File not found: %s" % options["source"])
+        for mode in options["mode"] or list(ENCODING_MODES):
+            self.benchmark(mode, options["source"])
+
+    def benchmark(self, mode: str, source: str) -> None:
+        """Encode the video part of the source in a temporary directory."""
+        work_dir = tempfile.mkdtemp()
+        try:
+            video_file = os.path.join(work_dir, os.path.basename(source))
+            shutil.copyfile(source, video_file)
+            encoding_video = Encoding_video(1, video_file)
+            encoding_video.cmaf_encode = ENCODING_MODES[mode]
+            encoding_video.create_output_dir()
+            encoding_video.get_video_data()
+            if not encoding_video.is_video():
+                raise CommandError("No video track in %s" % source)
+            start = time.time()
+            encoding_video.encode_video_part()
+            encode_time = time.time() - start
+            if encoding_video.error_encoding:
+                raise CommandError(
+                    "Encoding error in %s mode: %s" % (mode, encoding_video.encoding_log)
+                )
+            nb_files, size = get_storage(encoding_video.output_dir)
+            # the mp4 renditions are the same in both modes
+            nb_stream_files, stream_size = get_storage(
+                encoding_video.output_dir, encoding_video.list_mp4_files.values()
+            )
+            self.stdout.write(
+                "%s: encoded in %.1fs, %s files, %s bytes "
+                "(streaming only: %s files, %s bytes)"
+                % (mode, encode_time, nb_files, size, nb_stream_files, stream_size)
+            )
+        finally:
+            shutil.rmtree(work_dir)
@@ -0,0 +1,22 @@
+"""Esup-Pod - Rebuild the availability flag of the videos.
+
+*  run with 'python manage.py rebuild_video_availability'
+*  run it once after the upgrade, the flag is then updated with the encodings
+"""
+
+from django.core.management.base import BaseCommand
+
+from pod.video_encode_transcript.models import update_video_availability
+
+
+class Command(BaseCommand):
+    """Set the is_available flag of each video from its encodings."""
+
+    help = "Rebuild the availability flag of the videos from their encodings."
+
+    def handle(self, *args, **options):
+        """Handle a rebuild_video_availability command call."""
+        nb_videos = update_video_availability()
+        self.stdout.write(
+            self.style.SUCCESS("Availability of %s video(s) updated." % nb_videos)
+        )
@@ -0,0 +1,23 @@
+"""Esup-Pod - Run the pending jobs of the local encoding scheduler.
+
+*  run with 'python manage.py run_encoding_jobs'
+*  run it when the host starts to resume the jobs stopped by a restart
+"""
+
+from django.core.management.base import BaseCommand
+
+from pod.video_encode_transcript.scheduler import recover_jobs, start_workers
+
+
+class Command(BaseCommand):
+    """Resume the stopped jobs of the host and run the pending jobs."""
+
+    help = "Resume the stopped encoding jobs and run the pending ones."
+
+    def handle(self, *args, **options):
+        """Handle a run_encoding_jobs command call."""
+        nb_jobs = recover_jobs()
+        self.stdout.write("%s stopped job(s) resumed." % nb_jobs)
+        for thread in start_workers():
+            thread.join()
+        self.stdout.write(self.style.SUCCESS("No more pending job for this host."))
@@ -0,0 +1,27 @@
+"""Esup-Pod - Store the size of the encoded files.
+
+*  run with 'python manage.py store_encoding_sizes'
+*  run it once after the upgrade, the size is then stored at encoding time
+"""
+
+from django.core.management.base import BaseCommand
+
+from pod.video_encode_transcript.models import EncodingAudio, EncodingVideo
+from pod.video_encode_transcript.models import get_file_size
+
+
+class Command(BaseCommand):
+    """Store the size of the encodings whose size is unknown."""
+
+    help = "Store the size of the encoded video and audio files."
+
+    def handle(self, *args, **options):
+        """Handle a store_encoding_sizes command call."""
+        nb_files = 0
+        for model in (EncodingVideo, EncodingAudio):
+            for encoding in model.objects.filter(size=0).only("id", "source_file"):
+                size = get_file_size(encoding.source_file)
+                if size:
+                    model.objects.filter(id=encoding.id).update(size=size)
+                    nb_files += 1
+        self.stdout.write(self.style.SUCCESS("Size of %s file(s) stored." % nb_files))
@@ -9,7 +9,8 @@ from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator
 from django.contrib.sites.models import Site
 from django.dispatch import receiver
-from django.db.models.signals import post_save
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.signals import post_delete, post_save
 from pod.video.models import Video, get_storage_path_video
 
 ENCODING_CHOICES = getattr(
@@ -35,10 +36,20 @@ FORMAT_CHOICES = getattr(
         ("audio/mp3", "audio/mp3"),
         ("audio/wav", "audio/wav"),
         ("application/x-mpegURL", "application/x-mpegURL"),
+        ("video/iso.segment", "video/iso.segment"),
+        ("application/dash+xml", "application/dash+xml"),
     ),
 )
 
 
+def get_file_size(source_file) -> int:
+    """Return the size in bytes of an encoded file, 0 if it does not exist."""
+    try:
+        return source_file.size if source_file else 0
+    except OSError:
+        return 0
+
+
 class VideoRendition(models.Model):
     """Model representing the rendition video."""
 
@@ -188,6 +199,8 @@ class EncodingVideo(models.Model):
         upload_to=get_storage_path_video,
         max_length=255,
     )
+    # size in bytes of the source file, stored when the encoding is saved
+    size = models.BigIntegerField(_("Size"), default=0, editable=False)
 
     @property
     def sites(self):
@@ -238,6 +251,12 @@ class EncodingVideo(models.Model):
         """Property representing the width of the video rendition."""
         return int(self.rendition.resolution.split("x")[0])
 
+    def save(self, *args, **kwargs) -> None:
+        """Store the encoding and the size of its file."""
+        if not self.size:
+            self.size = get_file_size(self.source_file)
+        super(EncodingVideo, self).save(*args, **kwargs)
+
     def delete(self) -> None:
         """Delete the encoding video."""
         if self.source_file:
@@ -271,6 +290,8 @@ class EncodingAudio(models.Model):
         upload_to=get_storage_path_video,
         max_length=255,
     )
+    # size in bytes of the source file, stored when the encoding is saved
+    size = models.BigIntegerField(_("Size"), default=0, editable=False)
 
     @property
     def sites(self):
@@ -310,6 +331,12 @@ class EncodingAudio(models.Model):
         """Property representing the owner of the video."""
         return self.video.owner
 
+    def save(self, *args, **kwargs) -> None:
+        """Store the encoding and the size of its file."""
+        if not self.size:
+            self.size = get_file_size(self.source_file)
+        super(EncodingAudio, self).save(*args, **kwargs)
+
     def delete(self) -> None:
         """Delete the encoding audio, including the source file if it exists."""
         if self.source_file:
@@ -440,3 +467,130 @@ class PlaylistVideo(models.Model):
             if os.path.isfile(self.source_file.path):
                 os.remove(self.source_file.path)
         super(PlaylistVideo, self).delete()
+
+
+class EncodingJob(models.Model):
+    """Model representing an encoding or transcription job of the local scheduler."""
+
+    ENCODE = "encode"
+    TRANSCRIPT = "transcript"
+    KIND_CHOICES = (
+        (ENCODE, _("Encoding")),
+        (TRANSCRIPT, _("Transcription")),
+    )
+    PRIORITY_UPLOAD = 0
+    PRIORITY_TRANSCRIPT = 1
+    PRIORITY_REENCODE = 2
+    PRIORITY_CHOICES = (
+        (PRIORITY_UPLOAD, _("New video")),
+        (PRIORITY_TRANSCRIPT, _("Transcription")),
+        (PRIORITY_REENCODE, _("Re-encoding")),
+    )
+    PENDING = "pending"
+    RUNNING = "running"
+    STATUS_CHOICES = (
+        (PENDING, _("Pending")),
+        (RUNNING, _("Running")),
+    )
+
+    video = models.ForeignKey(
+        Video, verbose_name=_("Video"), editable=False, on_delete=models.CASCADE
+    )
+    kind = models.CharField(
+        _("Kind"), max_length=10, choices=KIND_CHOICES, default=ENCODE, editable=False
+    )
+    priority = models.PositiveSmallIntegerField(
+        _("Priority"), choices=PRIORITY_CHOICES, default=PRIORITY_UPLOAD
+    )
+    # length of the job: duration of the video, or size of its file if unknown
+    duration = models.PositiveIntegerField(_("Duration"), default=0, editable=False)
+    size = models.BigIntegerField(_("Size"), default=0, editable=False)
+    status = models.CharField(
+        _("Status"),
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        editable=False,
+    )
+    # host name and process id of the process running the job
+    node = models.CharField(_("Node"), max_length=255, blank=True, editable=False)
+    date_added = models.DateTimeField(_("Date added"), auto_now_add=True)
+    date_started = models.DateTimeField(_("Date started"), null=True, editable=False)
+
+    class Meta:
+        ordering = ["priority", "duration", "size", "id"]
+        verbose_name = _("Encoding job")
+        verbose_name_plural = _("Encoding jobs")
+        indexes = [
+            models.Index(fields=["status", "priority"], name="encoding_job_status_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return "%s of video %s (%s)" % (self.kind, self.video_id, self.status)
+
+
+def get_available_filter() -> Q:
+    """Return the filter of the videos with an mp4, HLS or audio encoding."""
+    return (
+        Q(
+            Exists(
+                EncodingVideo.objects.filter(
+                    video=OuterRef("pk"), encoding_format="video/mp4"
+                )
+            )
+        )
+        | Q(
+            Exists(
+                PlaylistVideo.objects.filter(
+                    video=OuterRef("pk"),
+                    name="playlist",
+                    encoding_format="application/x-mpegURL",
+                )
+            )
+        )
+        | Q(
+            Exists(
+                EncodingAudio.objects.filter(
+                    video=OuterRef("pk"), name="audio", encoding_format="video/mp4"
+                )
+            )
+        )
+    )
+
+
+def update_video_availability(videos=None) -> int:
+    """Update the is_available flag of the videos, or of all videos.
+
+    Returns the number of videos whose flag changed.
+    """
+    from pod.video.context_processors import invalidate_video_data
+    from pod.video_search.models import mark_video_changed
+
+    if videos is None:
+        videos = Video.objects.all()
+    available = get_available_filter()
+    to_enable = list(
+        videos.filter(available, is_available=False).values_list("id", flat=True)
+    )
+    to_disable = list(
+        videos.filter(~available, is_available=True).values_list("id", flat=True)
+    )
+    count = Video.objects.filter(id__in=to_enable, is_available=False).update(
+        is_available=True
+    ) + Video.objects.filter(id__in=to_disable, is_available=True).update(
+        is_available=False
+    )
+    if count:
+        # update() sends no post_save, the cached data and the index are updated here
+        invalidate_video_data()
+        mark_video_changed(*to_enable, *to_disable)
+    return count
+
+
+@receiver([post_save, post_delete], sender=EncodingVideo)
+@receiver([post_save, post_delete], sender=EncodingAudio)
+@receiver([post_save, post_delete], sender=PlaylistVideo)
+def encoding_availability(sender, instance, **kwargs) -> None:
+    """Update the availability of the video of a saved or deleted encoding."""
+    if not kwargs.get("raw"):
+        update_video_availability(Video.objects.filter(id=instance.video_id))
@@ -0,0 +1,219 @@
+"""Esup-Pod encoding scheduler.
+
+The encoding and transcription jobs are submitted to a backend: the Celery
+workers with CELERY_TO_ENCODE, or the local scheduler. With remote encoding,
+the encoding job only prepares the video and sends it to the remote workers.
+
+The local scheduler stores the jobs in the EncodingJob table and runs them in
+at most ENCODING_MAX_JOBS threads per host: new videos first, then
+transcriptions, then re-encodings, the shortest videos first. A job submitted
+again while it is pending is not added twice. The jobs of a stopped process
+are resumed by the next job submitted on the host, or by the
+run_encoding_jobs command.
+"""
+
+import logging
+import os
+import socket
+import threading
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from pod.video.models import Video
+
+from .models import EncodingJob, get_file_size
+
+CELERY_TO_ENCODE = getattr(settings, "CELERY_TO_ENCODE", False)
+ENCODING_MAX_JOBS = getattr(settings, "ENCODING_MAX_JOBS", 2)
+
+log = logging.getLogger(__name__)
+
+
+def get_node() -> str:
+    """Get the name of the current process: host name and process id."""
+    return "%s:%s" % (socket.gethostname(), os.getpid())
+
+
+def get_host_jobs():
+    """Get the jobs running on the current host."""
+    return EncodingJob.objects.filter(
+        status=EncodingJob.RUNNING, node__startswith="%s:" % socket.gethostname()
+    )
+
+
+def is_process_alive(pid: int) -> bool:
+    """Check if a process of the current host is still running."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # process of another user
+        return True
+    return True
+
+
+def get_priority(kind: str, video) -> int:
+    """Get the priority of a job, the lowest first."""
+    if kind == EncodingJob.TRANSCRIPT:
+        return EncodingJob.PRIORITY_TRANSCRIPT
+    # the duration is known once the video has been encoded
+    if video.duration == 0:
+        return EncodingJob.PRIORITY_UPLOAD
+    return EncodingJob.PRIORITY_REENCODE
+
+
+def add_job(kind: str, video_id: int) -> EncodingJob:
+    """Add a pending job, or raise the priority of the pending one."""
+    video = Video.objects.only("id", "duration", "video").get(id=video_id)
+    priority = get_priority(kind, video)
+    job = EncodingJob.objects.filter(
+        video_id=video_id, kind=kind, status=EncodingJob.PENDING
+    ).first()
+    if job is None:
+        return EncodingJob.objects.create(
+            video_id=video_id,
+            kind=kind,
+            priority=priority,
+            duration=video.duration,
+            size=get_file_size(video.video),
+        )
+    if priority < job.priority:
+        job.priority = priority
+        EncodingJob.objects.filter(id=job.id).update(priority=priority)
+    return job
+
+
+def release_job(job: EncodingJob) -> None:
+    """Set a running job back to pending, unless it was submitted again."""
+    if EncodingJob.objects.filter(
+        video_id=job.video_id, kind=job.kind, status=EncodingJob.PENDING
+    ).exists():
+        EncodingJob.objects.filter(id=job.id).delete()
+    else:
+        EncodingJob.objects.filter(id=job.id).update(
+            status=EncodingJob.PENDING, node="", date_started=None
+        )
+
+
+def recover_jobs() -> int:
+    """Set back to pending the jobs of the stopped processes of the host."""
+    nb_jobs = 0
+    for job in get_host_jobs():
+        if not is_process_alive(int(job.node.rsplit(":", 1)[1])):
+            release_job(job)
+            nb_jobs += 1
+    return nb_jobs
+
+
+def claim_job():
+    """Claim the next pending job if the host has a free slot, None otherwise."""
+    if get_host_jobs().count() >= ENCODING_MAX_JOBS:
+        return None
+    # only one job at a time for a video
+    busy_videos = EncodingJob.objects.filter(status=EncodingJob.RUNNING).values(
+        "video_id"
+    )
+    pending_jobs = EncodingJob.objects.filter(status=EncodingJob.PENDING).exclude(
+        video_id__in=busy_videos
+    )
+    for job in pending_jobs[:10]:
+        if not EncodingJob.objects.filter(id=job.id, status=EncodingJob.PENDING).update(
+            status=EncodingJob.RUNNING, node=get_node(), date_started=timezone.now()
+        ):
+            # claimed by another process
+            continue
+        if get_host_jobs().count() > ENCODING_MAX_JOBS:
+            release_job(job)
+            return None
+        return job
+    return None
+
+
+def run_job(job: EncodingJob) -> None:
+    """Run the encoding or the transcription of a job."""
+    if job.kind == EncodingJob.TRANSCRIPT:
+        from .transcript import main_threaded_transcript
+
+        main_threaded_transcript(job.video_id)
+    else:
+        from .encode import encode_video
+
+        encode_video(job.video_id)
+
+
+def work() -> int:
+    """Run the pending jobs while the host has a free slot, return their number."""
+    nb_jobs = 0
+    job = claim_job()
+    while job is not None:
+        log.info("START %s" % job)
+        try:
+            run_job(job)
+        except Exception as e:
+            log.error("Error in %s: %s" % (job, e))
+        finally:
+            EncodingJob.objects.filter(id=job.id).delete()
+        nb_jobs += 1
+        job = claim_job()
+    return nb_jobs
+
+
+def work_thread() -> None:
+    """Run the pending jobs in a thread with its own database connection."""
+    try:
+        work()
+    finally:
+        connection.close()
+
+
+def start_workers() -> list:
+    """Start a thread for each free slot of the host, up to the pending jobs."""
+    recover_jobs()
+    nb_threads = min(
+        ENCODING_MAX_JOBS - get_host_jobs().count(),
+        EncodingJob.objects.filter(status=EncodingJob.PENDING).count(),
+    )
+    threads = []
+    for i in range(nb_threads):
+        thread = threading.Thread(target=work_thread, daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
+
+
+class LocalBackend:
+    """Run the jobs in threads of the processes of the host."""
+
+    def submit(self, kind: str, video_id: int) -> None:
+        """Add the job to the queue and start the free workers."""
+        add_job(kind, video_id)
+        start_workers()
+
+
+class CeleryBackend:
+    """Run the jobs on the Celery encoding workers."""
+
+    def submit(self, kind: str, video_id: int) -> None:
+        """Send the job to the Celery workers."""
+        from pod.main.tasks import task_start_encode, task_start_transcript
+
+        if kind == EncodingJob.TRANSCRIPT:
+            task_start_transcript.delay(video_id)
+        else:
+            task_start_encode.delay(video_id)
+
+
+def get_backend():
+    """Get the backend running the jobs."""
+    if CELERY_TO_ENCODE:
+        return CeleryBackend()
+    return LocalBackend()
+
+
+def submit_job(kind: str, video_id: int) -> None:
+    """Submit the encoding or the transcription of a video."""
+    log.info("SUBMIT %s VIDEO ID %s" % (kind.upper(), video_id))
+    get_backend().submit(kind, video_id)
@@ -0,0 +1,316 @@
+"""
+Unit tests for Esup-Pod Encoding_video commands.
+
+*  run with `python manage.py test pod.video_encode_transcript.tests.test_encoding_video`
+"""
+
+import os
+import shutil
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from pod.video.models import Type, Video
+from pod.video_encode_transcript.Encoding_video import Encoding_video
+from pod.video_encode_transcript.Encoding_video_model import Encoding_video_model
+from pod.video_encode_transcript.models import EncodingAudio, EncodingVideo
+from pod.video_encode_transcript.models import PlaylistVideo, VideoRendition
+
+
+class EncodingVideoSinglePassTestCase(TestCase):
+    """Test the single pass encoding command."""
+
+    fixtures = [
+        "initial_data.json",
+    ]
+
+    def setUp(self) -> None:
+        """Set up an encoding object with a 720p video and an audio track."""
+        self.encoding_video = Encoding_video(1, "/tmp/test.mp4")
+        self.encoding_video.output_dir = "/tmp/0001"
+        self.encoding_video.duration = 30
+        self.encoding_video.list_video_track = {"0": {"width": 1280, "height": 720}}
+        self.encoding_video.list_audio_track = {"1": {"sample_rate": 48000}}
+
+    def test_single_pass_renditions(self) -> None:
+        """Test the outputs are grouped by scaled height, without upscaling."""
+        renditions = self.encoding_video.get_single_pass_renditions()
+        self.assertEqual(list(renditions.keys()), [360, 720])
+        self.assertEqual([out[0] for out in renditions[360]], ["mp4", "hls"])
+        self.assertEqual([out[0] for out in renditions[720]], ["mp4", "hls"])
+        print(" --->  test_single_pass_renditions: OK!")
+
+    def test_single_pass_command(self) -> None:
+        """Test the source is decoded once for all outputs."""
+        command = self.encoding_video.get_single_pass_command()
+        self.assertEqual(command.count(" -i "), 1)
+        self.assertIn("[0:v:0]split=3[src0][src1][src2]", command)
+        self.assertIn("[src0]scale=-2:360,split=2[mp4360][hls360]", command)
+        self.assertIn("[src1]scale=-2:720,split=2[mp4720][hls720]", command)
+        self.assertIn("[src2]fps=1/(30/3)[thumbnail]", command)
+        self.assertEqual(command.count("-map 0:a:0"), 5)
+        self.assertEqual(len(self.encoding_video.list_mp4_files), 2)
+        self.assertEqual(len(self.encoding_video.list_hls_files), 2)
+        self.assertEqual(len(self.encoding_video.list_mp3_files), 1)
+        self.assertEqual(len(self.encoding_video.list_thumbnail_files), 3)
+        print(" --->  test_single_pass_command: OK!")
+
+    def test_single_pass_command_with_cut(self) -> None:
+        """Test thumbnails are left to the per-step command when cutting."""
+        self.encoding_video.cutting_start = 5
+        self.encoding_video.cutting_stop = 20
+        command = self.encoding_video.get_single_pass_command()
+        self.assertIn("[0:v:0]split=2[src0][src1]", command)
+        self.assertNotIn("[thumbnail]", command)
+        self.assertIn("-ss 5 -to 20", command)
+        self.assertEqual(len(self.encoding_video.list_thumbnail_files), 0)
+        print(" --->  test_single_pass_command_with_cut: OK!")
+
+    def test_single_pass_command_with_dressing(self) -> None:
+        """Test the dressing filter is part of the single pass filter graph."""
+        self.encoding_video.json_dressing = {
+            "watermark": "/tmp/logo.png",
+            "opacity": 50,
+            "position_orig": "top_right",
+            "opening_credits": "/tmp/opening.mp4",
+            "ending_credits": None,
+        }
+        self.encoding_video.dressing_input = ' -i "/tmp/logo.png" -i "/tmp/opening.mp4"'
+        command = self.encoding_video.get_single_pass_command()
+        self.assertEqual(command.count(" -i "), 3)
+        self.assertIn("concat=n=2:v=1:a=1:unsafe=1[v][a]", command)
+        self.assertIn("[a]asplit=5[a0][a1][a2][a3][a4]", command)
+        self.assertIn("[v]split=3", command)
+        self.assertIn('-map "[a4]"', command)
+        self.assertNotIn("-map 0:a:0", command)
+        print(" --->  test_single_pass_command_with_dressing: OK!")
+
+
+class EncodingVideoChunkTestCase(TestCase):
+    """Test the chunked parallel encoding commands."""
+
+    fixtures = [
+        "initial_data.json",
+    ]
+
+    def setUp(self) -> None:
+        """Set up an encoding object with a long 720p video and an audio track."""
+        self.encoding_video = Encoding_video(1, "/tmp/test.mp4")
+        self.encoding_video.output_dir = "/tmp/0001"
+        self.encoding_video.duration = 7200
+        self.encoding_video.list_video_track = {"0": {"width": 1280, "height": 720}}
+        self.encoding_video.list_audio_track = {"1": {"sample_rate": 48000}}
+
+    @patch("pod.video_encode_transcript.Encoding_video.FFMPEG_CHUNK_DURATION", 600)
+    def test_use_chunk_encoding(self) -> None:
+        """Test only long videos without cut are encoded by chunks."""
+        self.assertTrue(self.encoding_video.use_chunk_encoding())
+        self.encoding_video.cutting_stop = 3600
+        self.assertFalse(self.encoding_video.use_chunk_encoding())
+        self.encoding_video.cutting_stop = 0
+        self.encoding_video.duration = 1000
+        self.assertFalse(self.encoding_video.use_chunk_encoding())
+        print(" --->  test_use_chunk_encoding: OK!")
+
+    def test_chunk_encoding_disabled(self) -> None:
+        """Test chunk encoding is disabled by default."""
+        self.assertFalse(self.encoding_video.use_chunk_encoding())
+        print(" --->  test_chunk_encoding_disabled: OK!")
+
+    def test_chunk_command(self) -> None:
+        """Test a chunk is decoded once and encoded in each height."""
+        renditions = self.encoding_video.get_single_pass_renditions()
+        command = self.encoding_video.get_chunk_command(
+            "/tmp/0001/chunks/chunk_0002.mkv", renditions
+        )
+        self.assertEqual(command.count(" -i "), 1)
+        self.assertIn('"/tmp/0001/chunks/360p_chunk_0002.mp4"', command)
+        self.assertIn('"/tmp/0001/chunks/720p_chunk_0002.mp4"', command)
+        self.assertIn("-an", command)
+        print(" --->  test_chunk_command: OK!")
+
+    @patch("pod.video_encode_transcript.Encoding_video.launch_cmd")
+    def test_launch_chunk_commands(self, mock_launch_cmd) -> None:
+        """Test the chunks are encoded by the local pool with progress reports."""
+        mock_launch_cmd.return_value = (True, "ok")
+        with patch.object(self.encoding_video, "encoding_chunk_progress") as progress:
+            results = self.encoding_video.launch_chunk_commands(["cmd1", "cmd2", "cmd3"])
+        self.assertEqual(results, [(True, "ok")] * 3)
+        self.assertEqual(mock_launch_cmd.call_count, 3)
+        progress.assert_called_with(3, 3)
+        print(" --->  test_launch_chunk_commands: OK!")
+
+    @patch("pod.video_encode_transcript.Encoding_video.launch_cmd")
+    def test_concat_chunks(self, mock_launch_cmd) -> None:
+        """Test the chunks are concatenated in mp4 and HLS without re-encoding."""
+        mock_launch_cmd.return_value = (True, "ok")
+        renditions = self.encoding_video.get_single_pass_renditions()
+        chunk_files = [
+            "/tmp/0001/chunks/chunk_0000.mkv",
+            "/tmp/0001/chunks/chunk_0001.mkv",
+        ]
+        os.makedirs(self.encoding_video.get_chunk_dir(), exist_ok=True)
+        self.assertTrue(self.encoding_video.concat_chunks(renditions, chunk_files))
+        self.assertEqual(mock_launch_cmd.call_count, 2)
+        command = mock_launch_cmd.call_args_list[0][0][0]
+        self.assertIn("-f concat", command)
+        self.assertIn("-c:v copy", command)
+        self.assertNotIn("libx264", command)
+        with open(os.path.join(self.encoding_video.get_chunk_dir(), "360p.txt")) as f:
+            self.assertEqual(
+                f.read(),
+                "file '360p_chunk_0000.mp4'\nfile '360p_chunk_0001.mp4'\n",
+            )
+        self.assertEqual(len(self.encoding_video.list_mp4_files), 2)
+        self.assertEqual(len(self.encoding_video.list_hls_files), 2)
+        shutil.rmtree(self.encoding_video.get_chunk_dir())
+        print(" --->  test_concat_chunks: OK!")
+
+    @patch("pod.video_encode_transcript.Encoding_video.launch_cmd")
+    def test_concat_chunks_error(self, mock_launch_cmd) -> None:
+        """Test a failed concatenation falls back to the regular encoding."""
+        mock_launch_cmd.side_effect = [(True, "ok"), (False, "error")]
+        chunk_files = ["/tmp/0001/chunks/chunk_0000.mkv"]
+        os.makedirs(self.encoding_video.get_chunk_dir(), exist_ok=True)
+        with patch.object(self.encoding_video, "split_chunks", return_value=chunk_files):
+            with patch.object(
+                self.encoding_video, "launch_chunk_commands", return_value=[(True, "")]
+            ):
+                self.assertFalse(self.encoding_video.encode_video_chunks())
+        self.assertEqual(self.encoding_video.list_mp4_files, {})
+        self.assertEqual(self.encoding_video.list_hls_files, {})
+        self.assertFalse(self.encoding_video.error_encoding)
+        self.assertFalse(os.path.exists(self.encoding_video.get_chunk_dir()))
+        print(" --->  test_concat_chunks_error: OK!")
+
+
+class EncodingVideoCmafTestCase(TestCase):
+    """Test the CMAF encoding command."""
+
+    fixtures = [
+        "initial_data.json",
+    ]
+
+    def setUp(self) -> None:
+        """Set up an encoding object with a 720p video and an audio track."""
+        self.encoding_video = Encoding_video(1, "/tmp/test.mp4")
+        self.encoding_video.output_dir = "/tmp/0001"
+        self.encoding_video.duration = 30
+        self.encoding_video.cmaf_encode = True
+        self.encoding_video.list_video_track = {"0": {"width": 1280, "height": 720}}
+        self.encoding_video.list_audio_track = {"1": {"sample_rate": 48000}}
+
+    def test_cmaf_command(self) -> None:
+        """Test one set of fragmented mp4 renditions feeds both manifests."""
+        command = self.encoding_video.get_cmaf_command()
+        self.assertEqual(command.count(" -i "), 1)
+        self.assertEqual(command.count("-map 0:v:0"), 2)
+        self.assertIn('-filter:v:0 "scale=-2:360"', command)
+        self.assertIn('-filter:v:1 "scale=-2:720"', command)
+        self.assertEqual(command.count("-map 0:a:0"), 1)
+        self.assertIn("-f dash", command)
+        self.assertIn("-hls_playlist 1 -hls_master_name livestream.m3u8", command)
+        self.assertIn('-adaptation_sets "id=0,streams=v id=1,streams=a"', command)
+        self.assertIn('"/tmp/0001/manifest.mpd"', command)
+        self.assertEqual(
+            self.encoding_video.list_cmaf_files,
+            {
+                360: {
+                    "file": "/tmp/0001/stream_0.mp4",
+                    "playlist": "/tmp/0001/media_0.m3u8",
+                },
+                720: {
+                    "file": "/tmp/0001/stream_1.mp4",
+                    "playlist": "/tmp/0001/media_1.m3u8",
+                },
+                "audio": {
+                    "file": "/tmp/0001/stream_2.mp4",
+                    "playlist": "/tmp/0001/media_2.m3u8",
+                },
+            },
+        )
+        print(" --->  test_cmaf_command: OK!")
+
+    def test_cmaf_command_without_audio(self) -> None:
+        """Test the audio adaptation set is left out of a video without audio."""
+        self.encoding_video.list_audio_track = {}
+        command = self.encoding_video.get_cmaf_command()
+        self.assertNotIn("-map 0:a:0", command)
+        self.assertIn('-adaptation_sets "id=0,streams=v"', command)
+        self.assertNotIn("audio", self.encoding_video.list_cmaf_files)
+        print(" --->  test_cmaf_command_without_audio: OK!")
+
+    @patch("pod.video_encode_transcript.Encoding_video.launch_cmd")
+    def test_encode_video_part(self, mock_launch_cmd) -> None:
+        """Test the CMAF renditions replace the MPEG-TS HLS renditions."""
+        mock_launch_cmd.return_value = (True, "ok")
+        with patch.object(self.encoding_video, "create_main_livestream") as livestream:
+            self.encoding_video.encode_video_part()
+        livestream.assert_not_called()
+        self.assertEqual(mock_launch_cmd.call_count, 2)
+        self.assertIn("cmaf_command", self.encoding_video.encoding_log)
+        self.assertNotIn("hls_command", self.encoding_video.encoding_log)
+        self.assertEqual(self.encoding_video.list_hls_files, {})
+        self.assertEqual(len(self.encoding_video.list_mp4_files), 2)
+        print(" --->  test_encode_video_part: OK!")
+
+    def test_store_cmaf_files(self) -> None:
+        """Test the CMAF files, their playlists and the DASH manifest are stored."""
+        video = Video.objects.create(
+            title="Video1",
+            owner=User.objects.create(username="pod"),
+            video="test.mp4",
+            type=Type.objects.get(id=1),
+        )
+        video_file = os.path.join(settings.MEDIA_ROOT, "videos", "cmaf", "test.mp4")
+        encoding_video = Encoding_video_model(video.id, video_file)
+        encoding_video.create_output_dir()
+        encoding_video.list_video_track = self.encoding_video.list_video_track
+        encoding_video.list_audio_track = self.encoding_video.list_audio_track
+        encoding_video.get_cmaf_command()
+        output_files = ["manifest.mpd", "livestream.m3u8"]
+        for index in range(3):
+            output_files += ["stream_%s.mp4" % index, "media_%s.m3u8" % index]
+        for output_file in output_files:
+            with open(os.path.join(encoding_video.output_dir, output_file), "w") as f:
+                f.write("data")
+        info_video = {"list_cmaf_files": {}}
+        for key, cmaf_file in encoding_video.list_cmaf_files.items():
+            info_video["list_cmaf_files"][str(key)] = cmaf_file
+        encoding_video.store_json_list_cmaf_files(info_video, video)
+        encodings = EncodingVideo.objects.filter(video=video)
+        self.assertEqual(
+            sorted(encodings.values_list("name", "encoding_format")),
+            [("360p", "video/iso.segment"), ("720p", "video/iso.segment")],
+        )
+        self.assertEqual(
+            EncodingAudio.objects.get(video=video).encoding_format, "video/iso.segment"
+        )
+        self.assertEqual(
+            sorted(
+                PlaylistVideo.objects.filter(video=video).values_list(
+                    "name", "encoding_format"
+                )
+            ),
+            [
+                ("360p", "application/x-mpegURL"),
+                ("720p", "application/x-mpegURL"),
+                ("audio", "application/x-mpegURL"),
+                ("playlist", "application/dash+xml"),
+            ],
+        )
+        # the CMAF streams are not mp4 sources of the player
+        self.assertEqual(video.get_video_mp4_json(), [])
+        self.assertEqual(video.get_audio_and_video_json("mp4"), {})
+        mp4 = EncodingVideo.objects.create(
+            name="360p",
+            video=video,
+            rendition=VideoRendition.objects.get(resolution__contains="x360"),
+            encoding_format="video/mp4",
+            source_file="videos/cmaf/360p.mp4",
+        )
+        self.assertEqual([src["id"] for src in video.get_video_mp4_json()], [mp4.id])
+        shutil.rmtree(os.path.dirname(video_file))
+        print(" --->  test_store_cmaf_files: OK!")
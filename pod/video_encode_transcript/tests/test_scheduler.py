@@ -0,0 +1,126 @@
+"""Unit tests for the encoding scheduler.
+
+*  run with `python manage.py test pod.video_encode_transcript.tests.test_scheduler`
+"""
+
+import os
+import socket
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from pod.video.models import Type, Video
+from pod.video_encode_transcript import encode, scheduler
+from pod.video_encode_transcript.models import EncodingJob
+
+
+class EncodingSchedulerTestCase(TestCase):
+    """Test the local encoding scheduler."""
+
+    fixtures = [
+        "initial_data.json",
+    ]
+
+    def setUp(self) -> None:
+        """Set up a new video, a long and a short encoded videos."""
+        user = User.objects.create(username="pod")
+        self.videos = {}
+        for title, duration in (("new", 0), ("long", 3600), ("short", 60)):
+            self.videos[title] = Video.objects.create(
+                title=title,
+                owner=user,
+                video="%s.mp4" % title,
+                type=Type.objects.get(id=1),
+                duration=duration,
+            )
+
+    def add_jobs(self) -> None:
+        """Add the encoding of each video."""
+        for video in self.videos.values():
+            scheduler.add_job(EncodingJob.ENCODE, video.id)
+
+    def test_add_job(self) -> None:
+        """Test the jobs are deduplicated and ordered by priority and duration."""
+        self.add_jobs()
+        self.add_jobs()
+        scheduler.add_job(EncodingJob.TRANSCRIPT, self.videos["long"].id)
+        self.assertEqual(
+            [(job.video.title, job.kind) for job in EncodingJob.objects.all()],
+            [
+                ("new", EncodingJob.ENCODE),
+                ("long", EncodingJob.TRANSCRIPT),
+                ("short", EncodingJob.ENCODE),
+                ("long", EncodingJob.ENCODE),
+            ],
+        )
+        print(" --->  test_add_job: OK!")
+
+    @patch("pod.video_encode_transcript.scheduler.ENCODING_MAX_JOBS", 1)
+    def test_claim_job(self) -> None:
+        """Test the number of running jobs of the host is limited."""
+        self.add_jobs()
+        job = scheduler.claim_job()
+        self.assertEqual(job.video, self.videos["new"])
+        job = EncodingJob.objects.get(id=job.id)
+        self.assertEqual(job.status, EncodingJob.RUNNING)
+        self.assertEqual(job.node, scheduler.get_node())
+        self.assertIsNone(scheduler.claim_job())
+        print(" --->  test_claim_job: OK!")
+
+    def test_claim_job_busy_video(self) -> None:
+        """Test a video is not processed by two jobs at the same time."""
+        scheduler.add_job(EncodingJob.ENCODE, self.videos["new"].id)
+        scheduler.claim_job()
+        scheduler.add_job(EncodingJob.ENCODE, self.videos["new"].id)
+        self.assertEqual(EncodingJob.objects.count(), 2)
+        self.assertIsNone(scheduler.claim_job())
+        print(" --->  test_claim_job_busy_video: OK!")
+
+    def test_recover_jobs(self) -> None:
+        """Test the jobs of the stopped processes of the host are resumed."""
+        self.add_jobs()
+        host = socket.gethostname()
+        EncodingJob.objects.filter(video=self.videos["new"]).update(
+            status=EncodingJob.RUNNING, node="%s:%s" % (host, 2**22 + 1)
+        )
+        EncodingJob.objects.filter(video=self.videos["short"]).update(
+            status=EncodingJob.RUNNING, node="%s:%s" % (host, os.getpid())
+        )
+        self.assertEqual(scheduler.recover_jobs(), 1)
+        self.assertEqual(
+            EncodingJob.objects.get(video=self.videos["new"]).status,
+            EncodingJob.PENDING,
+        )
+        self.assertEqual(
+            EncodingJob.objects.get(video=self.videos["short"]).status,
+            EncodingJob.RUNNING,
+        )
+        print(" --->  test_recover_jobs: OK!")
+
+    @patch("pod.video_encode_transcript.scheduler.run_job")
+    def test_work(self, mock_run_job) -> None:
+        """Test a worker runs all the pending jobs in order."""
+        self.add_jobs()
+        mock_run_job.side_effect = [None, Exception("error"), None]
+        self.assertEqual(scheduler.work(), 3)
+        self.assertEqual(
+            [call[0][0].video.title for call in mock_run_job.call_args_list],
+            ["new", "short", "long"],
+        )
+        self.assertEqual(EncodingJob.objects.count(), 0)
+        print(" --->  test_work: OK!")
+
+    @patch("pod.video_encode_transcript.scheduler.start_workers")
+    def test_start_encode(self, mock_start_workers) -> None:
+        """Test start_encode adds a job and starts the local workers."""
+        encode.start_encode(self.videos["new"].id)
+        encode.start_encode(self.videos["new"].id)
+        self.assertEqual(EncodingJob.objects.count(), 1)
+        self.assertEqual(mock_start_workers.call_count, 2)
+        with patch("pod.video_encode_transcript.scheduler.CELERY_TO_ENCODE", True):
+            with patch("pod.main.tasks.task_start_encode.delay") as mock_delay:
+                encode.start_encode(self.videos["short"].id)
+        mock_delay.assert_called_once_with(self.videos["short"].id)
+        self.assertEqual(EncodingJob.objects.count(), 1)
+        print(" --->  test_start_encode: OK!")
@@ -0,0 +1,108 @@
+"""
+Unit tests for Esup-Pod transcription model cache.
+
+*  run with `python manage.py test pod.video_encode_transcript.tests.test_transcript_model`
+"""
+
+import io
+import subprocess
+import unittest
+from unittest.mock import MagicMock, patch
+
+from .. import transcript_model
+from ..transcript_model import TranscriptModelCache, get_word_result_from_data
+
+
+@patch.object(transcript_model, "TRANSCRIPTION_TYPE", "VOSK", create=True)
+@patch.object(transcript_model, "get_model_size", return_value=400 * 1024 * 1024)
+@patch.object(transcript_model, "load_model", side_effect=lambda lang: "model_%s" % lang)
+class TranscriptModelCacheTests(unittest.TestCase):
+    """TestCase for the transcription model cache."""
+
+    def test_model_reuse(self, mock_load_model, mock_get_model_size) -> None:
+        """Test a model is loaded once per process and counted in hits."""
+        cache = TranscriptModelCache()
+        self.assertEqual(cache.get(("VOSK", "fr"), "fr"), "model_fr")
+        self.assertEqual(cache.get(("VOSK", "fr"), "fr"), "model_fr")
+        self.assertEqual(cache.get(("VOSK", "en"), "en"), "model_en")
+        self.assertEqual(mock_load_model.call_count, 2)
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["models"], [("VOSK", "fr"), ("VOSK", "en")])
+        print(" ---> test_model_reuse: OK! --- TranscriptModelCacheTests")
+
+    def test_model_eviction(self, mock_load_model, mock_get_model_size) -> None:
+        """Test the least recently used model is evicted over the memory budget."""
+        cache = TranscriptModelCache(max_memory=1000)
+        cache.get(("VOSK", "fr"), "fr")
+        cache.get(("VOSK", "en"), "en")
+        cache.get(("VOSK", "fr"), "fr")
+        cache.get(("VOSK", "de"), "de")
+        self.assertEqual(cache.stats()["models"], [("VOSK", "fr"), ("VOSK", "de")])
+        cache.get(("VOSK", "en"), "en")
+        self.assertEqual(mock_load_model.call_count, 4)
+        print(" ---> test_model_eviction: OK! --- TranscriptModelCacheTests")
+
+    def test_warm_model_cache(self, mock_load_model, mock_get_model_size) -> None:
+        """Test the preloaded models are only loaded once."""
+        with patch.object(
+            transcript_model,
+            "TRANSCRIPTION_MODEL_PARAM",
+            {"VOSK": {"fr": {"model": "/tmp/model_fr"}}},
+        ), patch.object(transcript_model, "model_cache", TranscriptModelCache()):
+            stats = transcript_model.warm_model_cache(["fr", "it"])
+            self.assertEqual(stats["models"], [("VOSK", "fr")])
+            stats = transcript_model.warm_model_cache(["fr"])
+            self.assertEqual(stats["misses"], 1)
+            self.assertEqual(stats["hits"], 0)
+        print(" ---> test_warm_model_cache: OK! --- TranscriptModelCacheTests")
+
+
+class VoskStreamTests(unittest.TestCase):
+    """TestCase for the Vosk audio stream decoding."""
+
+    def test_word_result_from_stream(self) -> None:
+        """Test the whole stream is fed to the recognizer through the buffer."""
+        audio = MagicMock()
+        audio.stdout = io.BytesIO(b"a" * (transcript_model.VOSK_BUFFER_SIZE * 2 + 10))
+        rec = MagicMock()
+        rec.AcceptWaveform.side_effect = [False, True, False]
+        rec.Result.return_value = '{"text": "bonjour"}'
+        rec.FinalResult.return_value = '{"text": "au revoir"}'
+        results = []
+        get_word_result_from_data(results, audio, rec)
+        sizes = [len(call[0][0]) for call in rec.AcceptWaveform.call_args_list]
+        # vosk raises a TypeError with a bytearray
+        self.assertEqual(
+            set(type(call[0][0]) for call in rec.AcceptWaveform.call_args_list), {bytes}
+        )
+        self.assertEqual(
+            sizes,
+            [transcript_model.VOSK_BUFFER_SIZE, transcript_model.VOSK_BUFFER_SIZE, 10],
+        )
+        self.assertEqual(results, ['{"text": "bonjour"}', '{"text": "au revoir"}'])
+        print(" ---> test_word_result_from_stream: OK! --- VoskStreamTests")
+
+    @patch("subprocess.Popen")
+    def test_single_decoder_process(self, mock_popen) -> None:
+        """Test one ffmpeg process decodes the whole file to 16kHz s16le."""
+        transcript_model.convert_vosk_samplerate("/tmp/audio.mp3", 16000)
+        self.assertEqual(mock_popen.call_count, 1)
+        command = mock_popen.call_args[0][0]
+        self.assertIn("/tmp/audio.mp3", command)
+        self.assertEqual(command[-7:], ["-ac", "1", "-ar", "16000", "-f", "s16le", "-"])
+        self.assertEqual(mock_popen.call_args[1]["stderr"], subprocess.DEVNULL)
+        print(" ---> test_single_decoder_process: OK! --- VoskStreamTests")
+
+    @patch.object(
+        transcript_model, "FFMPEG_CMD", "sh -c 'echo decoding error >&2; exit 3'"
+    )
+    def test_decoder_error(self) -> None:
+        """Test the errors of a decoder exiting with a non-zero status are logged."""
+        rec = MagicMock()
+        rec.FinalResult.return_value = '{"text": ""}'
+        results, msg = transcript_model.get_vosk_results("/tmp/audio.mp3", 16000, rec)
+        self.assertEqual(results, ['{"text": ""}'])
+        self.assertIn("non-zero status 3: decoding error", msg)
+        print(" ---> test_decoder_error: OK! --- VoskStreamTests")
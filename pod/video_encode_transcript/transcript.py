@@ -3,9 +3,10 @@
 from django.conf import settings
 from django.core.files import File
 from pod.completion.models import Track
-from pod.main.tasks import task_start_transcript
 from webvtt import Caption, WebVTT
 
+from .models import EncodingJob
+from .scheduler import submit_job
 from .utils import (
     send_email,
     send_email_transcript,
@@ -30,7 +31,6 @@ import time
 
 from tempfile import NamedTemporaryFile
 
-import threading
 import logging
 
 DEBUG = getattr(settings, "DEBUG", True)
@@ -50,7 +50,6 @@ USE_TRANSCRIPTION = getattr(settings, "USE_TRANSCRIPTION", False)
 if USE_TRANSCRIPTION:
     TRANSCRIPTION_TYPE = getattr(settings, "TRANSCRIPTION_TYPE", "STT")
 TRANSCRIPTION_NORMALIZE = getattr(settings, "TRANSCRIPTION_NORMALIZE", False)
-CELERY_TO_ENCODE = getattr(settings, "CELERY_TO_ENCODE", False)
 
 USE_REMOTE_ENCODING_TRANSCODING = getattr(
     settings, "USE_REMOTE_ENCODING_TRANSCODING", False
@@ -89,13 +88,7 @@ def start_transcript(video_id, threaded=True):
     Will launch transcript mode depending on configuration.
     """
     if threaded:
-        if CELERY_TO_ENCODE:
-            task_start_transcript.delay(video_id)
-        else:
-            log.info("START TRANSCRIPT VIDEO %s" % video_id)
-            t = threading.Thread(target=main_threaded_transcript, args=[video_id])
-            t.setDaemon(True)
-            t.start()
+        submit_job(EncodingJob.TRANSCRIPT, video_id)
     else:
         main_threaded_transcript(video_id)
 
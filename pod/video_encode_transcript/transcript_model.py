@@ -5,6 +5,9 @@ import json
 
 import sys
 import os
+import tempfile
+import threading
+from collections import OrderedDict
 from timeit import default_timer as timer
 import datetime as dt
 from datetime import timedelta
@@ -50,11 +53,130 @@ TRANSCRIPTION_STT_SENTENCE_MAX_LENGTH = getattr(
 TRANSCRIPTION_STT_SENTENCE_BLANK_SPLIT_TIME = getattr(
     settings_local, "TRANSCRIPTION_STT_SENTENCE_BLANK_SPLIT_TIME", 0.5
 )
+FFMPEG_CMD = getattr(settings_local, "FFMPEG_CMD", "ffmpeg")
+# bytes of 16kHz mono 16 bits audio fed to Vosk at once (1/8 second)
+VOSK_BUFFER_SIZE = 4000
+# memory budget in MB of the loaded models cache, 0 for no limit
+TRANSCRIPTION_MODEL_CACHE_MEMORY = getattr(
+    settings_local, "TRANSCRIPTION_MODEL_CACHE_MEMORY", 0
+)
+# languages whose model is loaded when a transcription worker starts
+TRANSCRIPTION_MODEL_PRELOAD = getattr(settings_local, "TRANSCRIPTION_MODEL_PRELOAD", [])
 log = logging.getLogger(__name__)
 
 
+class TranscriptModelCache:
+    """
+    Per-process registry of the loaded transcription models.
+
+    Models are keyed by (TRANSCRIPTION_TYPE, lang) and kept in least recently used
+    order. When the estimated size of the loaded models exceeds max_memory (in MB,
+    0 for no limit), the least recently used ones are evicted.
+    """
+
+    def __init__(self, max_memory=0):
+        self.max_memory = max_memory * 1024 * 1024
+        self.models = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self.models
+
+    def get(self, key, lang):
+        """Return the model of the key, loading it for the lang if needed."""
+        with self.lock:
+            if key in self.models:
+                self.hits += 1
+                self.models.move_to_end(key)
+                return self.models[key][0]
+            self.misses += 1
+            load_start = timer()
+            model = load_model(lang)
+            self.models[key] = (model, get_model_size(lang))
+            log.info("Model %s loaded in %0.3fs." % (str(key), timer() - load_start))
+            self.evict()
+            return model
+
+    def get_size(self):
+        """Return the estimated size in bytes of the loaded models."""
+        return sum(size for model, size in self.models.values())
+
+    def evict(self):
+        """Unload the least recently used models to fit in the memory budget."""
+        while (
+            self.max_memory and len(self.models) > 1 and self.get_size() > self.max_memory
+        ):
+            key = self.models.popitem(last=False)[0]
+            log.info("Model %s evicted from cache." % str(key))
+
+    def stats(self):
+        """Return the hit and miss counters and the loaded models."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "models": list(self.models.keys()),
+            "size": self.get_size(),
+        }
+
+    def clear(self):
+        """Unload all the models and reset the counters."""
+        with self.lock:
+            self.models.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+model_cache = TranscriptModelCache(TRANSCRIPTION_MODEL_CACHE_MEMORY)
+
+
 def get_model(lang):
-    """Get model for STT or Vosk software to transcript audio."""
+    """Get the model to transcript audio from the process model cache."""
+    return model_cache.get((TRANSCRIPTION_TYPE, lang), lang)
+
+
+def warm_model_cache(langs=None):
+    """Load the models of the langs (TRANSCRIPTION_MODEL_PRELOAD by default)."""
+    for lang in langs or TRANSCRIPTION_MODEL_PRELOAD:
+        if (TRANSCRIPTION_TYPE, lang) in model_cache:
+            continue
+        if not TRANSCRIPTION_MODEL_PARAM[TRANSCRIPTION_TYPE].get(lang):
+            log.error("No %s model found for lang: %s." % (TRANSCRIPTION_TYPE, lang))
+            continue
+        get_model(lang)
+    return model_cache.stats()
+
+
+def get_model_size(lang):
+    """Estimate the memory used by a model from the size of its files."""
+    param = TRANSCRIPTION_MODEL_PARAM[TRANSCRIPTION_TYPE][lang]
+    paths = [param["model"]]
+    if TRANSCRIPTION_TYPE == "WHISPER" and not os.path.exists(param["model"]):
+        download_root = param.get("download_root") or os.path.join(
+            os.path.expanduser("~"), ".cache", "whisper"
+        )
+        paths = [os.path.join(download_root, "%s.pt" % param["model"])]
+    if param.get("scorer"):
+        paths.append(param["scorer"])
+    size = 0
+    for path in paths:
+        if os.path.isfile(path):
+            size += os.path.getsize(path)
+        for root, dirs, files in os.walk(path):
+            size += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return size
+
+
+def load_model(lang):
+    """Load model for Whisper, STT or Vosk software to transcript audio."""
+    if TRANSCRIPTION_TYPE == "WHISPER":
+        return whisper.load_model(
+            TRANSCRIPTION_MODEL_PARAM[TRANSCRIPTION_TYPE][lang]["model"],
+            download_root=TRANSCRIPTION_MODEL_PARAM[TRANSCRIPTION_TYPE][lang][
+                "download_root"
+            ],
+        )
     transript_model = Model(TRANSCRIPTION_MODEL_PARAM[TRANSCRIPTION_TYPE][lang]["model"])
     if TRANSCRIPTION_TYPE == "STT":
         if TRANSCRIPTION_MODEL_PARAM[TRANSCRIPTION_TYPE][lang].get("beam_width"):
@@ -99,6 +221,7 @@ def start_transcripting(mp3filepath, duration, lang):
         msg, webvtt, all_text = start_main_transcript(
             mp3filepath, duration, transript_model
         )
+    msg += "\nModel cache: %(hits)s hit(s), %(misses)s miss(es)." % model_cache.stats()
     if DEBUG:
         print(msg)
         print(webvtt)
@@ -176,38 +299,49 @@ def normalize_mp3(mp3filepath):
 # #################################
 
 
-def convert_vosk_samplerate(audio_path, desired_sample_rate, trim_start, duration):
-    """Convert audio to the good sample rate."""
-    sox_cmd = "sox {} --type raw --bits 16 --channels 1 --rate {} ".format(
-        quote(audio_path), desired_sample_rate
+def convert_vosk_samplerate(audio_path, desired_sample_rate, stderr=subprocess.DEVNULL):
+    """Decode the whole audio file to a stream of mono 16 bits PCM at the sample rate."""
+    ffmpeg_cmd = "{} -nostdin -hide_banner -loglevel error -i {} ".format(
+        FFMPEG_CMD, quote(audio_path)
     )
-    sox_cmd += "--encoding signed-integer --endian little --compression 0.0 "
-    sox_cmd += "--no-dither - trim {} {}".format(trim_start, duration)
-
+    ffmpeg_cmd += "-vn -ac 1 -ar {} -f s16le -".format(desired_sample_rate)
     try:
-        output = subprocess.Popen(shlex.split(sox_cmd), stdout=subprocess.PIPE)
-
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError("SoX returned non-zero status: {}".format(e.stderr))
-    except OSError as e:
-        raise OSError(
-            e.errno,
-            "SoX not found, use {}hz files or install it: {}".format(
-                desired_sample_rate, e.strerror
-            ),
+        # stderr is not a pipe: it could fill up and block the decoder
+        return subprocess.Popen(
+            shlex.split(ffmpeg_cmd), stdout=subprocess.PIPE, stderr=stderr
         )
-    return output
+    except OSError as e:
+        raise OSError(e.errno, "ffmpeg not found: {}".format(e.strerror))
+
+
+def get_vosk_results(audio_path, desired_sample_rate, rec):
+    """Feed the decoded audio to the recognizer, return the results and the errors."""
+    results = []
+    msg = ""
+    with tempfile.TemporaryFile() as stderr:
+        with convert_vosk_samplerate(audio_path, desired_sample_rate, stderr) as audio:
+            get_word_result_from_data(results, audio, rec)
+            audio.wait()
+        if audio.returncode != 0:
+            stderr.seek(0)
+            msg += "\nffmpeg returned non-zero status %s: %s" % (
+                audio.returncode,
+                stderr.read().decode("utf-8", errors="replace"),
+            )
+    return results, msg
 
 
 def get_word_result_from_data(results, audio, rec):
-    """Get subsound from audio and add transcription to result parameter."""
+    """Feed the decoded audio stream to the recognizer and add results to parameter."""
+    buffer = bytearray(VOSK_BUFFER_SIZE)
     while True:
-        data = audio.stdout.read(4000)
-        if len(data) == 0:
+        size = audio.stdout.readinto(buffer)
+        if size == 0:
             break
-        if rec.AcceptWaveform(data):
+        # the recognizer only accepts bytes
+        if rec.AcceptWaveform(bytes(buffer[:size])):
             results.append(rec.Result())
-    results.append(rec.Result())
+    results.append(rec.FinalResult())
 
 
 def words_to_vtt(
@@ -296,44 +430,38 @@ def main_vosk_transcript(norm_mp3_file, duration, transript_model):
 
     webvtt = WebVTT()
     all_text = ""
-    for start_trim in range(0, duration, TRANSCRIPTION_AUDIO_SPLIT_TIME):
-        audio = convert_vosk_samplerate(
-            norm_mp3_file,
-            desired_sample_rate,
+    # one ffmpeg process decodes the whole file, read through a fixed size buffer
+    msg += "\nRunning inference."
+    results, error_msg = get_vosk_results(norm_mp3_file, desired_sample_rate, rec)
+    msg += error_msg
+    for res in results:
+        words = json.loads(res).get("result")
+        text = json.loads(res).get("text")
+        if not words:
+            continue
+        start_caption = words[0]["start"]
+        stop_caption = words[-1]["end"]
+        caption = Caption(
+            sec_to_timestamp(start_caption),
+            sec_to_timestamp(stop_caption),
+            text,
+        )
+        webvtt.captions.append(caption)
+        """
+        text_caption = []
+        is_first_caption = True
+        all_text, webvtt = words_to_vtt(
+            words,
             start_trim,
-            TRANSCRIPTION_AUDIO_SPLIT_TIME,  # dur
+            duration,
+            is_first_caption,
+            text_caption,
+            start_caption,
+            last_word_added,
+            all_text,
+            webvtt,
         )
-        msg += "\nRunning inference."
-        results = []
-        get_word_result_from_data(results, audio, rec)
-        for res in results:
-            words = json.loads(res).get("result")
-            text = json.loads(res).get("text")
-            if not words:
-                continue
-            start_caption = words[0]["start"]
-            stop_caption = words[-1]["end"]
-            caption = Caption(
-                sec_to_timestamp(start_caption),
-                sec_to_timestamp(stop_caption),
-                text,
-            )
-            webvtt.captions.append(caption)
-            """
-            text_caption = []
-            is_first_caption = True
-            all_text, webvtt = words_to_vtt(
-                words,
-                start_trim,
-                duration,
-                is_first_caption,
-                text_caption,
-                start_caption,
-                last_word_added,
-                all_text,
-                webvtt,
-            )
-            """
+        """
     inference_end = timer() - inference_start
 
     msg += "\nInference took %0.3fs." % inference_end
@@ -412,12 +540,7 @@ def main_whisper_transcript(norm_mp3_file, duration, lang):
     desired_sample_rate = 16000
     msg += "\nInference start %0.3fs." % inference_start
 
-    model = whisper.load_model(
-        TRANSCRIPTION_MODEL_PARAM[TRANSCRIPTION_TYPE][lang]["model"],
-        download_root=TRANSCRIPTION_MODEL_PARAM[TRANSCRIPTION_TYPE][lang][
-            "download_root"
-        ],
-    )
+    model = get_model(lang)
     audio = convert_samplerate(norm_mp3_file, desired_sample_rate, 0, duration)
     transcription = model.transcribe(
         audio, language=lang, initial_prompt="prompt", word_timestamps=True
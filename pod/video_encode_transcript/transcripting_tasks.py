@@ -4,6 +4,7 @@
 # pip3 install webvtt-py
 # pip3 install redis==4.5.4
 from celery import Celery
+from celery.signals import worker_process_init
 from tempfile import NamedTemporaryFile
 import logging
 import os
@@ -54,6 +55,17 @@ transcripting_app.conf.task_routes = {
 transcripting_app.autodiscover_tasks(packages=None, related_name="", force=False)
 
 
+@worker_process_init.connect
+def warm_transcript_models(**kwargs):
+    """Load the TRANSCRIPTION_MODEL_PRELOAD models when a worker process starts."""
+    if getattr(settings_local, "USE_TRANSCRIPTION", False) and getattr(
+        settings_local, "TRANSCRIPTION_MODEL_PRELOAD", []
+    ):
+        from .transcript_model import warm_model_cache
+
+        logger.info("Transcription model cache: %s" % warm_model_cache())
+
+
 # celery \
 # -A pod.video_encode_transcript.transcripting_tasks worker \
 # -l INFO -Q transcripting
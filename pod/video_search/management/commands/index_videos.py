@@ -5,15 +5,19 @@ from django.utils import translation
 from pod.video.models import Video
 from django.conf import settings
 from pod.video.context_processors import get_available_videos
+from pod.video_search.models import update_video_index_es
 from pod.video_search.utils import index_es, delete_es
 from pod.video_search.utils import delete_index_es, create_index_es
+from pod.video_search.utils import bulk_index_es, get_new_index_name
+from pod.video_search.utils import swap_index_alias_es
+from pod.video_search.utils import start_index_rebuild, stop_index_rebuild
 import time
 
 
 class Command(BaseCommand):
     """Indexes all or specified video in Elasticsearch."""
 
-    args = "--all or -id <video_id video_id ...>"
+    args = "--all [--bulk] or -id <video_id video_id ...>"
     help = "Indexes the specified video in Elasticsearch."
 
     def add_arguments(self, parser):
@@ -25,11 +29,36 @@ class Command(BaseCommand):
             dest="all",
             help="index all video",
         )
+        parser.add_argument(
+            "--bulk",
+            action="store_true",
+            dest="bulk",
+            help=(
+                "with --all, index all video with the bulk API in a new index, "
+                "then switch the index alias to it"
+            ),
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            dest="workers",
+            help="number of parallel bulk workers (default: 1)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            dest="batch_size",
+            help="number of video loaded and sent by bulk request (default: 500)",
+        )
 
     def handle(self, *args, **options):
         """Handle an index_videos command call."""
         translation.activate(settings.LANGUAGE_CODE)
-        if options["all"]:
+        if options["all"] and options["bulk"]:
+            self.bulk_index(options["workers"], options["batch_size"])
+        elif options["all"]:
             delete_index_es()
             time.sleep(10)
             create_index_es()
@@ -65,3 +94,53 @@ class Command(BaseCommand):
                 delete_es(video)
         except Video.DoesNotExist:
             self.stdout.write(self.style.ERROR('Video "%s" does not exist' % video_id))
+
+    def bulk_index(self, workers, batch_size):
+        """Index all video with the bulk API in a new index, then swap the alias."""
+        new_index = get_new_index_name()
+        if not create_index_es(new_index):
+            self.stdout.write(self.style.ERROR('Unable to create index "%s"' % new_index))
+            return
+        start_index_rebuild()
+        try:
+            nb_indexed, errors = bulk_index_es(
+                self.get_videos_to_index(batch_size),
+                index=new_index,
+                workers=workers,
+                chunk_size=batch_size,
+            )
+            self.stdout.write("%s video indexed in %s" % (nb_indexed, new_index))
+            if errors:
+                self.stdout.write(self.style.WARNING("%s indexing errors" % len(errors)))
+            swapped = swap_index_alias_es(new_index)
+        finally:
+            video_ids = stop_index_rebuild()
+        if not swapped:
+            self.stdout.write(self.style.ERROR('Unable to use index "%s"' % new_index))
+            return
+        if video_ids:
+            # the videos updated during the rebuild were only updated in the old index
+            update_video_index_es(video_ids)
+            self.stdout.write("%s video updated during the indexing" % len(video_ids))
+        self.stdout.write(
+            self.style.SUCCESS('Index "%s" is now used by the search' % new_index)
+        )
+
+    def get_videos_to_index(self, batch_size):
+        """Yield the available videos, loading their related rows by batch."""
+        video_ids = list(get_available_videos().values_list("id", flat=True))
+        for start in range(0, len(video_ids), batch_size):
+            videos = (
+                Video.objects.filter(id__in=video_ids[start : start + batch_size])
+                .select_related("owner", "type", "thumbnail")
+                .prefetch_related(
+                    "discipline",
+                    "channel",
+                    "theme",
+                    "contributor_set",
+                    "chapter_set",
+                    "overlay_set",
+                )
+            )
+            for video in videos:
+                yield video
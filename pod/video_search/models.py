@@ -1,46 +1,139 @@
 """Models for Esup-Pod video_search."""
 
 from django.conf import settings
-from pod.video_search.utils import index_es, delete_es
-from pod.video.models import Video
+from pod.video_search.utils import add_rebuild_changes, update_index_es
+from pod.video.models import Video, Channel
+from pod.chapter.models import Chapter
+from pod.completion.models import Contributor, Overlay
+from django.db import connection
 from django.dispatch import receiver
-from django.db.models.signals import post_save, pre_delete
+from django.db.models.signals import post_save, post_delete, m2m_changed
 
+import logging
 import threading
 
+logger = logging.getLogger(__name__)
+
 ES_URL = getattr(settings, "ES_URL", ["http://elasticsearch.localhost:9200/"])
+# seconds during which the changes of the videos are gathered before indexing
+ES_INDEX_DELAY = getattr(settings, "ES_INDEX_DELAY", 5)
+CELERY_TO_ENCODE = getattr(settings, "CELERY_TO_ENCODE", False)
 
-# do it with contributor, overlay, chapter etc.
 
+class IndexQueue:
+    """
+    Set of the videos to update in the ES index.
 
-@receiver(post_save, sender=Video)
-def update_video_index(
-    sender, instance=None, created=False, **kwargs
-):  # pragma: no cover
-    """Start index_video as daemon thread."""
+    A video changed several times within ES_INDEX_DELAY seconds is indexed once,
+    all the queued videos are sent in one bulk request by a daemon thread,
+    or by a Celery task if CELERY_TO_ENCODE.
+    """
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.video_ids = set()
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def add(self, video_ids):
+        """Mark the videos to be indexed at the end of the current window."""
+        with self.lock:
+            self.video_ids.update(video_ids)
+            if self.timer is None:
+                self.timer = threading.Timer(self.delay, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        """Index the queued videos."""
+        with self.lock:
+            video_ids = list(self.video_ids)
+            self.video_ids.clear()
+            self.timer = None
+        if not video_ids:
+            return
+        if CELERY_TO_ENCODE:
+            from pod.main.tasks import task_update_index
+
+            task_update_index.delay(video_ids)
+        else:
+            try:
+                update_video_index_es(video_ids)
+            except Exception as e:
+                logger.error("An error occured during index update: %s" % e)
+            finally:
+                connection.close()
+
+
+index_queue = IndexQueue(ES_INDEX_DELAY)
+
+
+def update_video_index_es(video_ids):
+    """Index the available videos, remove the draft, encoding or deleted ones."""
+    videos = (
+        Video.objects.filter(id__in=video_ids)
+        .select_related("owner", "type", "thumbnail")
+        .prefetch_related(
+            "discipline",
+            "channel",
+            "theme",
+            "contributor_set",
+            "chapter_set",
+            "overlay_set",
+        )
+    )
+    to_index = [v for v in videos if not v.is_draft and not v.encoding_in_progress]
+    indexed_ids = [v.id for v in to_index]
+    to_delete = [video_id for video_id in video_ids if video_id not in indexed_ids]
+    # the old index is updated until the swap, the rebuilt one after it
+    add_rebuild_changes(video_ids)
+    update_index_es(to_index, to_delete)
+
+
+def mark_video_changed(*video_ids):
+    """Add the videos to the index queue."""
     if ES_URL is None:
         return
-    t = threading.Thread(target=index_video, args=[instance])
-    t.setDaemon(True)
-    t.start()
+    index_queue.add(video_id for video_id in video_ids if video_id)
 
 
-def index_video(video):  # pragma: no cover
-    """Add video in ES index."""
-    if video.is_draft is False and video.encoding_in_progress is False:
-        index_es(video)
-    else:
-        delete_es(video)
+@receiver(post_save, sender=Video)
+@receiver(post_delete, sender=Video)
+def update_video_index(sender, instance=None, **kwargs):
+    """Queue the index update of the saved or deleted video."""
+    mark_video_changed(instance.id)
 
 
-@receiver(pre_delete, sender=Video)
-def delete_video_index(
-    sender, instance=None, created=False, **kwargs
-):  # pragma: no cover
-    """Start delete_es as daemon thread."""
-    if ES_URL is None:
+@receiver(post_save, sender=Chapter)
+@receiver(post_delete, sender=Chapter)
+@receiver(post_save, sender=Contributor)
+@receiver(post_delete, sender=Contributor)
+@receiver(post_save, sender=Overlay)
+@receiver(post_delete, sender=Overlay)
+def update_video_completion_index(sender, instance=None, **kwargs):
+    """Queue the index update of the video of a chapter, contributor or overlay."""
+    mark_video_changed(instance.video_id)
+
+
+@receiver(m2m_changed, sender=Video.channel.through)
+@receiver(m2m_changed, sender=Video.theme.through)
+@receiver(m2m_changed, sender=Video.discipline.through)
+def update_video_relation_index(
+    sender, instance=None, action=None, reverse=False, pk_set=None, **kwargs
+):
+    """Queue the index update of the videos added to or removed from a relation."""
+    if action not in ["post_add", "post_remove", "pre_clear"]:
         return
-    # delete_es(instance)
-    t = threading.Thread(target=delete_es, args=[instance])
-    t.setDaemon(True)
-    t.start()
+    if not reverse:
+        mark_video_changed(instance.id)
+    elif action == "pre_clear":
+        mark_video_changed(*instance.video_set.values_list("id", flat=True))
+    else:
+        mark_video_changed(*pk_set)
+
+
+@receiver(post_save, sender=Channel)
+def update_channel_videos_index(sender, instance=None, created=False, **kwargs):
+    """Queue the index update of the videos of a modified channel."""
+    if not created:
+        mark_video_changed(*instance.video_set.values_list("id", flat=True))
@@ -0,0 +1,65 @@
+"""Unit tests for Esup-Pod video search index queue."""
+
+from django.test import TestCase
+from django.contrib.auth.models import User
+from unittest.mock import patch
+
+from pod.chapter.models import Chapter
+from pod.video.models import Video, Type, Channel
+from ..models import IndexQueue, update_video_index_es
+
+
+class VideoSearchTestIndexQueue(TestCase):
+    """TestCase for the debounced index queue."""
+
+    fixtures = [
+        "initial_data.json",
+    ]
+
+    def setUp(self):
+        """Set up a video and a queue without timer."""
+        self.user = User.objects.create(username="pod", password="pod1234pod")
+        self.video = Video.objects.create(
+            title="Video1",
+            owner=self.user,
+            video="test.mp4",
+            is_draft=False,
+            type=Type.objects.get(id=1),
+        )
+        self.queue = IndexQueue(60)
+        patch("pod.video_search.models.index_queue", self.queue).start()
+        patch("threading.Timer.start").start()
+        self.addCleanup(patch.stopall)
+
+    @patch("pod.video_search.models.update_video_index_es")
+    def test_changes_are_coalesced(self, mock_update):
+        """Test several changes of a video are indexed once."""
+        self.video.title = "Video1 modified"
+        self.video.save()
+        self.video.save()
+        Chapter.objects.create(video=self.video, title="chapter1", time_start=1)
+        channel = Channel.objects.create(title="channel1")
+        self.video.channel.add(channel)
+        self.assertEqual(self.queue.video_ids, {self.video.id})
+        self.queue.flush()
+        mock_update.assert_called_once_with([self.video.id])
+        self.assertEqual(self.queue.video_ids, set())
+        self.queue.flush()
+        self.assertEqual(mock_update.call_count, 1)
+        print("--> test_changes_are_coalesced ok! ")
+
+    @patch("pod.video_search.models.update_index_es")
+    def test_update_video_index_es(self, mock_update_index_es):
+        """Test draft and deleted videos are removed from the index."""
+        draft = Video.objects.create(
+            title="Video2",
+            owner=self.user,
+            video="test.mp4",
+            is_draft=True,
+            type=Type.objects.get(id=1),
+        )
+        update_video_index_es([self.video.id, draft.id, 999])
+        videos, deleted_ids = mock_update_index_es.call_args[0]
+        self.assertEqual([v.id for v in videos], [self.video.id])
+        self.assertEqual(deleted_ids, [draft.id, 999])
+        print("--> test_update_video_index_es ok! ")
@@ -2,9 +2,16 @@
 
 from django.test import TestCase
 from django.contrib.auth.models import User
+from elasticsearch.exceptions import ConnectionError
+from unittest.mock import MagicMock, patch
 
-from pod.video.models import Video, Type
-from ..utils import index_es, delete_es
+from pod.video.models import Video, Type, Discipline
+from .. import utils
+from ..utils import index_es, delete_es, get_bulk_actions, ES_VERSION
+from ..utils import CircuitBreaker, es_request, delete_index_es, update_index_es
+from ..utils import add_rebuild_changes, start_index_rebuild, stop_index_rebuild
+
+import json
 
 
 class VideoSearchTestUtils(TestCase):
@@ -33,3 +40,112 @@ class VideoSearchTestUtils(TestCase):
         self.assertEqual(delete["result"], "deleted")
         self.assertEqual(delete["_id"], str(self.v.id))
         print("--> test_index_and_delete_es ok! ")
+
+    def test_get_bulk_actions(self):
+        """Test the bulk actions hold the video json with prefetched relations."""
+        self.v.tags = "tag1 tag2"
+        self.v.save()
+        discipline = Discipline.objects.create(title="discipline1")
+        self.v.discipline.add(discipline)
+        videos = Video.objects.filter(id=self.v.id).prefetch_related(
+            "discipline",
+            "channel",
+            "theme",
+            "contributor_set",
+            "chapter_set",
+            "overlay_set",
+        )
+        actions = list(get_bulk_actions(videos, "pod_test"))
+        self.assertEqual(len(actions), 1)
+        self.assertEqual(actions[0]["_index"], "pod_test")
+        self.assertEqual(actions[0]["_id"], self.v.id)
+        if ES_VERSION not in [7, 8]:
+            self.assertEqual(actions[0]["_type"], "pod")
+        data = json.loads(actions[0]["_source"])
+        self.assertEqual(
+            data["tags"],
+            [{"name": "tag1", "slug": "tag1"}, {"name": "tag2", "slug": "tag2"}],
+        )
+        self.assertEqual(
+            data["disciplines"], [{"title": "discipline1", "slug": "discipline1"}]
+        )
+        print("--> test_get_bulk_actions ok! ")
+
+
+class VideoSearchTestClient(TestCase):
+    """TestCase for the shared Elasticsearch client."""
+
+    def setUp(self):
+        """Use a mocked client and a fresh circuit breaker."""
+        self.client = MagicMock()
+        patch.object(utils, "es_client", self.client).start()
+        patch.object(utils, "circuit_breaker", CircuitBreaker(2, 30)).start()
+        patch.object(utils, "es_stats", {}).start()
+        self.addCleanup(patch.stopall)
+
+    def test_es_request(self):
+        """Test a call is sent to the shared client and its latency recorded."""
+        self.client.indices.create.return_value = {"acknowledged": True}
+        res = es_request("indices.create", index="pod_test", body={})
+        self.assertEqual(res, {"acknowledged": True})
+        self.client.indices.create.assert_called_once_with(index="pod_test", body={})
+        self.assertEqual(utils.es_stats["indices.create"]["count"], 1)
+        print("--> test_es_request ok! ")
+
+    def test_circuit_breaker(self):
+        """Test calls fail fast after consecutive connection errors."""
+        self.client.search.side_effect = ConnectionError("N/A", "down", None)
+        for i in range(2):
+            with self.assertRaises(ConnectionError):
+                es_request("search", index="pod", body={})
+        self.assertTrue(utils.circuit_breaker.is_open())
+        with self.assertRaises(ConnectionError):
+            es_request("search", index="pod", body={})
+        self.assertEqual(self.client.search.call_count, 2)
+        # the connection is tested again once the timeout is over
+        utils.circuit_breaker.opened_at -= 30
+        self.client.search.side_effect = None
+        self.client.search.return_value = {"hits": {}}
+        self.assertEqual(es_request("search", index="pod", body={}), {"hits": {}})
+        self.assertFalse(utils.circuit_breaker.is_open())
+        print("--> test_circuit_breaker ok! ")
+
+    @patch("pod.video_search.utils.helpers.bulk")
+    def test_update_index_circuit_breaker(self, mock_bulk):
+        """Test the index updates go through the circuit breaker."""
+        mock_bulk.side_effect = ConnectionError("N/A", "down", None)
+        for i in range(2):
+            self.assertIsNone(update_index_es([], [1]))
+        self.assertTrue(utils.circuit_breaker.is_open())
+        self.assertIsNone(update_index_es([], [1]))
+        self.assertEqual(mock_bulk.call_count, 2)
+        self.assertEqual(utils.es_stats["bulk"]["count"], 2)
+        utils.circuit_breaker.opened_at -= 30
+        mock_bulk.side_effect = None
+        mock_bulk.return_value = (1, [])
+        self.assertEqual(update_index_es([], [1]), (1, []))
+        self.assertFalse(utils.circuit_breaker.is_open())
+        print("--> test_update_index_circuit_breaker ok! ")
+
+    def test_delete_index_alias(self):
+        """Test the indexes behind the ES_INDEX alias are deleted, not the alias."""
+        self.client.indices.exists_alias.return_value = False
+        delete_index_es()
+        self.client.indices.delete.assert_called_once_with(index=utils.ES_INDEX)
+        self.client.indices.exists_alias.return_value = True
+        self.client.indices.get_alias.return_value = {"pod_20240101000000": {}}
+        delete_index_es()
+        self.client.indices.delete.assert_called_with(index=["pod_20240101000000"])
+        print("--> test_delete_index_alias ok! ")
+
+    def test_rebuild_changes(self):
+        """Test the videos updated during a rebuild are recorded to be replayed."""
+        add_rebuild_changes([1])
+        self.assertEqual(stop_index_rebuild(), [])
+        start_index_rebuild()
+        add_rebuild_changes([3, 1])
+        add_rebuild_changes([2, 3])
+        self.assertEqual(stop_index_rebuild(), [1, 2, 3])
+        add_rebuild_changes([4])
+        self.assertEqual(stop_index_rebuild(), [])
+        print("--> test_rebuild_changes ok! ")
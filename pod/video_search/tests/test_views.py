@@ -1,12 +1,20 @@
 from datetime import datetime, timedelta
 
+from django.core.cache import cache
 from django.test import TestCase
 from django.test.client import RequestFactory
+from unittest.mock import patch
 
+from pod.video_search.utils import invalidate_search_cache
 from pod.video_search.views import (
     get_filter_search,
+    get_full_path,
+    get_next_search_after,
     get_remove_selected_facet_link,
     get_result_aggregations,
+    get_search_after,
+    get_search_page,
+    get_search_result,
 )
 
 
@@ -100,3 +108,49 @@ class VideoSearchTest(TestCase):
         actual = get_result_aggregations(results, self.selected_facets)
 
         self.assertEqual(actual, results["aggregations"])
+
+
+class VideoSearchPagingTest(TestCase):
+    """Test the search result cache and the search_after paging."""
+
+    def setUp(self):
+        self.request_factory = RequestFactory()
+        cache.clear()
+
+    def test_search_after(self):
+        """Test the search_after parameter is read from and written to the page."""
+        request = self.request_factory.get("/search/", {"search_after": "1.5_12"})
+        self.assertEqual(get_search_after(request), [1.5, 12])
+        request = self.request_factory.get("/search/", {"search_after": "wrong"})
+        self.assertIsNone(get_search_after(request))
+        hits = [{"_id": "13", "sort": [2.5, 13]}, {"_id": "12", "sort": [1.5, 12]}]
+        self.assertEqual(get_next_search_after(hits), "1.5_12")
+        self.assertEqual(get_next_search_after([]), "")
+
+    def test_search_page_limit(self):
+        """Test the page limit only applies to from/size paging."""
+        request = self.request_factory.get("/search/", {"page": "600"})
+        with patch("pod.video_search.views.messages"):
+            self.assertEqual(get_search_page(request), 500)
+        self.assertEqual(get_search_page(request, [1.5, 12]), 600)
+
+    def test_full_path(self):
+        """Test the paging parameters are removed from the next page path."""
+        request = self.request_factory.get(
+            "/search/", {"q": "video", "page": "2", "search_after": "1.5_12"}
+        )
+        self.assertEqual(get_full_path(request), "/search/?q=video")
+
+    @patch("pod.video_search.views.es_request")
+    def test_search_result_cache(self, mock_es_request):
+        """Test results are cached until the index is updated."""
+        mock_es_request.return_value = {"hits": {"hits": [], "total": 0}}
+        bodysearch = {"from": 0, "size": 12, "query": {"match_all": {}}}
+        get_search_result(bodysearch)
+        get_search_result(dict(bodysearch))
+        self.assertEqual(mock_es_request.call_count, 1)
+        get_search_result(dict(bodysearch, **{"from": 12}))
+        self.assertEqual(mock_es_request.call_count, 2)
+        invalidate_search_cache()
+        get_search_result(bodysearch)
+        self.assertEqual(mock_es_request.call_count, 3)
@@ -1,14 +1,18 @@
 """Esup-Pod Video Search utilities."""
 
 from django.conf import settings
-from elasticsearch import Elasticsearch
-from elasticsearch.exceptions import TransportError
-from django.utils import translation
+from django.core.cache import cache
+from elasticsearch import Elasticsearch, helpers
+from elasticsearch.exceptions import ConnectionError, TransportError
+from django.utils import timezone, translation
 
 import json
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
+latency_logger = logging.getLogger("pod.video_search.latency")
 
 DEBUG = getattr(settings, "DEBUG", True)
 
@@ -18,85 +22,198 @@ ES_TIMEOUT = getattr(settings, "ES_TIMEOUT", 30)
 ES_MAX_RETRIES = getattr(settings, "ES_MAX_RETRIES", 10)
 ES_VERSION = getattr(settings, "ES_VERSION", 6)
 ES_OPTIONS = getattr(settings, "ES_OPTIONS", {})
+ES_POOL_SIZE = getattr(settings, "ES_POOL_SIZE", 10)
+ES_SNIFF = getattr(settings, "ES_SNIFF", False)
+ES_CIRCUIT_BREAKER_THRESHOLD = getattr(settings, "ES_CIRCUIT_BREAKER_THRESHOLD", 3)
+ES_CIRCUIT_BREAKER_TIMEOUT = getattr(settings, "ES_CIRCUIT_BREAKER_TIMEOUT", 30)
+# maximum duration of an index rebuild, the recorded updates expire after it
+ES_REBUILD_TIMEOUT = 24 * 3600
+
+es_client = None
+es_client_lock = threading.Lock()
+es_stats = {}
+
+
+class CircuitBreaker:
+    """
+    Stop calling Elasticsearch for a while after consecutive connection errors.
+
+    After `threshold` failures, calls fail immediately during `timeout` seconds,
+    then one call is let through to test the connection again.
+    """
+
+    def __init__(self, threshold, timeout):
+        self.threshold = threshold
+        self.timeout = timeout
+        self.failures = 0
+        self.opened_at = 0
+
+    def is_open(self):
+        """Return True if calls must not be sent to Elasticsearch."""
+        return (
+            self.threshold > 0
+            and self.failures >= self.threshold
+            and time.time() - self.opened_at < self.timeout
+        )
+
+    def success(self):
+        """Close the circuit after a successful call."""
+        self.failures = 0
+
+    def failure(self):
+        """Count a connection error, opening the circuit over the threshold."""
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.opened_at = time.time()
+
+
+circuit_breaker = CircuitBreaker(ES_CIRCUIT_BREAKER_THRESHOLD, ES_CIRCUIT_BREAKER_TIMEOUT)
+
+
+def get_es_options():
+    """Get the options of the Elasticsearch client, ES_OPTIONS taking precedence."""
+    options = {
+        "timeout": ES_TIMEOUT,
+        "max_retries": ES_MAX_RETRIES,
+        "retry_on_timeout": True,
+    }
+    if ES_VERSION == 8:
+        options["connections_per_node"] = ES_POOL_SIZE
+    else:
+        options["maxsize"] = ES_POOL_SIZE
+    if ES_SNIFF and ES_VERSION == 8:
+        options.update(
+            sniff_on_start=True, sniff_on_node_failure=True, min_delay_between_sniffing=60
+        )
+    elif ES_SNIFF:
+        options.update(
+            sniff_on_start=True, sniff_on_connection_fail=True, sniffer_timeout=60
+        )
+    options.update(ES_OPTIONS)
+    return options
+
+
+def get_es_client():
+    """Get the Elasticsearch client shared by the process, with its connection pool."""
+    global es_client
+    if es_client is None:
+        with es_client_lock:
+            if es_client is None:
+                es_client = Elasticsearch(ES_URL, **get_es_options())
+    return es_client
+
+
+def es_request(operation, **kwargs):
+    """
+    Call an operation of the shared client, like "search" or "indices.create".
+
+    The call is refused while the circuit breaker is open and its latency is
+    logged by the "pod.video_search.latency" logger and added to es_stats.
+    """
+    function = get_es_client()
+    for name in operation.split("."):
+        function = getattr(function, name)
+    return es_call(operation, function, **kwargs)
+
+
+def es_call(operation, function, *args, **kwargs):
+    """Call the function through the circuit breaker and record its latency."""
+    if circuit_breaker.is_open():
+        raise ConnectionError("N/A", "Elasticsearch circuit breaker is open", None)
+    start = time.time()
+    try:
+        result = function(*args, **kwargs)
+    except ConnectionError:
+        circuit_breaker.failure()
+        raise
+    finally:
+        add_es_latency(operation, time.time() - start)
+    circuit_breaker.success()
+    return result
+
+
+def add_es_latency(operation, duration):
+    """Log the latency of an Elasticsearch call and add it to the process stats."""
+    stats = es_stats.setdefault(operation, {"count": 0, "total_time": 0, "max_time": 0})
+    stats["count"] += 1
+    stats["total_time"] += duration
+    stats["max_time"] = max(stats["max_time"], duration)
+    latency_logger.info("%s %0.3fs" % (operation, duration))
+
+
+def get_search_cache_version():
+    """Return the version of the cached search results."""
+    return cache.get("video_search_version", 0)
+
+
+def invalidate_search_cache():
+    """Change the version of the cached search results after an index update."""
+    try:
+        cache.incr("video_search_version")
+    except ValueError:
+        cache.set("video_search_version", 1, timeout=None)
 
 
 def index_es(video):
     """Get ElasticSearch index."""
     translation.activate(settings.LANGUAGE_CODE)
-    es = Elasticsearch(
-        ES_URL,
-        timeout=ES_TIMEOUT,
-        max_retries=ES_MAX_RETRIES,
-        retry_on_timeout=True,
-        **ES_OPTIONS,
-    )
-    if es.ping():
-        try:
-            data = video.get_json_to_index()
-            if data != "{}":
-                if ES_VERSION in [7, 8]:
-                    res = es.index(index=ES_INDEX, id=video.id, body=data, refresh=True)
-                else:
-                    res = es.index(
-                        index=ES_INDEX,
-                        id=video.id,
-                        doc_type="pod",
-                        body=data,
-                        refresh=True,
-                    )
-                if DEBUG:
-                    logger.info(res)
-                return res
-        except TransportError as e:
-            logger.error(
-                "An error occured during index creation: %s-%s: %s"
-                % (e.status_code, e.error, e.info)
-            )
-    translation.deactivate()
-
-
-def delete_es(video):
-    """Delete an Elasticsearch video entry."""
-    es = Elasticsearch(
-        ES_URL,
-        timeout=ES_TIMEOUT,
-        max_retries=ES_MAX_RETRIES,
-        retry_on_timeout=True,
-        **ES_OPTIONS,
-    )
-    if es.ping():
-        try:
+    try:
+        data = video.get_json_to_index()
+        if data != "{}":
             if ES_VERSION in [7, 8]:
-                delete = es.delete(
-                    index=ES_INDEX, id=video.id, refresh=True, ignore=[400, 404]
+                res = es_request(
+                    "index", index=ES_INDEX, id=video.id, body=data, refresh=True
                 )
             else:
-                delete = es.delete(
+                res = es_request(
+                    "index",
                     index=ES_INDEX,
-                    doc_type="pod",
                     id=video.id,
+                    doc_type="pod",
+                    body=data,
                     refresh=True,
-                    ignore=[400, 404],
                 )
+            invalidate_search_cache()
             if DEBUG:
-                logger.info(delete)
-            return delete
-        except TransportError as e:
-            logger.error(
-                "An error occured during delete video: %s-%s: %s"
-                % (e.status_code, e.error, e.info)
+                logger.info(res)
+            return res
+    except TransportError as e:
+        logger.error(
+            "An error occured during index creation: %s-%s: %s"
+            % (e.status_code, e.error, e.info)
+        )
+    translation.deactivate()
+
+
+def delete_es(video):
+    """Delete an Elasticsearch video entry."""
+    try:
+        if ES_VERSION in [7, 8]:
+            delete = es_request(
+                "delete", index=ES_INDEX, id=video.id, refresh=True, ignore=[400, 404]
+            )
+        else:
+            delete = es_request(
+                "delete",
+                index=ES_INDEX,
+                doc_type="pod",
+                id=video.id,
+                refresh=True,
+                ignore=[400, 404],
             )
+        invalidate_search_cache()
+        if DEBUG:
+            logger.info(delete)
+        return delete
+    except TransportError as e:
+        logger.error(
+            "An error occured during delete video: %s-%s: %s"
+            % (e.status_code, e.error, e.info)
+        )
 
 
-def create_index_es():
+def create_index_es(index=ES_INDEX):
     """Create ElasticSearch index."""
-    es = Elasticsearch(
-        ES_URL,
-        timeout=ES_TIMEOUT,
-        max_retries=ES_MAX_RETRIES,
-        retry_on_timeout=True,
-        **ES_OPTIONS,
-    )
     if ES_VERSION in [7, 8]:
         template_file = "pod/video_search/search_template7.json"
     else:
@@ -104,7 +221,9 @@ def create_index_es():
     json_data = open(template_file)
     es_template = json.load(json_data)
     try:
-        create = es.indices.create(index=ES_INDEX, body=es_template)  # ignore=[400, 404]
+        create = es_request(
+            "indices.create", index=index, body=es_template
+        )  # ignore=[400, 404]
         logger.info(create)
         return create
     except TransportError as e:
@@ -120,16 +239,13 @@ def create_index_es():
 
 
 def delete_index_es():
-    """Delete ElasticSearch index."""
-    es = Elasticsearch(
-        ES_URL,
-        timeout=ES_TIMEOUT,
-        max_retries=ES_MAX_RETRIES,
-        retry_on_timeout=True,
-        **ES_OPTIONS,
-    )
+    """Delete ElasticSearch index, or the indexes behind the ES_INDEX alias."""
     try:
-        delete = es.indices.delete(index=ES_INDEX)
+        index = ES_INDEX
+        if es_request("indices.exists_alias", name=ES_INDEX):
+            # an alias cannot be deleted as an index, its indexes are
+            index = list(es_request("indices.get_alias", name=ES_INDEX))
+        delete = es_request("indices.delete", index=index)
         logger.info(delete)
         return delete
     except TransportError as e:
@@ -138,3 +254,151 @@ def delete_index_es():
             " index video deletion: %s-%s: %s"
             % (e.status_code, e.error, e.info["error"]["reason"])
         )
+
+
+def start_index_rebuild():
+    """Start recording the videos updated in the index while it is rebuilt."""
+    cache.set("video_search_rebuild", 0, timeout=ES_REBUILD_TIMEOUT)
+
+
+def add_rebuild_changes(video_ids):
+    """Record videos updated in the old index during a rebuild, to replay them."""
+    try:
+        # incr is atomic, each process writes its changes in its own key
+        number = cache.incr("video_search_rebuild")
+    except ValueError:
+        # no rebuild in progress
+        return
+    cache.set(
+        "video_search_rebuild_%s" % number, list(video_ids), timeout=ES_REBUILD_TIMEOUT
+    )
+
+
+def stop_index_rebuild():
+    """Stop recording the updated videos, return the ids recorded during the rebuild."""
+    number = cache.get("video_search_rebuild") or 0
+    cache.delete("video_search_rebuild")
+    keys = ["video_search_rebuild_%s" % n for n in range(1, number + 1)]
+    changes = cache.get_many(keys)
+    cache.delete_many(keys)
+    return sorted(set(video_id for ids in changes.values() for video_id in ids))
+
+
+def get_new_index_name():
+    """Get a new timestamped index name to be used behind the ES_INDEX alias."""
+    return "%s_%s" % (ES_INDEX, timezone.now().strftime("%Y%m%d%H%M%S"))
+
+
+def get_bulk_actions(videos, index=ES_INDEX):
+    """Yield the bulk API index actions of the videos."""
+    for video in videos:
+        data = video.get_json_to_index()
+        if data == "{}":
+            continue
+        action = {"_index": index, "_id": video.id, "_source": data}
+        if ES_VERSION not in [7, 8]:
+            action["_type"] = "pod"
+        yield action
+
+
+def bulk_index_es(videos, index=ES_INDEX, workers=1, chunk_size=500):
+    """
+    Index the videos with the bulk API.
+
+    The index is not refreshed during the run and several workers send the chunks
+    when workers > 1.
+    Return the number of indexed videos and the list of errors.
+    """
+    es = get_es_client()
+    actions = get_bulk_actions(videos, index)
+    if workers > 1:
+        results = helpers.parallel_bulk(
+            es, actions, thread_count=workers, chunk_size=chunk_size, raise_on_error=False
+        )
+    else:
+        results = helpers.streaming_bulk(
+            es, actions, chunk_size=chunk_size, raise_on_error=False
+        )
+    nb_indexed, errors = 0, []
+    es_request(
+        "indices.put_settings", index=index, body={"index": {"refresh_interval": "-1"}}
+    )
+    try:
+        for ok, info in results:
+            if ok:
+                nb_indexed += 1
+            else:
+                errors.append(info)
+    finally:
+        es_request(
+            "indices.put_settings",
+            index=index,
+            body={"index": {"refresh_interval": None}},
+        )
+        es_request("indices.refresh", index=index)
+        invalidate_search_cache()
+    for error in errors:
+        logger.error("An error occured during bulk indexing: %s" % error)
+    return nb_indexed, errors
+
+
+def update_index_es(videos, deleted_ids):
+    """Index the videos and remove the deleted ones in one bulk request."""
+    actions = list(get_bulk_actions(videos))
+    for video_id in deleted_ids:
+        action = {"_op_type": "delete", "_index": ES_INDEX, "_id": video_id}
+        if ES_VERSION not in [7, 8]:
+            action["_type"] = "pod"
+        actions.append(action)
+    if not actions:
+        return
+    try:
+        # the connection errors are raised to be counted by the circuit breaker
+        nb_success, errors = es_call(
+            "bulk", helpers.bulk, get_es_client(), actions, raise_on_error=False
+        )
+        invalidate_search_cache()
+        # a video deleted before being indexed is not an error
+        errors = [e for e in errors if e.get("delete", {}).get("status") != 404]
+        for error in errors:
+            logger.error("An error occured during index update: %s" % error)
+        return nb_success, errors
+    except TransportError as e:
+        logger.error(
+            "An error occured during index update: %s-%s: %s"
+            % (e.status_code, e.error, e.info)
+        )
+
+
+def swap_index_alias_es(new_index):
+    """
+    Point the ES_INDEX alias to the new index, then delete the previous indexes.
+
+    The switch is atomic, searches never hit a missing or partial index.
+    A previous concrete index named ES_INDEX is replaced by the alias.
+    """
+    actions = [{"add": {"index": new_index, "alias": ES_INDEX}}]
+    old_indexes = []
+    if es_request("indices.exists_alias", name=ES_INDEX):
+        old_indexes = [
+            index
+            for index in es_request("indices.get_alias", name=ES_INDEX)
+            if index != new_index
+        ]
+        actions = [
+            {"remove": {"index": index, "alias": ES_INDEX}} for index in old_indexes
+        ] + actions
+    elif es_request("indices.exists", index=ES_INDEX):
+        actions.append({"remove_index": {"index": ES_INDEX}})
+    try:
+        swap = es_request("indices.update_aliases", body={"actions": actions})
+        logger.info(swap)
+        invalidate_search_cache()
+        for index in old_indexes:
+            es_request("indices.delete", index=index, ignore=[404])
+        return swap
+    except TransportError as e:
+        logger.error(
+            "An error occured during index alias swap: %s-%s: %s"
+            % (e.status_code, e.error, e.info)
+        )
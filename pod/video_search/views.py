@@ -1,22 +1,21 @@
 """Pod video_search views."""
 
 from django.shortcuts import render
-from elasticsearch import Elasticsearch
 from pod.video_search.forms import SearchForm
+from pod.video_search.utils import es_request, get_search_cache_version
 from django.conf import settings
+from django.core.cache import cache
 from django.contrib import messages
 from pod.video.models import Video
 from django.utils.translation import ugettext_lazy as _
 from django.utils.html import strip_tags
 
-# import json
+import hashlib
+import json
 
-ES_URL = getattr(settings, "ES_URL", ["http://elasticsearch.localhost:9200/"])
 ES_INDEX = getattr(settings, "ES_INDEX", "pod")
-ES_TIMEOUT = getattr(settings, "ES_TIMEOUT", 30)
-ES_MAX_RETRIES = getattr(settings, "ES_MAX_RETRIES", 10)
 ES_VERSION = getattr(settings, "ES_VERSION", 6)
-ES_OPTIONS = getattr(settings, "ES_OPTIONS", {})
+ES_SEARCH_CACHE_TIMEOUT = getattr(settings, "ES_SEARCH_CACHE_TIMEOUT", 60)
 
 
 def get_filter_search(selected_facets, start_date, end_date):
@@ -86,26 +85,76 @@ def get_result_aggregations(result, selected_facets):
     return result["aggregations"]
 
 
-def get_search_page(request):
+def get_search_after(request):
+    """Return the sort values of the last hit of the previous page, if given."""
+    try:
+        score, video_id = request.GET.get("search_after", "").split("_")
+        return [float(score), int(video_id)]
+    except ValueError:
+        return None
+
+
+def get_search_page(request, search_after=None):
     """Return page number to start search from Elasticsearch."""
     page = request.GET.get("page", "0")
     page = int(page) if page.isdigit() else 0
-    if page > 500:
+    # search_after pages cost the same at any depth, from/size pages are limited
+    if page > 500 and not search_after:
         page = 500
         messages.warning(request, _("Sorry, video search is limited to 500 pages max."))
 
     return page
 
 
+def set_search_paging(bodysearch, page, search_after):
+    """Set the page to get in the search body, with search_after or from/size."""
+    if search_after:
+        bodysearch["search_after"] = search_after
+    else:
+        bodysearch["from"] = page * bodysearch["size"]
+
+
+def get_next_search_after(hits):
+    """Return the search_after parameter of the page following the hits."""
+    if hits and hits[-1].get("sort"):
+        return "%s_%s" % tuple(hits[-1]["sort"])
+    return ""
+
+
+def get_search_result(bodysearch):
+    """
+    Send the search to ES, or get its result from the cache.
+
+    Results are cached for ES_SEARCH_CACHE_TIMEOUT seconds, keyed by the
+    search body and the search cache version changed by each index update.
+    """
+    if not ES_SEARCH_CACHE_TIMEOUT:
+        return es_request("search", index=ES_INDEX, body=bodysearch)
+    cache_key = "video_search_%s_%s" % (
+        get_search_cache_version(),
+        hashlib.sha1(json.dumps(bodysearch, sort_keys=True).encode()).hexdigest(),
+    )
+    result = cache.get(cache_key)
+    if result is None:
+        result = es_request("search", index=ES_INDEX, body=bodysearch)
+        # ES 8 returns an ObjectApiResponse
+        result = getattr(result, "body", result)
+        cache.set(cache_key, result, timeout=ES_SEARCH_CACHE_TIMEOUT)
+    return result
+
+
+def get_full_path(request):
+    """Return the request path without the paging parameters."""
+    params = request.GET.copy()
+    params.pop("page", None)
+    params.pop("search_after", None)
+    if params:
+        return "%s?%s" % (request.path, params.urlencode())
+    return request.path
+
+
 def search_videos(request):
     """Send a search request to ES."""
-    es = Elasticsearch(
-        ES_URL,
-        timeout=ES_TIMEOUT,
-        max_retries=ES_MAX_RETRIES,
-        retry_on_timeout=True,
-        **ES_OPTIONS,
-    )
     aggsAttrs = [
         "owner_full_name",
         "type.title",
@@ -120,7 +169,7 @@ def search_videos(request):
     end_date = None
     searchForm = SearchForm(request.GET)
     if searchForm.is_valid():
-        search_word = searchForm.cleaned_data["q"]
+        search_word = " ".join(searchForm.cleaned_data["q"].split())
         start_date = searchForm.cleaned_data["start_date"]
         end_date = searchForm.cleaned_data["end_date"]
 
@@ -131,12 +180,12 @@ def search_videos(request):
         else []
     )
 
-    page = get_search_page(request)
+    search_after = get_search_after(request)
+    page = get_search_page(request, search_after)
     size = 12
-    search_from = page * size
 
     # Filter query
-    filter_search = get_filter_search(selected_facets, start_date, end_date)
+    filter_search = get_filter_search(sorted(selected_facets), start_date, end_date)
 
     # Query
     query = {"match_all": {}}
@@ -165,8 +214,10 @@ def search_videos(request):
 
     # bodysearch
     bodysearch = {
-        "from": search_from,
+        "from": 0,
         "size": size,
+        # id breaks ties between equal scores, to page with search_after
+        "sort": [{"_score": {"order": "desc"}}, {"id": {"order": "desc"}}],
         "query": {},
         "aggs": {},
         "highlight": {
@@ -217,10 +268,12 @@ def search_videos(request):
         "terms": {"field": "main_lang", "size": 5, "order": {"_count": "desc"}}
     }
 
+    set_search_paging(bodysearch, page, search_after)
+
     # if settings.DEBUG:
     #    print(json.dumps(bodysearch, indent=4))
 
-    result = es.search(index=ES_INDEX, body=bodysearch)
+    result = get_search_result(bodysearch)
 
     # if settings.DEBUG:
     #    print(json.dumps(result, indent=4))
@@ -228,13 +281,10 @@ def search_videos(request):
     remove_selected_facet = get_remove_selected_facet_link(request, selected_facets)
     aggregations = get_result_aggregations(result, selected_facets)
 
-    full_path = (
-        request.get_full_path()
-        .replace("?page=%s" % page, "")
-        .replace("&page=%s" % page, "")
-    )
+    full_path = get_full_path(request)
 
-    list_videos_id = [hit["_id"] for hit in result["hits"]["hits"]]
+    hits = result["hits"]["hits"]
+    list_videos_id = [hit["_id"] for hit in hits]
     videos = Video.objects.filter(id__in=list_videos_id)
     num_result = 0
     if ES_VERSION in [7, 8]:
@@ -243,6 +293,7 @@ def search_videos(request):
         num_result = result["hits"]["total"]
     videos.has_next = ((page + 1) * size) < num_result
     videos.next_page_number = page + 1
+    videos.search_after = get_next_search_after(hits)
 
     if request.is_ajax():
         return render(
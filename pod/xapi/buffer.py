@@ -0,0 +1,113 @@
+"""Esup-Pod buffered xAPI statements.
+
+With XAPI_STATEMENT_BUFFER, the statements are added to a Redis list and sent
+to the xAPI Celery workers by batches of XAPI_BATCH_SIZE statements, a batch
+being sent as soon as it is full or its oldest statement is older than
+XAPI_BATCH_MAX_AGE seconds. The flush_xapi_statements command sends the
+statements left in the list when no statement comes any more.
+"""
+
+import json
+import logging
+import time
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+from .xapi_tasks import send_xapi_statements_task
+
+XAPI_STATEMENT_BUFFER = getattr(settings, "XAPI_STATEMENT_BUFFER", False)
+XAPI_BATCH_SIZE = getattr(settings, "XAPI_BATCH_SIZE", 50)
+XAPI_BATCH_MAX_AGE = getattr(settings, "XAPI_BATCH_MAX_AGE", 10)
+
+# list of the JSON statements not sent yet
+XAPI_STATEMENTS = "xapi:statements"
+# time of the oldest statement of the list
+XAPI_STATEMENTS_START = "xapi:statements:start"
+# hash of the numbers of statements, batches and errors
+XAPI_COUNTERS = "xapi:counters"
+
+logger = logging.getLogger(__name__)
+
+
+def get_redis():
+    """Get the Redis connection of the default cache."""
+    from django_redis import get_redis_connection
+
+    return get_redis_connection("default")
+
+
+def send_statement(statement: dict) -> None:
+    """Send a statement to the LRS, in a batch with XAPI_STATEMENT_BUFFER."""
+    send_statements([statement])
+
+
+def send_statements(statements: list) -> None:
+    """Send statements to the LRS, in batches with XAPI_STATEMENT_BUFFER."""
+    if not XAPI_STATEMENT_BUFFER:
+        send_xapi_statements_task.delay(statements)
+        return
+    try:
+        add_statements(statements)
+    except RedisError as e:
+        logger.error("Unable to buffer the xAPI statements: %s" % e)
+        send_xapi_statements_task.delay(statements)
+
+
+def add_statements(statements: list) -> None:
+    """Add statements to the list, sending the batches if one is ready."""
+    now = time.time()
+    pipe = get_redis().pipeline()
+    pipe.rpush(XAPI_STATEMENTS, *[json.dumps(statement) for statement in statements])
+    pipe.set(XAPI_STATEMENTS_START, now, nx=True)
+    pipe.get(XAPI_STATEMENTS_START)
+    pipe.hincrby(XAPI_COUNTERS, "statements", len(statements))
+    nb_statements, created, start, count = pipe.execute()
+    if nb_statements >= XAPI_BATCH_SIZE or now - float(start) >= XAPI_BATCH_MAX_AGE:
+        flush_statements()
+
+
+def pop_batch(redis) -> list:
+    """Remove the first batch of statements from the list and return it."""
+    pipe = redis.pipeline()
+    pipe.lrange(XAPI_STATEMENTS, 0, XAPI_BATCH_SIZE - 1)
+    pipe.ltrim(XAPI_STATEMENTS, XAPI_BATCH_SIZE, -1)
+    pipe.delete(XAPI_STATEMENTS_START)
+    pipe.llen(XAPI_STATEMENTS)
+    batch, trimmed, deleted, nb_statements = pipe.execute()
+    if nb_statements:
+        # the age of the next batch starts now
+        redis.set(XAPI_STATEMENTS_START, time.time(), nx=True)
+    return [json.loads(statement) for statement in batch]
+
+
+def flush_statements() -> int:
+    """Send all the statements of the list by batches, return the number of batches."""
+    redis = get_redis()
+    nb_batches = 0
+    batch = pop_batch(redis)
+    while batch:
+        try:
+            send_xapi_statements_task.delay(batch)
+            redis.hincrby(XAPI_COUNTERS, "batches", 1)
+        except Exception as e:
+            # the broker is unreachable, the batch is kept for the next flush
+            logger.error("Unable to send the xAPI statements: %s" % e)
+            redis.lpush(XAPI_STATEMENTS, *[json.dumps(s) for s in reversed(batch)])
+            redis.set(XAPI_STATEMENTS_START, time.time(), nx=True)
+            redis.hincrby(XAPI_COUNTERS, "errors", 1)
+            break
+        nb_batches += 1
+        batch = pop_batch(redis)
+    return nb_batches
+
+
+def get_counters() -> dict:
+    """Get the number of statements in the list and the counters."""
+    redis = get_redis()
+    counters = {"statements": 0, "batches": 0, "errors": 0}
+    counters.update(
+        {key.decode(): int(value) for key, value in redis.hgetall(XAPI_COUNTERS).items()}
+    )
+    counters["queue"] = redis.llen(XAPI_STATEMENTS)
+    return counters
@@ -0,0 +1,24 @@
+"""Esup-Pod - Send the buffered xAPI statements to the LRS.
+
+*  run with 'python manage.py flush_xapi_statements'
+*  to be run every minute by cron when XAPI_STATEMENT_BUFFER is True
+"""
+
+from django.core.management.base import BaseCommand
+
+from pod.xapi.buffer import flush_statements, get_counters
+
+
+class Command(BaseCommand):
+    """Send the statements buffered in Redis to the xAPI workers by batches."""
+
+    help = "Send the xAPI statements buffered in Redis to the LRS."
+
+    def handle(self, *args, **options):
+        """Handle a flush_xapi_statements command call."""
+        nb_batches = flush_statements()
+        self.stdout.write(self.style.SUCCESS("%s batch(es) sent." % nb_batches))
+        self.stdout.write(
+            "%(queue)s statement(s) waiting, %(statements)s buffered, "
+            "%(batches)s batch(es) sent, %(errors)s error(s)." % get_counters()
+        )
@@ -9,7 +9,7 @@ global player
 
 // Read-only globals defined in xapi/script.js
 /*
-global createStatement sendStatement
+global createStatement postStatement
 */
 
 // Read-only globals defined in xapi_video.html
@@ -401,5 +401,5 @@ function get_current_quality() {
 function active_statement() {
   timestamp = new Date().toISOString();
   let stmt = createStatement();
-  sendStatement(stmt);
+  postStatement(stmt);
 }
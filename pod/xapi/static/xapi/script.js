@@ -1,6 +1,11 @@
 /**
  * Esup-Pod Xapi scripts
  */
+
+// Read-only globals defined in xapi_video.html
+/*
+global endpoint batch_endpoint batch_delay csrftoken
+*/
 let result,
   verb,
   context,
@@ -48,3 +53,66 @@ async function sendStatement(stmt) {
     console.log(data);
   });
 }
+
+/**
+ * Statements waiting to be sent in a batch, as JSON strings.
+ * @type {Array<string>}
+ */
+const pendingStatements = [];
+let batchTimer = null;
+
+/**
+ * Send a statement at once, or in a batch with the next ones
+ * when batch_delay is set.
+ * @param {Object} stmt The statement
+ */
+function postStatement(stmt) {
+  if (!batch_delay) {
+    sendStatement(stmt);
+    return;
+  }
+  // the statement objects are updated by the next events
+  pendingStatements.push(JSON.stringify(stmt));
+  if (batchTimer === null) {
+    batchTimer = setTimeout(sendStatements, batch_delay * 1000);
+  }
+}
+
+/**
+ * Send the waiting statements in one request.
+ * @param {boolean} beacon Use navigator.sendBeacon, when the page is hidden
+ */
+function sendStatements(beacon = false) {
+  clearTimeout(batchTimer);
+  batchTimer = null;
+  if (pendingStatements.length === 0) {
+    return;
+  }
+  // form data to send the CSRF token with sendBeacon
+  const data = new FormData();
+  data.append("csrfmiddlewaretoken", csrftoken);
+  data.append("statements", "[" + pendingStatements.join(",") + "]");
+  pendingStatements.length = 0;
+  if (
+    beacon &&
+    navigator.sendBeacon &&
+    navigator.sendBeacon(batch_endpoint, data)
+  ) {
+    return;
+  }
+  fetch(batch_endpoint, {
+    method: "POST",
+    mode: "same-origin",
+    body: data,
+    keepalive: beacon,
+  });
+}
+
+document.addEventListener("visibilitychange", function () {
+  if (document.visibilityState === "hidden") {
+    sendStatements(true);
+  }
+});
+window.addEventListener("pagehide", function () {
+  sendStatements(true);
+});
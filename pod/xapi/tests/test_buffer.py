@@ -0,0 +1,190 @@
+"""Unit tests for the xAPI statements buffer.
+
+*  run with `python manage.py test pod.xapi.tests.test_buffer`
+"""
+
+from unittest.mock import MagicMock, patch
+
+import requests
+from celery.exceptions import Retry
+from django.test import TestCase
+
+from pod.xapi import xapi_tasks
+from pod.xapi.buffer import (
+    XAPI_STATEMENTS_START,
+    flush_statements,
+    get_counters,
+    send_statement,
+)
+
+
+class FakeRedis:
+    """Minimal in memory Redis with the commands used by the statements buffer."""
+
+    def __init__(self):
+        self.data = {}
+
+    def rpush(self, key, *values):
+        self.data.setdefault(key, []).extend(value.encode() for value in values)
+        return len(self.data[key])
+
+    def lpush(self, key, *values):
+        for value in values:
+            self.data.setdefault(key, []).insert(0, value.encode())
+        return len(self.data[key])
+
+    def lrange(self, key, start, end):
+        return self.data.get(key, [])[start : end + 1]
+
+    def ltrim(self, key, start, end):
+        self.data[key] = self.data.get(key, [])[start:]
+
+    def llen(self, key):
+        return len(self.data.get(key, []))
+
+    def set(self, key, value, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value).encode()
+        return True
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def delete(self, key):
+        return int(self.data.pop(key, None) is not None)
+
+    def hincrby(self, key, field, amount):
+        counters = self.data.setdefault(key, {})
+        counters[field.encode()] = counters.get(field.encode(), 0) + amount
+        return counters[field.encode()]
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Queue the commands and run them on execute."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+
+        return queue
+
+    def execute(self):
+        return [
+            getattr(self.redis, name)(*args, **kwargs)
+            for name, args, kwargs in self.commands
+        ]
+
+
+@patch("pod.xapi.buffer.XAPI_STATEMENT_BUFFER", True)
+@patch("pod.xapi.buffer.XAPI_BATCH_SIZE", 3)
+@patch("pod.xapi.buffer.send_xapi_statements_task")
+class StatementBufferTestCase(TestCase):
+    """Test the statements sent by batches."""
+
+    def setUp(self):
+        """Set up a fake Redis."""
+        self.redis = FakeRedis()
+        patcher = patch("pod.xapi.buffer.get_redis", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_batch_size(self, mock_task):
+        """Test the statements are sent when a batch is full."""
+        for i in range(4):
+            send_statement({"id": i})
+        mock_task.delay.assert_called_once_with([{"id": 0}, {"id": 1}, {"id": 2}])
+        self.assertEqual(
+            get_counters(), {"statements": 4, "batches": 1, "errors": 0, "queue": 1}
+        )
+        print(" --->  test_batch_size: OK!")
+
+    def test_batch_age(self, mock_task):
+        """Test the statements are sent when the oldest one is too old."""
+        send_statement({"id": 0})
+        mock_task.delay.assert_not_called()
+        self.redis.data[XAPI_STATEMENTS_START] = b"0"
+        send_statement({"id": 1})
+        mock_task.delay.assert_called_once_with([{"id": 0}, {"id": 1}])
+        self.assertEqual(get_counters()["queue"], 0)
+        print(" --->  test_batch_age: OK!")
+
+    def test_flush_error(self, mock_task):
+        """Test the statements are kept when the broker is unreachable."""
+        mock_task.delay.side_effect = [None, Exception("broker"), None]
+        for i in range(2):
+            send_statement({"id": i})
+        self.assertEqual(flush_statements(), 1)
+        send_statement({"id": 2})
+        self.assertEqual(flush_statements(), 0)
+        self.assertEqual(get_counters()["queue"], 1)
+        self.assertEqual(get_counters()["errors"], 1)
+        self.assertEqual(flush_statements(), 1)
+        self.assertEqual(mock_task.delay.call_args[0][0], [{"id": 2}])
+        print(" --->  test_flush_error: OK!")
+
+
+class PostStatementsTestCase(TestCase):
+    """Test the batches posted to the LRS by the xAPI worker."""
+
+    @patch("pod.xapi.xapi_tasks.get_session")
+    def test_post_statements(self, mock_get_session):
+        """Test a batch is posted as a JSON array and the failures are counted."""
+        session = MagicMock()
+        mock_get_session.return_value = session
+        session.post.return_value.status_code = 200
+        failures = xapi_tasks.counters["failures"]
+        self.assertEqual(xapi_tasks.post_statements([{"id": 0}, {"id": 1}]), [])
+        self.assertEqual(session.post.call_args[1]["json"], [{"id": 0}, {"id": 1}])
+        session.post.side_effect = requests.ConnectionError("LRS down")
+        self.assertEqual(xapi_tasks.post_statements([{"id": 2}]), [{"id": 2}])
+        self.assertEqual(xapi_tasks.counters["failures"], failures + 1)
+        print(" --->  test_post_statements: OK!")
+
+    @patch("pod.xapi.xapi_tasks.get_session")
+    def test_rejected_statements(self, mock_get_session):
+        """Test only the server errors are sent again, the rejected ones are dropped."""
+        session = MagicMock()
+        mock_get_session.return_value = session
+
+        def post(url, json, timeout):
+            # the LRS rejects statement 2 and fails on statement 1
+            response = MagicMock(status_code=200)
+            if {"id": 2} in json:
+                response.status_code = 400
+            elif {"id": 1} in json:
+                response.status_code = 503
+            return response
+
+        session.post.side_effect = post
+        statements = [{"id": 0}, {"id": 1}, {"id": 2}, {"id": 3}]
+        self.assertEqual(xapi_tasks.post_statements(statements), [{"id": 0}, {"id": 1}])
+        session.post.side_effect = None
+        session.post.return_value.status_code = 409
+        self.assertEqual(xapi_tasks.post_statements(statements), [])
+        self.assertEqual(session.post.call_count, 6)
+        print(" --->  test_rejected_statements: OK!")
+
+    @patch("pod.xapi.xapi_tasks.post_statements")
+    def test_retry_statements(self, mock_post_statements):
+        """Test the task is retried later with the statements to send again."""
+        mock_post_statements.return_value = [{"id": 1}]
+        with patch.object(
+            xapi_tasks.send_xapi_statements_task, "retry", side_effect=Retry
+        ) as mock_retry:
+            with self.assertRaises(Retry):
+                xapi_tasks.send_xapi_statements_task([{"id": 0}, {"id": 1}])
+        self.assertEqual(mock_retry.call_args[1]["args"], [[{"id": 1}]])
+        mock_post_statements.return_value = []
+        xapi_tasks.send_xapi_statements_task([{"id": 0}])
+        print(" --->  test_retry_statements: OK!")
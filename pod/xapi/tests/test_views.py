@@ -4,6 +4,7 @@ from django.test import TestCase
 from django.urls import reverse
 from django.test import Client  # , override_settings
 from http import HTTPStatus
+from unittest.mock import patch
 import json
 
 
@@ -36,3 +37,59 @@ class xapi_statement_TestView(TestCase):
             " --->  test_xapi_statment_TestView_get_request ",
             "of xapi_statement_TestView: OK!",
         )
+
+
+@patch("pod.xapi.views.XAPI_LRS_URL", "http://lrs.test/xAPI/statements")
+@patch("pod.xapi.views.validate_statement", return_value=True)
+@patch("pod.xapi.views.send_statements")
+class xapi_statements_TestView(TestCase):
+    def setUp(self):
+        """Initialize the Django test client with CSRF checks."""
+        self.client = Client(enforce_csrf_checks=True)
+        self.url = reverse("xapi:statements", kwargs={"app": "video"})
+        # get the CSRF cookie
+        self.client.get(reverse("xapi:statement", kwargs={"app": "video"}))
+        self.csrftoken = self.client.cookies["csrftoken"].value
+
+    def test_xapi_statements_json(self, mock_send, mock_validate):
+        """Test a JSON array of statements is sent in one batch."""
+        batch = [{"verb": {"id": "played"}}, {"verb": {"id": "paused"}, "actor": {}}]
+        response = self.client.post(
+            self.url,
+            json.dumps(batch),
+            "application/json",
+            HTTP_X_CSRFTOKEN=self.csrftoken,
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        statements = mock_send.call_args[0][0]
+        self.assertEqual(response.json(), [statement["id"] for statement in statements])
+        self.assertEqual([s["verb"]["id"] for s in statements], ["played", "paused"])
+        # the actor is set by the server
+        self.assertEqual(statements[0]["actor"], statements[1]["actor"])
+        self.assertTrue(statements[1]["actor"]["name"] != "")
+        print(" --->  test_xapi_statements_json of xapi_statements_TestView: OK!")
+
+    def test_xapi_statements_beacon(self, mock_send, mock_validate):
+        """Test the statements sent as a form by navigator.sendBeacon."""
+        data = {
+            "csrfmiddlewaretoken": self.csrftoken,
+            "statements": json.dumps([{"verb": {"id": "seeked"}}]),
+        }
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(len(response.json()), 1)
+        mock_send.assert_called_once()
+        response = self.client.post(self.url, {"statements": "[]"})
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        print(" --->  test_xapi_statements_beacon of xapi_statements_TestView: OK!")
+
+    def test_xapi_statements_bad_request(self, mock_send, mock_validate):
+        """Test the requests without a valid array of statements."""
+        headers = {"HTTP_X_CSRFTOKEN": self.csrftoken}
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        for body in ("{", json.dumps({"verb": {}}), json.dumps([{}] * 101)):
+            response = self.client.post(self.url, body, "application/json", **headers)
+            self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        mock_send.assert_not_called()
+        print(" --->  test_xapi_statements_bad_request of xapi_statements_TestView: OK!")
@@ -9,4 +9,5 @@ app_name = "xapi"
 urlpatterns = [
     path("", views.statement, name="statement"),
     path("<slug:app>/", views.statement, name="statement"),
+    path("<slug:app>/batch/", views.statements, name="statements"),
 ]
@@ -5,7 +5,7 @@ from django.views.decorators.csrf import ensure_csrf_cookie
 from django.views.decorators.csrf import csrf_protect
 from django.conf import settings
 from django.core.exceptions import SuspiciousOperation
-from .xapi_tasks import send_xapi_statement_task
+from .buffer import send_statement, send_statements
 import json
 import uuid
 
@@ -31,6 +31,8 @@ To test with celery:
 XAPI_ANONYMIZE_ACTOR = getattr(settings, "XAPI_ANONYMIZE_ACTOR", True)
 XAPI_LRS_URL = getattr(settings, "XAPI_LRS_URL", "")
 XAPI_AUTHENTICATED_NAME = getattr(settings, "XAPI_AUTHENTICATED_NAME", "username")
+# maximum number of statements of a batch sent by a player
+XAPI_MAX_BATCH_STATEMENTS = 100
 
 
 @csrf_protect
@@ -49,13 +51,55 @@ def statement(request, app: str = None):
         for key, value in body.items():
             statement[key] = value
         if validate_statement(statement) and XAPI_LRS_URL != "":
-            send_xapi_statement_task.delay(statement)
+            send_statement(statement)
         return JsonResponse(statement, safe=False)
     raise SuspiciousOperation(
         "none post data was sent and app parameter has to be equals to video"
     )
 
 
+@csrf_protect
+def statements(request, app: str = None):
+    """Receive a batch of statements of a player, return their ids.
+
+    The JSON array of statements is the body of the request, or its statements
+    field when sent by navigator.sendBeacon with the CSRF token in a form.
+    """
+    if request.method != "POST" or app != "video":
+        raise SuspiciousOperation(
+            "statements have to be posted and app parameter has to be equals to video"
+        )
+    actor = {
+        "name": "%s" % get_actor_name(request),
+        "mbox": "mailto:%s" % get_actor_mail(request),
+    }
+    valid_statements = []
+    for data in get_batch(request):
+        statement = dict(data, actor=actor, id=str(uuid.uuid4()))
+        if validate_statement(statement):
+            valid_statements.append(statement)
+    if valid_statements and XAPI_LRS_URL != "":
+        send_statements(valid_statements)
+    return JsonResponse([statement["id"] for statement in valid_statements], safe=False)
+
+
+def get_batch(request) -> list:
+    """Get the statements of a batch request."""
+    try:
+        if request.content_type == "application/json":
+            batch = json.loads(request.body.decode("utf-8"))
+        else:
+            batch = json.loads(request.POST.get("statements", ""))
+    except ValueError:
+        raise SuspiciousOperation("statements have to be a JSON array")
+    if not isinstance(batch, list) or len(batch) > XAPI_MAX_BATCH_STATEMENTS:
+        raise SuspiciousOperation(
+            "statements have to be an array of %s statements at most"
+            % XAPI_MAX_BATCH_STATEMENTS
+        )
+    return [data for data in batch if isinstance(data, dict)]
+
+
 def get_actor_mail(request):
     """Return a email adress for the actor's statement."""
     if request.user.is_authenticated:
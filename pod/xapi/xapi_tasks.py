@@ -1,9 +1,12 @@
 """Esup-pod xapi tasks."""
 
 from celery import Celery
+from functools import lru_cache
 import requests
 import logging
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
+from urllib3.util.retry import Retry
 
 # call local settings directly
 # no need to load pod application to send statement
@@ -23,14 +26,70 @@ xapi_app = Celery("xapi_tasks", broker=XAPI_CELERY_BROKER_URL)
 xapi_app.conf.task_routes = {"pod.xapi.xapi_tasks.*": {"queue": "xapi"}}
 
 
+# retry the requests failed by a connection or server error: 0.5, 1, 2s...
+LRS_RETRY = Retry(
+    total=5,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=None,
+)
+# then retry the batch later: 1, 2, 4 minutes...
+BATCH_MAX_RETRIES = 5
+
+# numbers of statements and batches sent and of failed batches of the worker
+counters = {"statements": 0, "batches": 0, "failures": 0}
+
+
+@lru_cache(maxsize=None)
+def get_session() -> requests.Session:
+    """Get the HTTP session of the worker, keeping the connection to the LRS."""
+    session = requests.Session()
+    session.auth = HTTPBasicAuth(XAPI_LRS_LOGIN, XAPI_LRS_PWD)
+    adapter = HTTPAdapter(max_retries=LRS_RETRY)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def post_statements(statements: list) -> list:
+    """Post the statements to the LRS as a JSON array, return the ones to send again.
+
+    The statements are sent again after a connection error, a 429 or a 5xx
+    response. A batch rejected as a bad request is split in two to only drop
+    the invalid statements, the ones rejected otherwise are dropped.
+    """
+    try:
+        x = get_session().post(XAPI_LRS_URL, json=statements, timeout=30)
+    except requests.RequestException as e:
+        counters["failures"] += 1
+        logger.error("Error during sending %s statement(s): %s" % (len(statements), e))
+        return statements
+    if x.status_code == 200:
+        counters["statements"] += len(statements)
+        counters["batches"] += 1
+        logger.info("statement ids: %s, %s" % (x.text, counters))
+        return []
+    counters["failures"] += 1
+    logger.error("Error during sending statements: %s, %s" % (x.text, counters))
+    if x.status_code == 429 or x.status_code >= 500:
+        return statements
+    if x.status_code == 400 and len(statements) > 1:
+        middle = len(statements) // 2
+        return post_statements(statements[:middle]) + post_statements(statements[middle:])
+    logger.error("%s statement(s) rejected by the LRS are dropped" % len(statements))
+    return []
+
+
+@xapi_app.task(bind=True, max_retries=BATCH_MAX_RETRIES)
+def send_xapi_statements_task(self, statements):
+    """Send a batch of xapi statements to the specified LRS."""
+    statements = post_statements(statements)
+    if statements:
+        raise self.retry(args=[statements], countdown=60 * 2**self.request.retries)
+
+
 @xapi_app.task
 def send_xapi_statement_task(statement):
     """Send the xapi statement to the specified LRS."""
-    x = requests.post(
-        XAPI_LRS_URL, json=statement, auth=HTTPBasicAuth(XAPI_LRS_LOGIN, XAPI_LRS_PWD)
-    )
-    if x.status_code == 200:
-        print(x.text)
-        logger.info("statement id: %s" % x.text)
-    else:
-        logger.error("Error during sending statement: %s" % x.text)
+    # statements queued before the batches
+    send_xapi_statements_task.delay([statement])